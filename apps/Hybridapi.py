@@ -43,7 +43,8 @@ def create_channel(headers, body):
                     session_token = session_token[1]
                     break
                 
-        if not session_token or not session_manager.validate_session(session_token):
+        session = session_manager.validate_and_get(session_token)
+        if session is None:
             return {
                 "status": 401,
                 "headers": {"Content-Type": "application/json"},
@@ -54,7 +55,6 @@ def create_channel(headers, body):
             
             }
         
-        session = session_manager.get_session(session_token)
         username = session['username']
         
         channel_name = body.get("channel_name")
@@ -171,7 +171,8 @@ def join_channel(headers, body):
                     session_token = session_token[1]
                     break
                 
-        if not session_token or not session_manager.validate_session(session_token):
+        session = session_manager.validate_and_get(session_token)
+        if session is None:
             return {
                 "status": 401,
                 "headers": {"Content-Type": "application/json"},
@@ -181,7 +182,6 @@ def join_channel(headers, body):
                 })
             }
         
-        session = session_manager.get_session(session_token)
         username = session['username']
         
         channel_name = body.get("channel_name")
@@ -400,7 +400,8 @@ def get_user_info_api(headers, body):
                 "body": json.dumps({"error": "Unauthorized - No session token"})
             }
         
-        if not session_manager.validate_session(session_token):
+        session = session_manager.validate_and_get(session_token)
+        if session is None:
             print("[GetUserInfo] Invalid session")
             return {
                 "status": 401,
@@ -408,8 +409,6 @@ def get_user_info_api(headers, body):
                 "body": json.dumps({"error": "Unauthorized - Invalid session"})
             }
         
-        # Get session info
-        session = session_manager.get_session(session_token)
         username = session['username']
         
         # Get user info from database
@@ -507,7 +506,6 @@ def submit_info(headers, body):
             }
             
         # Info of user
-        session = session_manager.get_session(session_token)
         username = 'admin'
         
         success = session_manager.submit_peer_info(session_token, peer_ip,peer_port)
@@ -560,10 +558,15 @@ def add_list(headers, body):
 
 
 @app.route('/get-list', methods=['GET'])
-def get_list(headers, body):
+def get_list(headers, body, query=None):
     """
     Get list of active peers for P2P connection
-    
+
+    Query (optional):
+        offset, limit: page of the peers sorted by username (all by default)
+        prefix: only usernames starting with it
+        since, epoch: only the changes since that version (from a previous
+                      response), a full list if they are no longer known
     """
     print("[GetList] Getting active peers...")
     try:
@@ -575,7 +578,8 @@ def get_list(headers, body):
                 if item.startswith("session_token="):
                     session_token = item.split("=")[1]
                     break
-        if not session_token or not session_manager.validate_session(session_token):
+        session = session_manager.validate_and_get(session_token)
+        if session is None:
             return {
                 "status": 401,
                 "headers": {"Content-Type": "application/json"},
@@ -585,17 +589,47 @@ def get_list(headers, body):
                 })
             }
         
-        # Get all active peers 
-        peers = session_manager.get_all_peers() 
-        print(f"[GetList] Found {len(peers)} active peers")
+        query = query or {}
+        try:
+            offset = int(query.get("offset") or 0)
+            limit = int(query["limit"]) if query.get("limit") else None
+            since = int(query["since"]) if query.get("since") else None
+            if offset < 0 or (limit is not None and limit < 0) or (since is not None and since < 0):
+                raise ValueError("negative offset, limit or since")
+        except ValueError:
+            return {
+                "status": 400,
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps({
+                    "status": "error",
+                    "message": "offset, limit and since must be non-negative integers"
+                })
+            }
+        prefix = query.get("prefix", "")
+
+        # Only the changes since the client's version, if still logged
+        if since is not None:
+            delta = session_manager.peer_changes_json(since, query.get("epoch") or None, prefix)
+            if delta is not None:
+                print(f"[GetList] {delta.count} peer changes since version {since}")
+                return {
+                    "status": 200,
+                    "headers" : {"Content-Type": "application/json"},
+                    "body": '{{"status": "success", "full": false, "joined": {}, "updated": {}, "left": {}, '
+                            '"count": {}, "epoch": "{}", "version": {}}}'.format(
+                                delta.joined, delta.updated, delta.left, delta.count,
+                                delta.epoch, delta.version)
+                }
+
+        # Get active peers, already serialized by the registry
+        page = session_manager.peer_page_json(offset, limit, prefix)
+        print(f"[GetList] Found {page.total} active peers")
         return {
             "status": 200,
             "headers" : {"Content-Type": "application/json"},
-            "body": json.dumps({
-                "status": "success",
-                "peers" : peers,
-                "count":len(peers)
-            })
+            "body": '{{"status": "success", "full": true, "peers": {}, "count": {}, "total": {}, '
+                    '"epoch": "{}", "version": {}}}'.format(
+                        page.peers, page.count, page.total, page.epoch, page.version)
         }
     except Exception as e :
         print(f"[GetList] Error: {e}")
@@ -635,7 +669,8 @@ def heartbeat(headers, body):
                     session_token = item.split("=")[1]
                     break
         
-        if not session_token or not session_manager.validate_session(session_token):
+        session = session_manager.validate_and_get(session_token)
+        if session is None:
             return {
                 "status": 401,
                 "headers": {"Content-Type": "application/json"},
@@ -643,7 +678,6 @@ def heartbeat(headers, body):
             }
         
         # Update last seen timestamp
-        session = session_manager.get_session(session_token)
         session['last_seen'] = __import__('time').time()
         
         return {
@@ -677,14 +711,14 @@ def send_connection_offer(headers, body):
                     session_token = item.split("=")[1]
                     break
         
-        if not session_token or not session_manager.validate_session(session_token):
+        session = session_manager.validate_and_get(session_token)
+        if session is None:
             return {
                 "status": 401,
                 "headers": {"Content-Type": "application/json"},
                 "body": json.dumps({"status": "error"})
             }
         
-        session = session_manager.get_session(session_token)
         from_username = session['username']
         
         to_username = body.get('to_username')
@@ -736,14 +770,14 @@ def get_connection_requests(headers, body):
                     session_token = item.split("=")[1]
                     break
         
-        if not session_token or not session_manager.validate_session(session_token):
+        session = session_manager.validate_and_get(session_token)
+        if session is None:
             return {
                 "status": 401,
                 "headers": {"Content-Type": "application/json"},
                 "body": json.dumps({"status": "error"})
             }
         
-        session = session_manager.get_session(session_token)
         username = session['username']
         
         # Get requests for this user
@@ -780,7 +814,8 @@ def send_connection_answer(headers, body):
                     session_token = item.split("=")[1]
                     break
         
-        if not session_token or not session_manager.validate_session(session_token):
+        session = session_manager.validate_and_get(session_token)
+        if session is None:
             return {
                 "status": 401,
                 "headers": {"Content-Type": "application/json"},
@@ -827,14 +862,14 @@ def get_connection_answer(headers, body):
                     session_token = item.split("=")[1]
                     break
         
-        if not session_token or not session_manager.validate_session(session_token):
+        session = session_manager.validate_and_get(session_token)
+        if session is None:
             return {
                 "status": 401,
                 "headers": {"Content-Type": "application/json"},
                 "body": json.dumps({"status": "error"})
             }
         
-        session = session_manager.get_session(session_token)
         username = session['username']
         
         # Get answer
@@ -875,7 +910,8 @@ def connect_peer(headers, body):
                     session_token = item.split("=")[1]
                     break
         
-        if not session_token or not session_manager.validate_session(session_token):
+        session = session_manager.validate_and_get(session_token)
+        if session is None:
             return {
                 "status": 401,
                 "headers": {"Content-Type": "application/json"},
@@ -885,7 +921,6 @@ def connect_peer(headers, body):
                 })
             }
         
-        session = session_manager.get_session(session_token)
         current_username = session['username']
         
         target_username = body.get("target_username")
@@ -911,13 +946,7 @@ def connect_peer(headers, body):
             }
         
         # Find target peer
-        all_peers = session_manager.get_all_peers()
-        target_peer = None
-        
-        for peer in all_peers:
-            if peer['username'] == target_username:
-                target_peer = peer
-                break
+        target_peer = session_manager.find_peer(target_username)
         
         if not target_peer:
             return {
@@ -0,0 +1,185 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.broadcast
+~~~~~~~~~~~~~~~~~
+
+Measures the latency of a WebSocket broadcast (``peer_online``) from the
+call until every responsive client has sent it, with 1k and 10k connected
+clients of which a few are slow. Compares the previous sequential loop
+(``json.dumps`` and ``await send`` per client) with
+:meth:`WebSocketHandler.fanout` (serialized once, queued on each client's
+outbox, sent by per-connection writer tasks).
+
+Then measures, for one client, how long an ``ice_candidate`` waits behind a
+burst of presence updates (``--churn`` online/offline events of
+``--churn-users`` users), and how many messages the client is actually sent.
+
+Clients are in-process stand-ins whose ``send`` yields to the loop like a
+drained transport (slow ones sleep), so 10k of them fit in the file
+descriptor limit and the numbers measure the handler, not the kernel.
+
+Usage::
+
+  python3 bench/broadcast.py --clients 1000 10000 --slow 5 --slow-delay 0.05
+  python3 bench/broadcast.py --churn 200 --churn-users 20 --send-delay 0.001
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from daemon.session import SessionManager
+from daemon.websocket_handler import WebSocketHandler, Outbox, OUTBOX_SIZE
+
+
+class Client:
+    """Stand-in of a websockets connection."""
+
+    def __init__(self, delay, arrived):
+        self.delay = delay
+        self.arrived = arrived
+        self.closed = False
+
+    async def send(self, text):
+        await asyncio.sleep(self.delay)
+        if not self.delay:
+            self.arrived()
+
+    async def close(self, code=1000, reason=""):
+        self.closed = True
+
+
+async def legacy_broadcast(handler, message, exclude):
+    # The loop broadcast_peer_status used to run.
+    for username, websocket in list(handler.connections.items()):
+        if username != exclude:
+            await websocket.send(json.dumps(message))
+
+
+async def run(clients, slow, slow_delay, fanout, rounds):
+    handler = WebSocketHandler(SessionManager())
+    state = {"left": 0, "done": None}
+
+    def arrived():
+        state["left"] -= 1
+        if state["left"] == 0:
+            state["done"].set_result(time.perf_counter())
+
+    fast = clients - slow
+    stride = clients // slow if slow else clients + 1  # slow clients spread evenly
+    for i in range(clients):
+        websocket = Client(slow_delay if i % stride == 0 and i // stride < slow else 0, arrived)
+        handler.connections["user{}".format(i)] = websocket
+        if fanout:
+            handler.outboxes["user{}".format(i)] = Outbox(websocket)
+
+    latencies = []
+    for _ in range(rounds):
+        state["left"] = fast
+        state["done"] = asyncio.get_running_loop().create_future()
+        message = {"type": "peer_online", "username": "newcomer", "timestamp": time.time()}
+        start = time.perf_counter()
+        if fanout:
+            handler.fanout(json.dumps(message), exclude="newcomer")
+        else:
+            await legacy_broadcast(handler, message, "newcomer")
+        latencies.append(await state["done"] - start)
+        await asyncio.sleep(slow_delay)  # let slow clients catch up between rounds
+
+    for outbox in handler.outboxes.values():
+        outbox.close()
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[-1]
+
+
+class Recorder:
+    """Stand-in connection taking ``delay`` seconds per message."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.sent = []
+
+    async def send(self, text):
+        await asyncio.sleep(self.delay)
+        self.sent.append((time.perf_counter(), text))
+
+    async def close(self, code=1000, reason=""):
+        pass
+
+
+async def signaling(churn, users, delay, prioritized):
+    handler = WebSocketHandler(SessionManager())
+    client = Recorder(delay)
+    handler.connections["alice"] = client
+    handler.outboxes["alice"] = Outbox(client, size=max(OUTBOX_SIZE, churn + 1))
+
+    for i in range(churn):
+        username, status = "user{}".format(i % users), "online" if i % 2 else "offline"
+        if prioritized:
+            await handler.broadcast_peer_status(username, status)
+        else:
+            # Every update queued, first come first served, as before.
+            handler.fanout(json.dumps({"type": "peer_" + status, "username": username}))
+    start = time.perf_counter()
+    message = {"type": "ice_candidate", "from_username": "bob", "candidate": "x"}
+    if prioritized:
+        await handler.send_to_client("alice", message)
+    else:
+        await handler.send_raw("alice", json.dumps(message))
+    while not any("ice_candidate" in text for _, text in client.sent):
+        await asyncio.sleep(delay)
+    sent = next(at for at, text in client.sent if "ice_candidate" in text)
+    while len(handler.outboxes["alice"]):
+        await asyncio.sleep(delay)
+    await asyncio.sleep(delay * 2)  # the last message in flight
+    handler.outboxes["alice"].close()
+    return sent - start, len(client.sent)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--slow", type=int, default=5, help="slow clients among them")
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="seconds a slow client takes per message")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--churn", type=int, default=200, help="presence updates queued before the ICE candidate")
+    parser.add_argument("--churn-users", type=int, default=20, help="distinct users of those updates")
+    parser.add_argument("--send-delay", type=float, default=0.001, help="seconds the client takes per message")
+    args = parser.parse_args()
+
+    print("{:<10} {:<12} {:>12} {:>12}".format("clients", "broadcast", "median ms", "max ms"))
+    for clients in args.clients:
+        for label, fanout in (("sequential", False), ("fanout", True)):
+            with contextlib.redirect_stdout(io.StringIO()):
+                median, worst = asyncio.run(run(clients, args.slow, args.slow_delay, fanout, args.rounds))
+            print("{:<10} {:<12} {:>12.2f} {:>12.2f}".format(clients, label, median * 1e3, worst * 1e3))
+
+    print()
+    print("{:<24} {:>14} {:>14}".format("ice_candidate", "latency ms", "messages sent"))
+    for label, prioritized in (("fifo", False), ("urgent + coalescing", True)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            latency, sent = asyncio.run(signaling(args.churn, args.churn_users, args.send_delay, prioritized))
+        print("{:<24} {:>14.2f} {:>14}".format(label, latency * 1e3, sent))
+
+
+if __name__ == "__main__":
+    main()
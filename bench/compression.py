@@ -0,0 +1,109 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.compression
+~~~~~~~~~~~~~~~~~
+
+Measures bytes on the wire and CPU time per request of the static and JSON
+response paths with identity, gzip and (if installed) brotli encodings.
+Runs in-process, no server needed.
+
+Usage::
+
+  python3 bench/compression.py --iterations 500
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from daemon.request import Request
+from daemon.response import Response
+from daemon.compression import supported_encodings, compress
+
+FILES = [
+    ("/channels.html", "www/channels.html"),
+    ("/dashboard.html", "www/dashboard.html"),
+    ("/js/p2p-agent.js", "www/js/p2p-agent.js"),
+    ("/css/styles.css", "static/css/styles.css"),
+]
+
+
+def make_request(path, encoding):
+    raw = "GET {} HTTP/1.1\r\nHost: bench\r\n".format(path)
+    if encoding:
+        raw += "Accept-Encoding: {}\r\n".format(encoding)
+    req = Request()
+    req.prepare(raw + "\r\n", {})
+    return req
+
+
+def static_size(req):
+    resp = Response()
+    header = resp.build_response(req)
+    return len(header) + len(resp._body or b"")
+
+
+def json_size(req, data):
+    return len(Response().build_app(req, data))
+
+
+def measure(fn, iterations):
+    start = time.process_time()
+    for _ in range(iterations):
+        size = fn()
+    return size, (time.process_time() - start) / iterations * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Content-Encoding benchmark")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--peers", type=int, default=500)
+    args = parser.parse_args()
+
+    peers = [{"username": "user{}".format(i), "ip": "10.0.{}.{}".format(i // 250, i % 250),
+              "port": 9000 + i, "registered_at": 1700000000.0 + i} for i in range(args.peers)]
+    data = {"status": 200, "headers": {"Content-Type": "application/json"},
+            "body": str({"status": "success", "peers": peers, "count": len(peers)})}
+
+    encodings = [None] + list(supported_encodings())
+    print("{:<22} {:<9} {:>10} {:>12}".format("resource", "encoding", "bytes", "us/request"))
+    with contextlib.redirect_stdout(io.StringIO()) as log:
+        rows = []
+        for path, filename in FILES:
+            for encoding in encodings:
+                req = make_request(path, encoding)
+                static_size(req)  # warm the file and variant caches
+                size, cpu = measure(lambda: static_size(req), args.iterations)
+                rows.append((path, encoding or "identity", size, cpu))
+                if encoding:
+                    with open(filename, "rb") as f:
+                        content = f.read()
+                    _, cpu = measure(lambda: compress(content, encoding), args.iterations // 10 or 1)
+                    rows.append((path, encoding + "*", size, cpu))
+        for encoding in encodings:
+            req = make_request("/get-list", encoding)
+            size, cpu = measure(lambda: json_size(req, data), args.iterations)
+            rows.append(("/get-list ({} peers)".format(args.peers), encoding or "identity", size, cpu))
+        log.truncate(0)
+
+    for row in rows:
+        print("{:<22} {:<9} {:>10} {:>12.1f}".format(*row))
+    print("* compressing the file on every request instead of using the variant cache")
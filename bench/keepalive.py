@@ -0,0 +1,128 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.keepalive
+~~~~~~~~~~~~~~~~~
+
+Compares requests/sec of close-per-request, keep-alive and pipelined HTTP
+traffic against a locally started ``start_sampleapp.py`` backend.
+
+Usage::
+
+  python3 bench/keepalive.py --requests 2000 --engine selector
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def request(path, connection):
+    return ("GET {} HTTP/1.1\r\nHost: bench\r\nConnection: {}\r\n\r\n"
+            .format(path, connection)).encode()
+
+
+def read_response(sock, buf):
+    """Read one Content-Length framed response, return the leftover bytes."""
+    while b"\r\n\r\n" not in buf:
+        buf += sock.recv(65536)
+    head, _, rest = buf.partition(b"\r\n\r\n")
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    while len(rest) < length:
+        rest += sock.recv(65536)
+    return rest[length:]
+
+
+def close_per_request(addr, path, n):
+    for _ in range(n):
+        sock = socket.create_connection(addr)
+        sock.sendall(request(path, "close"))
+        read_response(sock, b"")
+        sock.close()
+
+
+def keep_alive(addr, path, n, max_requests):
+    sock = None
+    for i in range(n):
+        if i % max_requests == 0:
+            if sock:
+                sock.close()
+            sock = socket.create_connection(addr)
+        sock.sendall(request(path, "keep-alive"))
+        read_response(sock, b"")
+    sock.close()
+
+
+def pipelined(addr, path, n, depth, max_requests):
+    sent = 0
+    while sent < n:
+        sock = socket.create_connection(addr)
+        served = 0
+        while sent < n and served < max_requests:
+            batch = min(depth, n - sent, max_requests - served)
+            sock.sendall(request(path, "keep-alive") * batch)
+            buf = b""
+            for _ in range(batch):
+                buf = read_response(sock, buf)
+            sent += batch
+            served += batch
+        sock.close()
+
+
+def run(label, fn, n):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print("{:<20} {:>8.0f} req/s".format(label, n / elapsed))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep-alive benchmark")
+    parser.add_argument("--port", type=int, default=9501)
+    parser.add_argument("--engine", default="pool")
+    parser.add_argument("--path", default="/ping")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--max-requests", type=int, default=100)
+    args = parser.parse_args()
+
+    server = subprocess.Popen(
+        [sys.executable, "start_sampleapp.py", "--server-ip", "127.0.0.1",
+         "--server-port", str(args.port), "--engine", args.engine],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    addr = ("127.0.0.1", args.port)
+    try:
+        for _ in range(50):
+            try:
+                socket.create_connection(addr).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+
+        n = args.requests
+        print("{} x GET {} ({} engine)".format(n, args.path, args.engine))
+        run("close-per-request", lambda: close_per_request(addr, args.path, n), n)
+        run("keep-alive", lambda: keep_alive(addr, args.path, n, args.max_requests), n)
+        run("pipelined x{}".format(args.depth),
+            lambda: pipelined(addr, args.path, n, args.depth, args.max_requests), n)
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,154 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.pubsub
+~~~~~~~~~~~~~~~~~
+
+Measures the signaling bus between two nodes, through a
+``python3 -m daemon.resp`` broker on a UNIX socket and on TCP: messages per
+second from publish until the subscribed node has received them all, one
+``PUBLISH`` round trip per message against :class:`RespBus <RespBus>`
+batching, and the median delay of a lone message (what batching costs when
+there is nothing to batch with).
+
+Usage::
+
+  python3 bench/pubsub.py --messages 20000 --port 6391
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from daemon.pubsub import RespBus
+from daemon.resp import RespConnection
+
+CHANNEL = "weaprous.node.bench"
+
+
+def broker(args):
+    process = subprocess.Popen([sys.executable, "-W", "ignore", "-m", "daemon.resp"] + args,
+                               cwd=ROOT, stdout=subprocess.DEVNULL)
+    time.sleep(0.5)
+    return process
+
+
+class Receiver:
+    """Node subscribed to the bench channel, counting what arrives."""
+
+    def __init__(self, address):
+        self.bus = RespBus(**address)
+        self.lock = threading.Lock()
+        self.count = 0
+        self.expected = None
+        self.done = threading.Event()
+        self.bus.subscribe(CHANNEL, self.received)
+        time.sleep(0.2)  # subscribed before anything is published
+
+    def expect(self, count):
+        with self.lock:
+            self.count, self.expected = 0, count
+            self.done.clear()
+
+    def received(self, channel, message):
+        with self.lock:
+            self.count += 1
+            if self.count == self.expected:
+                self.done.set()
+
+
+def message(i):
+    return {"node": "sender", "to": "bob",
+            "message": {"type": "ice_candidate", "from_username": "alice", "candidate": i}}
+
+
+def unbatched(address, receiver, count):
+    conn = RespConnection(**address)
+    receiver.expect(count)
+    start = time.perf_counter()
+    for i in range(count):
+        conn.execute("PUBLISH", CHANNEL, json.dumps([message(i)]))
+    receiver.done.wait(30)
+    conn.close()
+    return time.perf_counter() - start
+
+
+def batched(address, receiver, count):
+    bus = RespBus(**address)
+    receiver.expect(count)
+    start = time.perf_counter()
+    for i in range(count):
+        bus.publish(CHANNEL, message(i))
+    receiver.done.wait(30)
+    return time.perf_counter() - start
+
+
+def lone(address, receiver, rounds, batching):
+    conn = RespConnection(**address)
+    bus = RespBus(**address)
+    delays = []
+    for i in range(rounds):
+        receiver.expect(1)
+        start = time.perf_counter()
+        if batching:
+            bus.publish(CHANNEL, message(i))
+        else:
+            conn.execute("PUBLISH", CHANNEL, json.dumps([message(i)]))
+        receiver.done.wait(5)
+        delays.append(time.perf_counter() - start)
+    conn.close()
+    delays.sort()
+    return delays[len(delays) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=200, help="lone messages timed")
+    parser.add_argument("--port", type=int, default=6391, help="TCP port of the broker")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bus.sock")
+    transports = (("unix", ["--unix", path], {"unix_path": path}),
+                  ("tcp", ["--port", str(args.port)], {"port": args.port}))
+
+    print("{:<6} {:<12} {:>14} {:>16}".format("bus", "publish", "messages/s", "lone message ms"))
+    for label, broker_args, address in transports:
+        process = broker(broker_args)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                receiver = Receiver(address)
+                results = [("per message", unbatched(address, receiver, args.messages),
+                            lone(address, receiver, args.rounds, False)),
+                           ("batched", batched(address, receiver, args.messages),
+                            lone(address, receiver, args.rounds, True))]
+            for name, elapsed, delay in results:
+                print("{:<6} {:<12} {:>14.0f} {:>16.2f}".format(
+                    label, name, args.messages / elapsed, delay * 1e3))
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
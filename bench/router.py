@@ -0,0 +1,104 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.router
+~~~~~~~~~~~~~~~~~
+
+Measures route lookup cost for growing route tables: the exact-match dict
+used before (no path parameters), a linear scan of compiled regexes (the
+naive way to add parameters), and the segment trie of
+:class:`Router <Router>`. Runs in-process, no server needed.
+
+Usage::
+
+  python3 bench/router.py --iterations 100000
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from daemon.router import Router
+
+
+def handler(headers=None, body=None, **params):
+    return params
+
+
+def build_routes(count):
+    """Half static routes, half parameterised ones."""
+    patterns = []
+    for i in range(count // 2):
+        patterns.append("/api/v1/resource{}/list".format(i))
+        patterns.append("/api/v1/resource{}/<int:item_id>".format(i))
+    return patterns
+
+
+def to_regex(pattern):
+    def group(m):
+        return "(?P<{}>{})".format(m.group(2), r"\d+" if m.group(1) == "int" else "[^/]+")
+    return re.compile("^" + re.sub(r"<(?:(\w+):)?(\w+)>", group, pattern) + "$")
+
+
+def bench(label, lookup, paths, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        lookup(paths[i % len(paths)])
+    elapsed = time.perf_counter() - start
+    print("  {:<14} {:>8.2f} us/lookup".format(label, elapsed / iterations * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Route lookup micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    for count in (20, 200, 2000):
+        patterns = build_routes(count)
+        last = count // 2 - 1
+        paths = ["/api/v1/resource{}/list".format(last),
+                 "/api/v1/resource{}/42".format(last),
+                 "/api/v1/resource0/list"]
+
+        flat = {("GET", p): handler for p in patterns}
+        regexes = [(to_regex(p), handler) for p in patterns]
+        router = Router()
+        for p in patterns:
+            router[("GET", p)] = handler
+
+        def dict_lookup(path):
+            return flat.get(("GET", path))
+
+        def regex_lookup(path):
+            for regex, func in regexes:
+                m = regex.match(path)
+                if m:
+                    return func, m.groupdict()
+            return None
+
+        def router_lookup(path):
+            return router.match("GET", path)
+
+        print("{} routes:".format(count))
+        bench("dict (exact)", dict_lookup, paths, args.iterations)
+        bench("regex scan", regex_lookup, paths, max(args.iterations // 10, 1))
+        bench("router trie", router_lookup, paths, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
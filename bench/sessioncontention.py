@@ -0,0 +1,109 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.sessioncontention
+~~~~~~~~~~~~~~~~~
+
+Measures session checks per second with many threads hammering the same
+:class:`SessionManager <SessionManager>`, as the worker pool does on every
+authenticated route: ``validate_session`` followed by ``get_session`` (two
+lookups) against ``validate_and_get`` (one), with a single lock stripe and
+with the default striping. Meanwhile a background thread keeps logging in
+and out so writes compete with the reads.
+
+Usage::
+
+  python3 bench/sessioncontention.py --threads 1 8 32 64 --duration 1
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from daemon.session import SessionManager, DEFAULT_STRIPES
+
+
+def pair(manager, token):
+    return manager.validate_session(token) and manager.get_session(token)
+
+
+def combined(manager, token):
+    return manager.validate_and_get(token)
+
+
+def bench(manager, tokens, check, threads, duration):
+    counts = [0] * threads
+    ready = threading.Barrier(threads + 2)
+    deadline = []
+
+    def worker(slot):
+        rng = random.Random(slot)
+        done = 0
+        ready.wait()
+        # Each thread checks the deadline itself: under the GIL a main thread
+        # setting a stop flag can be starved for seconds by 64 busy workers.
+        while time.perf_counter() < deadline[0]:
+            for _ in range(100):
+                check(manager, rng.choice(tokens))
+            done += 100
+        counts[slot] = done
+
+    def churn():
+        # Logins and logouts of users other than the measured ones.
+        ready.wait()
+        i = 0
+        while time.perf_counter() < deadline[0]:
+            manager.remove_session(manager.create_session("churn{}".format(i % 50)))
+            i += 1
+            time.sleep(0.001)
+
+    pool = [threading.Thread(target=worker, args=(slot,)) for slot in range(threads)]
+    pool.append(threading.Thread(target=churn))
+    for thread in pool:
+        thread.start()
+    start = time.perf_counter()
+    deadline.append(start + duration)
+    ready.wait()
+    for thread in pool:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=1.0)
+    args = parser.parse_args()
+
+    print("{:<34} {}".format("", "".join("{:>12}".format("{} thr".format(n)) for n in args.threads)))
+    for stripes in (1, DEFAULT_STRIPES):
+        for label, check in (("validate + get", pair), ("validate_and_get", combined)):
+            manager = SessionManager(stripes=stripes)
+            with contextlib.redirect_stdout(io.StringIO()):
+                tokens = [manager.create_session("user{}".format(i)) for i in range(args.sessions)]
+                rates = [bench(manager, tokens, check, n, args.duration) for n in args.threads]
+            print("{:<34} {}".format("{}, {} stripe(s)".format(label, stripes),
+                                     "".join("{:>10.0f}/s".format(rate) for rate in rates)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.sessionstore
+~~~~~~~~~~~~~~~~~
+
+Measures ``SessionManager.validate_session`` on each session store: the
+in-process store, SQLite (WAL) and the Redis protocol against the local
+:class:`RespServer <RespServer>` stand-in, with and without the read-through
+cache. Also checks that a session created through one manager is seen by a
+second manager on the same shared store, as another backend would.
+
+Usage::
+
+  python3 bench/sessionstore.py --sessions 1000 --iterations 20000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from daemon.resp import RespServer
+from daemon.session import SessionManager
+from daemon.sessionstore import MemoryStore, SQLiteStore, RedisStore
+
+
+def bench(label, store, sessions, iterations, cache_ttl):
+    manager = SessionManager(store, cache_ttl=cache_ttl)
+    tokens = [manager.create_session("user{}".format(i)) for i in range(sessions)]
+
+    # Another backend sharing the store sees the sessions.
+    if store.shared:
+        other = SessionManager(store, cache_ttl=cache_ttl)
+        assert other.validate_session(tokens[0])
+        manager.remove_session(tokens[0])
+        other.cache.clear()
+        assert not other.validate_session(tokens[0])
+        tokens = tokens[1:]
+
+    picks = [random.choice(tokens) for _ in range(iterations)]
+    start = time.perf_counter()
+    for token in picks:
+        manager.validate_session(token)
+    elapsed = time.perf_counter() - start
+    manager.flush()
+    print("{:<28} {:8.2f} us/validate".format(label, elapsed / iterations * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    resp = RespServer("127.0.0.1", 0).start()
+    stores = [
+        ("memory", lambda: MemoryStore(), [1.0]),
+        ("sqlite", lambda: SQLiteStore(os.path.join(tmp, "sessions.db")), [0, 1.0]),
+        ("redis (stand-in)", lambda: RedisStore("127.0.0.1", resp.port), [0, 1.0]),
+    ]
+    for name, factory, ttls in stores:
+        for ttl in ttls:
+            store = factory()
+            label = name if not store.shared else "{}, cache {}".format(name, "on" if ttl else "off")
+            bench(label, store, args.sessions, args.iterations, ttl)
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.aioloop
+~~~~~~~~~~~~~~~~~
+
+This module owns the process wide asyncio event loop shared by the WebSocket
+server and the ``async def`` route handlers of WeApRous. The loop runs in a
+daemon thread started on first use; worker threads schedule coroutines on it
+with :func:`submit` and get a :class:`concurrent.futures.Future` back.
+
+Blocking code called from a coroutine should go through :func:`run_sync`,
+which runs it on the loop's thread pool executor instead of stalling every
+coroutine sharing the loop.
+
+Usage Example:
+--------------
+>>> future = submit(handler(headers=headers, body=body))
+>>> future.result()
+
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future
+
+_loop = None
+_lock = threading.Lock()
+
+
+def get_loop():
+    """
+    Returns the shared event loop, starting its thread on first use.
+
+    :rtype asyncio.AbstractEventLoop: the running shared loop.
+    """
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            started = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(_loop)
+                _loop.call_soon(started.set)
+                _loop.run_forever()
+
+            threading.Thread(target=run, daemon=True, name="AsyncLoop").start()
+            started.wait()
+        return _loop
+
+
+def submit(coro):
+    """
+    Schedules a coroutine on the shared loop from any thread.
+
+    :param coro (coroutine): coroutine object to run.
+
+    :rtype Future: completes with the coroutine's result or exception.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run_sync(func, *args, **kwargs):
+    """
+    Awaitable running a blocking function on the loop's executor.
+
+    :param func (callable): blocking function.
+
+    :rtype asyncio.Future: awaitable result of ``func(*args, **kwargs)``.
+    """
+    return asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(func, *args, **kwargs))
+
+
+def is_async(func):
+    """
+    :param func (callable): route handler.
+
+    :rtype bool: True for ``async def`` handlers.
+    """
+    return asyncio.iscoroutinefunction(func)
+
+
+def then(future, func):
+    """
+    Chains a function on a future's result without blocking.
+
+    :param future (Future): source future.
+    :param func (callable): called with the source result, should be cheap,
+                            it runs on the thread completing ``future``.
+
+    :rtype Future: completes with ``func(result)`` or the source exception.
+    """
+    chained = Future()
+
+    def done(source):
+        try:
+            chained.set_result(func(source.result()))
+        except BaseException as e:
+            chained.set_exception(e)
+
+    future.add_done_callback(done)
+    return chained
@@ -19,24 +19,38 @@ It implements a basic backend server using Python's socket and threading librari
 It supports handling multiple client connections concurrently and routing requests using a
 custom HTTP adapter.
 
+Three I/O engines are available:
+
+- ``pool`` (default): accepted connections are queued for a fixed-size
+  :class:`WorkerPool <WorkerPool>`; a full queue answers 503 immediately.
+- ``selector``: an event loop (:class:`EventEngine <EventEngine>`) multiplexes every
+  client socket and hands readable connections to the worker pool.
+- ``thread``: the original model, one daemon thread per accepted connection.
+
 Requirements:
 --------------
 - socket: provide socket networking interface.
 - threading: Enables concurrent client handling via threads.
 - response: response utilities.
 - httpadapter: the class for handling HTTP requests.
+- eventengine: the selector based connection engine.
+- workerpool: bounded worker threads with accept backpressure.
+- prefork: worker processes sharing the port, restarted by a supervisor.
 - CaseInsensitiveDict: provides dictionary for managing headers or routes.
 
 
 Notes:
 ------
-- The server create daemon threads for client handling.
+- The server create daemon threads for client handling, bounded by ``workers``
+  unless the legacy ``thread`` engine is selected.
 - The current implementation error handling is minimal, socket errors are printed to the console.
 - The actual request processing is delegated to the HttpAdapter class.
 
 Usage Example:
 --------------
 >>> create_backend("127.0.0.1", 9000, routes={})
+>>> create_backend("127.0.0.1", 9000, routes={}, engine="selector", workers=64)
+>>> create_backend("127.0.0.1", 9000, routes={}, processes=4)
 
 """
 import asyncio
@@ -47,20 +61,46 @@ from daemon.websocket_handler import WebSocketHandler
 import socket
 import threading
 import argparse
+import functools
+from concurrent.futures import Future
 
+from . import aioloop
+from . import prefork
 from .response import *
-from .httpadapter import HttpAdapter
+from .httpadapter import HttpAdapter, KEEPALIVE_TIMEOUT, POOL_KEEPALIVE_TIMEOUT
+from .eventengine import EventEngine
+from .workerpool import WorkerPool, DEFAULT_WORKERS, DEFAULT_QUEUE_SIZE
 from .dictionary import CaseInsensitiveDict
 
+#: Supported connection engines.
+ENGINES = ("pool", "selector", "thread")
+
+#: Engine used when none is requested.
+DEFAULT_ENGINE = "pool"
+
 thread_counter = 0
 thread_lock = threading.Lock()
 
 ws_handler = None
 ws_server_task = None
+ws_bus = None
+
+def set_websocket_bus(bus):
+    """
+    Set the pub/sub bus joining the WebSocket servers of several backends.
+
+    :param bus (Bus): bus from :func:`daemon.pubsub.open_bus`, None for this process only.
+    """
+    global ws_bus
+    ws_bus = bus
 
 def start_websocket_server(host, ws_port):
     """
     Start WebSocket server in asyncio event loop
+
+    The server runs on the shared loop of :mod:`daemon.aioloop`, the one
+    ``async def`` route handlers are scheduled on, so handlers can await
+    WebSocket sends directly. This call blocks until the server stops.
     
     :param host (str): Host IP address
     :param ws_port (int): WebSocket port number
@@ -68,15 +108,11 @@ def start_websocket_server(host, ws_port):
     global ws_handler, ws_server_task
     
     try:
-        # Create new event loop for this thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
         # Import session manager
         from daemon.session import session_manager
         
         # Create WebSocket handler
-        ws_handler = WebSocketHandler(session_manager)
+        ws_handler = WebSocketHandler(session_manager, bus=ws_bus)
         
         # Start WebSocket server
         async def serve():
@@ -88,16 +124,19 @@ def start_websocket_server(host, ws_port):
                 ping_timeout=10
             ):
                 print(f"[WebSocket] Server running on ws://{host}:{ws_port}")
+                await ws_handler.start()
                 await asyncio.Future()  # Run forever
         
-        loop.run_until_complete(serve())
+        ws_server_task = aioloop.submit(serve())
+        ws_server_task.result()
         
     except Exception as e:
         print(f"[WebSocket] Server error: {e}")
         import traceback
         traceback.print_exc()
 
-def handle_client(ip, port, conn, addr, routes):
+def handle_client(ip, port, conn, addr, routes, keepalive_timeout=KEEPALIVE_TIMEOUT, contended=None,
+                  resubmit=None):
     """
     Initializes an HttpAdapter instance and delegates the client handling logic to it.
 
@@ -106,58 +145,163 @@ def handle_client(ip, port, conn, addr, routes):
     :param conn (socket.socket): Client connection socket.
     :param addr (tuple): client address (IP, port).
     :param routes (dict): Dictionary of route handlers.
+    :param keepalive_timeout (float): Idle timeout of the persistent connection.
+    :param contended (callable): True when connections wait for a worker, see
+                                 :meth:`HttpAdapter.handle_client`.
+    :param resubmit (callable): ``resubmit(conn, addr, future)`` queues the
+                                connection again once a pending ``async def``
+                                handler completes, releasing this thread
+                                meanwhile (see :func:`resume_client`); without
+                                it the thread waits for the handler.
     """
     global thread_counter
     with thread_lock:
         thread_counter += 1
         current_thread_id = thread_counter
+    outcome = None
     try:
         print(f"[Backend] Thread #{current_thread_id} started for client {addr}")
 
-        daemon = HttpAdapter(ip, port, conn, addr, routes)
+        daemon = HttpAdapter(ip, port, conn, addr, routes, keepalive_timeout=keepalive_timeout)
 
     # Handle client
-        daemon.handle_client(conn, addr, routes)
+        outcome = daemon.handle_client(conn, addr, routes, contended, resubmit is not None)
     except Exception as e:
         print(f"[Backend] Thread #{current_thread_id} Error: {e}")
     finally:
-        conn.close()
-        print(f"[Backend] Thread #{current_thread_id} closed connection for {addr}")
+        if isinstance(outcome, Future):
+            # Neither closed nor waited for until the deferred reply is sent.
+            outcome.add_done_callback(lambda future: resubmit(conn, addr, future))
+        else:
+            conn.close()
+            print(f"[Backend] Thread #{current_thread_id} closed connection for {addr}")
 
 
-def run_backend(ip, port, routes):
+def resume_client(conn, addr, pending, resubmit):
     """
-    Starts the backend server, binds to the specified IP and port, and listens for incoming
-    connections. Each connection is handled in a separate thread. The backend accepts incoming
-    connections and spawns a thread for each client.
+    Sends the deferred reply of a connection served by :func:`handle_client`
+    and goes on serving it, on a worker thread.
+
+    :param conn (socket.socket): Client connection socket.
+    :param addr (tuple): client address (IP, port).
+    :param pending (Future): completed future handed to ``resubmit``.
+    :param resubmit (callable): see :func:`handle_client`.
+    """
+    try:
+        outcome = pending.result()()
+        if isinstance(outcome, Future):
+            outcome.add_done_callback(lambda future: resubmit(conn, addr, future))
+            return
+    except Exception as e:
+        print(f"[Backend] Error serving {addr}: {e}")
+    conn.close()
+    print(f"[Backend] Closed connection for {addr}")
 
 
-    :param ip (str): IP address to bind the server.
-    :param port (int): Port number to listen on.
+def serve_connection(ip, port, conn, addr, routes, adapter=None):
+    """
+    Serves the requests pending on a readable connection for event-driven engines.
+
+    The adapter of a persistent connection is returned so the engine can park
+    the socket and resume it with the same adapter (and its buffered bytes)
+    once the next request arrives.
+
+    :param ip (str): IP address of the server.
+    :param port (int): Port number the server is listening on.
+    :param conn (socket.socket): Client connection socket.
+    :param addr (tuple): client address (IP, port).
     :param routes (dict): Dictionary of route handlers.
+    :param adapter (HttpAdapter): Adapter returned by the previous call, if any.
+
+    :rtype HttpAdapter: the adapter to resume with, or None once the connection is closed.
+                        While an ``async def`` handler is pending, a Future of the
+                        continuation (see :class:`EventEngine <EventEngine>`).
     """
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if adapter is None:
+        adapter = HttpAdapter(ip, port, conn, addr, routes)
 
-    try:
-        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        server.bind((ip, port))
-        server.listen(50)
+    def settle(step):
+        try:
+            outcome = step()
+            if isinstance(outcome, Future):
+                return aioloop.then(outcome, lambda resume: functools.partial(settle, resume))
+            if outcome:
+                return adapter
+        except Exception as e:
+            print(f"[Backend] Error serving {addr}: {e}")
+        conn.close()
+        return None
 
+    return settle(functools.partial(adapter.handle_available, conn, addr, routes))
 
-        ws_port = port + 100  # WebSocket port = HTTP port + 100
-        
-        ws_thread = threading.Thread(
-            target=start_websocket_server,
-            args=(ip, ws_port),
-            daemon=True,
-            name="WebSocketThread"
-        )
-        ws_thread.start()
-        
 
-        print("[Backend] Listening on port {}".format(port))
+def start_websocket_thread(ip, port):
+    """
+    Launch the WebSocket server in a background daemon thread.
+
+    :param ip (str): IP address to bind the WebSocket server.
+    :param port (int): HTTP port, the WebSocket port is ``port + 100``.
+    """
+    ws_port = port + 100  # WebSocket port = HTTP port + 100
+
+    ws_thread = threading.Thread(
+        target=start_websocket_server,
+        args=(ip, ws_port),
+        daemon=True,
+        name="WebSocketThread"
+    )
+    ws_thread.start()
+
+
+def serve_backend(server, ip, port, routes, engine=DEFAULT_ENGINE, workers=DEFAULT_WORKERS,
+                  queue_size=DEFAULT_QUEUE_SIZE, websocket=True):
+    """
+    Serves the connections accepted on a listening socket with an engine.
+
+    :param server (socket.socket): listening socket.
+    :param ip (str): IP address the server is bound to.
+    :param port (int): Port number the server is listening on.
+    :param routes (dict): Dictionary of route handlers.
+    :param engine (str): Connection engine, one of :data:`ENGINES`.
+    :param workers (int): Worker threads of the ``pool`` and ``selector`` engines.
+    :param queue_size (int): Pending connections allowed to wait for a worker.
+    :param websocket (bool): also start the WebSocket server on ``port + 100``.
+    """
+    try:
+        if websocket:
+            start_websocket_thread(ip, port)
+
+        print("[Backend] Listening on port {} ({} engine)".format(port, engine))
         if routes != {}:
             print("[Backend] route settings {}".format(routes))
+
+        if engine == "selector":
+            EventEngine(
+                server,
+                lambda conn, addr, adapter: serve_connection(ip, port, conn, addr, routes, adapter),
+                workers,
+                queue_size,
+                idle_timeout=KEEPALIVE_TIMEOUT
+            ).serve_forever()
+            return
+
+        if engine == "pool":
+            # A worker blocks on its keep-alive connection: idle clients are
+            # let go quickly, and at once when connections are queued. It is
+            # released while an async handler awaits, the connection comes
+            # back through the queue with the pending reply.
+            def serve_pooled(conn, addr, pending=None):
+                if pending is not None:
+                    resume_client(conn, addr, pending, pool.submit)
+                    return
+                handle_client(ip, port, conn, addr, routes, POOL_KEEPALIVE_TIMEOUT,
+                              lambda: pool.queued() > 0, pool.submit)
+
+            pool = WorkerPool(serve_pooled, workers, queue_size, name="Backend").start()
+            while True:
+                conn, addr = server.accept()
+                pool.submit(conn, addr)
+
         print("[Backend] Active threads will be displayed...")
 
         while True:
@@ -175,13 +319,73 @@ def run_backend(ip, port, routes):
     except socket.error as e:
       print("Socket error: {}".format(e))
 
-def create_backend(ip, port, routes={}):
+
+def run_backend(ip, port, routes, engine=DEFAULT_ENGINE, workers=DEFAULT_WORKERS,
+                queue_size=DEFAULT_QUEUE_SIZE, processes=prefork.DEFAULT_PROCESSES):
+    """
+    Starts the backend server, binds to the specified IP and port, and listens for incoming
+    connections. With the ``pool`` engine accepted connections are queued for a fixed set of
+    ``workers`` threads; once ``queue_size`` connections are waiting, new ones get a 503.
+    With the ``selector`` engine connections are multiplexed on an event loop and only
+    dispatched to the pool once a request arrives; idle keep-alive connections are
+    parked on the loop between requests. The legacy ``thread`` engine spawns a
+    thread for each client.
+
+    With ``processes`` above 1 the server is pre-forked: a
+    :class:`Supervisor <Supervisor>` runs that many worker processes sharing the
+    port (``SO_REUSEPORT`` on Linux, an inherited socket elsewhere) and restarts
+    crashed ones. The WebSocket server runs in worker 0 only.
+
+
+    :param ip (str): IP address to bind the server.
+    :param port (int): Port number to listen on.
+    :param routes (dict): Dictionary of route handlers.
+    :param engine (str): Connection engine, one of :data:`ENGINES`.
+    :param workers (int): Worker threads of the ``pool`` and ``selector`` engines.
+    :param queue_size (int): Pending connections allowed to wait for a worker.
+    :param processes (int): Worker processes, 1 serves from this process.
+    """
+    if engine not in ENGINES:
+        raise ValueError("Unknown backend engine {!r}, expected one of {}".format(engine, ENGINES))
+
+    backlog = socket.SOMAXCONN if engine == "selector" else 50
+    reuse_port = processes > 1 and prefork.can_reuse_port()
+    try:
+        # With SO_REUSEPORT this only checks the port is free, every worker
+        # binds its own socket.
+        server = prefork.open_listener(ip, port, backlog, reuse_port)
+    except socket.error as e:
+        print("Socket error: {}".format(e))
+        return
+
+    if processes <= 1 or not prefork.available():
+        serve_backend(server, ip, port, routes, engine, workers, queue_size)
+        return
+
+    if reuse_port:
+        server.close()
+
+    def worker(slot):
+        listener = prefork.open_listener(ip, port, backlog, True) if reuse_port else server
+        serve_backend(listener, ip, port, routes, engine, workers, queue_size, websocket=slot == 0)
+
+    print("[Backend] Pre-forking {} processes ({})".format(
+        processes, "SO_REUSEPORT" if reuse_port else "shared socket"))
+    prefork.Supervisor(processes, worker, name="Backend").run()
+
+def create_backend(ip, port, routes={}, engine=DEFAULT_ENGINE, workers=DEFAULT_WORKERS,
+                   queue_size=DEFAULT_QUEUE_SIZE, processes=prefork.DEFAULT_PROCESSES):
     """
     Entry point for creating and running the backend server.
 
     :param ip (str): IP address to bind the server.
     :param port (int): Port number to listen on.
     :param routes (dict, optional): Dictionary of route handlers. Defaults to empty dict.
+    :param engine (str, optional): Connection engine, ``pool``, ``selector`` or ``thread``.
+    :param workers (int, optional): Worker threads for the ``pool`` and ``selector`` engines.
+    :param queue_size (int, optional): Bound of the pending-connection queue.
+    :param processes (int, optional): Pre-forked worker processes.
     """
 
-    run_backend(ip, port, routes)
\ No newline at end of file
+    run_backend(ip, port, routes, engine=engine, workers=workers, queue_size=queue_size,
+                processes=processes)
@@ -0,0 +1,299 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.balancer
+~~~~~~~~~~~~~~~~~
+
+This module provides the load-balancing policies of the proxy. A host block
+of ``config/proxy.conf`` with several ``proxy_pass`` lines gets one
+:class:`Balancer <Balancer>`, which keeps per-upstream in-flight counters and
+picks the upstream of every request with the block's ``dist_policy``:
+
+- ``round-robin`` (default): upstreams in turn.
+- ``weighted``: smooth weighted round-robin on the ``weight=N`` parameters.
+- ``least-conn``: fewest in-flight requests relative to the weight.
+- ``ip-hash``: consistent hashing on the client IP (sticky routing).
+- ``cookie-hash <name>``: consistent hashing on a cookie, e.g. ``session_token``,
+  falling back to the client IP when the cookie is missing.
+
+Upstreams ejected by their :class:`CircuitBreaker <CircuitBreaker>` are
+skipped, and re-admitted ones get a reduced share of traffic until their
+slow start is over. When every upstream is ejected the balancer fails open
+and picks among all of them.
+
+Example block::
+
+    host "app2.local" {
+        proxy_pass http://192.168.56.210:9002 weight=3;
+        proxy_pass http://192.168.56.220:9002;
+        dist_policy least-conn
+    }
+
+Usage Example:
+--------------
+>>> balancer = Balancer.from_config(["10.0.0.1:9000", "10.0.0.2:9000"], "round-robin")
+>>> upstream = balancer.pick(client_ip, headers)
+>>> with balancer.track(upstream):
+...     relay_request(upstream.host, upstream.port, ...)
+
+"""
+
+import bisect
+import hashlib
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from .health import CircuitBreaker
+
+#: Virtual nodes per unit of weight on the consistent hash ring.
+HASH_REPLICAS = 160
+
+#: Policy used when a host block does not set ``dist_policy``.
+DEFAULT_POLICY = "round-robin"
+
+
+def _hash(key):
+    """Stable 32-bit hash of a string (``hash()`` is salted per process)."""
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:4], "big")
+
+
+def parse_upstream(entry):
+    """
+    Parses a ``proxy_pass`` target and its parameters.
+
+    :param entry (str): e.g. ``'127.0.0.1:9001'`` or ``'127.0.0.1:9001 weight=3'``.
+
+    :rtype tuple: (host, port, weight).
+    """
+    address, *params = entry.split()
+    host, _, port = address.rpartition(":")
+    weight = 1
+    for param in params:
+        name, _, value = param.partition("=")
+        if name == "weight":
+            weight = max(int(value), 1)
+    return host, int(port), weight
+
+
+class Upstream:
+    """
+    A backend of a :class:`Balancer <Balancer>`.
+
+    Attributes:
+        host (str): Backend IP address.
+        port (int): Backend port.
+        weight (int): Relative capacity.
+        inflight (int): Requests currently relayed to the backend.
+        breaker (CircuitBreaker): Health state of the backend.
+    """
+
+    __slots__ = ("host", "port", "weight", "inflight", "current_weight", "breaker")
+
+    def __init__(self, host, port, weight=1):
+        self.host = host
+        self.port = port
+        self.weight = weight
+        self.inflight = 0
+        self.current_weight = 0
+        self.breaker = CircuitBreaker()
+
+    def __repr__(self):
+        return "<Upstream {}:{} weight={} inflight={}>".format(
+            self.host, self.port, self.weight, self.inflight)
+
+
+class Balancer:
+    """
+    The :class:`Balancer <Balancer>` object spreads the requests of one host
+    block over its upstreams. All methods are thread-safe.
+
+    Attributes:
+        upstreams (list): :class:`Upstream <Upstream>` objects.
+        policy (str): Policy name.
+        cookie (str): Cookie hashed by the ``cookie-hash`` policy.
+    """
+
+    def __init__(self, upstreams, policy=DEFAULT_POLICY, cookie=None):
+        """
+        Initialize a new Balancer instance.
+
+        :param upstreams (list): :class:`Upstream <Upstream>` objects.
+        :param policy (str): Policy name, see :data:`POLICIES`.
+        :param cookie (str): Cookie name for ``cookie-hash``.
+        """
+        if policy not in POLICIES:
+            raise ValueError("Unknown dist_policy {!r}".format(policy))
+        if policy == "cookie-hash" and not cookie:
+            raise ValueError("cookie-hash needs a cookie name")
+        self.upstreams = list(upstreams)
+        self.policy = policy
+        self.cookie = cookie
+        self.lock = threading.Lock()
+        self.next = 0
+        self._pick = getattr(self, POLICIES[policy])
+
+        self.ring = []
+        self.ring_upstreams = []
+        if policy in ("ip-hash", "cookie-hash"):
+            points = sorted(
+                (_hash("{}:{}#{}".format(u.host, u.port, i)), n)
+                for n, u in enumerate(self.upstreams)
+                for i in range(HASH_REPLICAS * u.weight))
+            self.ring = [point for point, _ in points]
+            self.ring_upstreams = [self.upstreams[n] for _, n in points]
+
+    @classmethod
+    def from_config(cls, proxy_map, policy=DEFAULT_POLICY):
+        """
+        Builds a balancer from the parsed ``proxy_pass`` and ``dist_policy``.
+
+        :param proxy_map (list): ``proxy_pass`` targets, see :func:`parse_upstream`.
+        :param policy (str): ``dist_policy`` value, e.g. ``'cookie-hash session_token'``.
+
+        :rtype Balancer: the balancer.
+        """
+        name, _, arg = (policy or DEFAULT_POLICY).partition(" ")
+        upstreams = [Upstream(*parse_upstream(entry)) for entry in proxy_map]
+        return cls(upstreams, name, arg.strip() or None)
+
+    def pick(self, client_ip=None, headers=None, exclude=()):
+        """
+        Chooses the upstream of a request.
+
+        :param client_ip (str): client address, for ``ip-hash``.
+        :param headers (dict): lower-cased request headers, for ``cookie-hash``.
+        :param exclude (iterable): upstreams already tried for this request.
+
+        :rtype Upstream: the chosen upstream, or None if none is left.
+        """
+        candidates = [u for u in self.upstreams if u not in exclude]
+        if not candidates:
+            return None
+
+        now = time.monotonic()
+        shares = {u: u.breaker.admission(now) for u in candidates}
+        healthy = [u for u in candidates if shares[u] > 0]
+        if healthy:
+            candidates = healthy
+        else:
+            shares = dict.fromkeys(candidates, 1.0)
+
+        with self.lock:
+            upstream = self._pick(candidates, shares, client_ip, headers or {})
+        upstream.breaker.picked(now)
+        return upstream
+
+    def report(self, upstream, ok):
+        """
+        Passive health check: records the outcome of a relayed request.
+
+        :param upstream (Upstream): upstream the request was sent to.
+        :param ok (bool): False if the upstream failed to answer.
+        """
+        if ok:
+            upstream.breaker.success()
+        else:
+            upstream.breaker.failure()
+
+    @contextmanager
+    def track(self, upstream):
+        """
+        Counts a request as in flight on ``upstream`` while the block runs.
+        """
+        with self.lock:
+            upstream.inflight += 1
+        try:
+            yield upstream
+        finally:
+            with self.lock:
+                upstream.inflight -= 1
+
+    def _round_robin(self, upstreams, shares, client_ip, headers):
+        # An upstream in slow start is skipped in proportion to its share.
+        for _ in range(len(upstreams)):
+            upstream = upstreams[self.next % len(upstreams)]
+            self.next += 1
+            if shares[upstream] >= 1.0 or random.random() < shares[upstream]:
+                return upstream
+        return upstream
+
+    def _weighted(self, upstreams, shares, client_ip, headers):
+        # Smooth weighted round-robin: heavy upstreams are interleaved
+        # with the others instead of being picked in bursts.
+        total = 0
+        best = None
+        for upstream in upstreams:
+            weight = upstream.weight * shares[upstream]
+            upstream.current_weight += weight
+            total += weight
+            if best is None or upstream.current_weight > best.current_weight:
+                best = upstream
+        best.current_weight -= total
+        return best
+
+    def _least_conn(self, upstreams, shares, client_ip, headers):
+        # Ties are broken in round-robin order so idle upstreams share load.
+        count = len(upstreams)
+        start = self.next
+        self.next += 1
+        best, best_load = None, None
+        for i in range(count):
+            upstream = upstreams[(start + i) % count]
+            load = upstream.inflight / (upstream.weight * shares[upstream])
+            if best is None or load < best_load:
+                best, best_load = upstream, load
+        return best
+
+    def _hash_key(self, client_ip, headers):
+        if self.cookie:
+            for item in headers.get("cookie", "").split(";"):
+                name, _, value = item.strip().partition("=")
+                if name == self.cookie and value:
+                    return value
+        return client_ip or ""
+
+    def _consistent_hash(self, upstreams, shares, client_ip, headers):
+        # Walk the ring past skipped upstreams. During slow start the same
+        # keys keep being admitted as the share grows, so stickiness holds.
+        point = _hash(self._hash_key(client_ip, headers))
+        index = bisect.bisect(self.ring, point)
+        admitted = (point % 1000) / 1000.0
+        allowed = set(upstreams)
+        fallback = None
+        for i in range(len(self.ring)):
+            upstream = self.ring_upstreams[(index + i) % len(self.ring)]
+            if upstream in allowed:
+                if shares[upstream] >= 1.0 or admitted < shares[upstream]:
+                    return upstream
+                fallback = fallback or upstream
+        return fallback
+
+    def stats(self):
+        """
+        :rtype list: per-upstream address, weight and in-flight requests.
+        """
+        with self.lock:
+            return [dict(u.breaker.stats(), upstream="{}:{}".format(u.host, u.port),
+                         weight=u.weight, inflight=u.inflight) for u in self.upstreams]
+
+
+#: Policy name to :class:`Balancer <Balancer>` method.
+POLICIES = {
+    "round-robin": "_round_robin",
+    "weighted": "_weighted",
+    "least-conn": "_least_conn",
+    "ip-hash": "_consistent_hash",
+    "cookie-hash": "_consistent_hash",
+}
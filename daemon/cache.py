@@ -0,0 +1,615 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.cache
+~~~~~~~~~~~~~~~~~
+
+This module provides the response cache of the proxy. Responses to ``GET``
+requests are stored when the upstream allows it (``Cache-Control`` /
+``Expires``, no ``private``, ``no-store`` or ``Set-Cookie``; ``public`` for
+a request carrying a ``Cookie``) in a memory
+LRU bounded by size, with an optional disk tier receiving the entries
+evicted from memory and those too large for it. The disk tier lasts for the
+life of the process, its directory is cleared on start.
+
+Fresh entries are answered without contacting the upstream. Stale entries
+carrying an ``ETag`` or ``Last-Modified`` are revalidated with a conditional
+request, and a ``304`` refreshes them. Responses with ``Vary`` are stored
+per value of the listed request headers (``Accept-Encoding`` for the
+compressed static files). Requests carrying a ``Cookie`` are only answered
+with ``public`` entries.
+
+Concurrent misses of the same key are coalesced: the first request fetches
+from the upstream, the others wait (up to ``lock_timeout``) and are answered
+from the stored entry. The key of a miss is derived from the ``Vary`` names
+known at lookup time and the response is stored under that same key, unless
+its ``Vary`` differs (first fetch of a URL); waiters then look up again.
+
+Usage Example:
+--------------
+>>> cache = ResponseCache(max_bytes=64 * 1024 * 1024, disk_dir="/tmp/weaprous-cache")
+>>> lookup = cache.lookup("app1.local", head, headers)
+>>> lookup.hit
+False
+>>> cache.stats()["misses"]
+1
+
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+from .httpreader import parse_headers
+
+#: Total bytes of responses kept in memory.
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+#: Largest response kept in memory, larger ones only go to the disk tier.
+DEFAULT_MAX_ENTRY_SIZE = 1024 * 1024
+
+#: Total bytes of the disk tier, and its largest response.
+DEFAULT_DISK_SIZE = 512 * 1024 * 1024
+DEFAULT_MAX_DISK_ENTRY_SIZE = 64 * 1024 * 1024
+
+#: Seconds a request waits for a concurrent fetch of the same key.
+DEFAULT_LOCK_TIMEOUT = 5
+
+#: Statuses stored when the response allows it.
+CACHEABLE_STATUSES = (200, 203, 301)
+
+#: Headers of a 304 replacing the stored ones.
+REFRESHED_HEADERS = ("cache-control", "expires", "etag", "last-modified", "date", "vary")
+
+_DISK_SUFFIX = ".cache"
+
+
+def parse_cache_control(value):
+    """
+    :param value (str): ``Cache-Control`` header value.
+
+    :rtype dict: lower-cased directive to its value (None without one).
+    """
+    directives = {}
+    for item in value.split(","):
+        name, sep, arg = item.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') if sep else None
+    return directives
+
+
+def _seconds(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers):
+    """
+    Seconds a response may be served without revalidation.
+
+    :param headers (dict): lower-cased response headers.
+
+    :rtype int: lifetime, 0 for ``no-cache`` or no explicit freshness.
+    """
+    cc = parse_cache_control(headers.get("cache-control", ""))
+    if "no-cache" in cc:
+        return 0
+    for directive in ("s-maxage", "max-age"):
+        lifetime = _seconds(cc.get(directive))
+        if lifetime is not None:
+            return max(lifetime - (_seconds(headers.get("age")) or 0), 0)
+    if "expires" in headers:
+        try:
+            expires = parsedate_to_datetime(headers["expires"]).timestamp()
+            date = parsedate_to_datetime(headers["date"]).timestamp() if "date" in headers else time.time()
+        except (TypeError, ValueError, IndexError):
+            return 0
+        return max(int(expires - date), 0)
+    return 0
+
+
+def storable(status, headers, lifetime=None, cookie=False):
+    """
+    :param status (int): response status.
+    :param headers (dict): lower-cased response headers.
+    :param lifetime (int): configured lifetime, ignores ``no-cache`` and
+                           the missing freshness of the response.
+    :param cookie (bool): True if the request carried a ``Cookie``, the
+                          response must then be ``public``.
+
+    :rtype bool: True if a shared cache may store the response.
+    """
+    if status not in CACHEABLE_STATUSES or "set-cookie" in headers:
+        return False
+    if headers.get("vary", "").strip() == "*":
+        return False
+    cc = parse_cache_control(headers.get("cache-control", ""))
+    if "no-store" in cc or "private" in cc:
+        return False
+    if cookie and "public" not in cc:
+        return False
+    if lifetime:
+        return True
+    # Without freshness the entry is only useful if it can be revalidated.
+    return freshness_lifetime(headers) > 0 or "etag" in headers or "last-modified" in headers
+
+
+def vary_names(headers):
+    """
+    :param headers (dict): lower-cased response headers.
+
+    :rtype tuple: sorted lower-cased request header names of ``Vary``.
+    """
+    return tuple(sorted(name.strip().lower() for name in headers.get("vary", "").split(",")
+                        if name.strip()))
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an ``If-None-Match`` value against an ETag."""
+    strip = lambda tag: tag[2:] if tag.startswith("W/") else tag
+    tags = [strip(tag.strip()) for tag in if_none_match.split(",")]
+    return "*" in tags or strip(etag) in tags
+
+
+class CacheEntry:
+    """
+    A stored response.
+
+    Attributes:
+        head (bytes): Response status line and headers, without the blank line.
+        body (bytes): Response body as sent by the upstream, None while on disk.
+        size (int): Size of head and body.
+        stored (float): ``time.monotonic()`` of the store or last revalidation.
+        lifetime (int): Freshness lifetime in seconds.
+        etag (str): ``ETag`` validator, if any.
+        last_modified (str): ``Last-Modified`` validator, if any.
+        public (bool): True if marked ``public``, usable for requests with a ``Cookie``.
+        path (str): File of the entry in the disk tier.
+    """
+
+    __slots__ = ("head", "body", "size", "stored", "lifetime", "etag", "last_modified",
+                 "public", "path")
+
+    def __init__(self, head, body, stored, lifetime, etag=None, last_modified=None,
+                 public=False):
+        self.head = head
+        self.body = body
+        self.size = len(head) + len(body)
+        self.stored = stored
+        self.lifetime = lifetime
+        self.etag = etag
+        self.last_modified = last_modified
+        self.public = public
+        self.path = None
+
+    def age(self, now):
+        return int(now - self.stored)
+
+    def is_fresh(self, now):
+        return now - self.stored < self.lifetime
+
+    def validators(self):
+        """
+        :rtype dict: conditional request headers revalidating the entry,
+                     None for a missing validator (the client's is removed).
+        """
+        return {"If-None-Match": self.etag, "If-Modified-Since": self.last_modified}
+
+    def can_revalidate(self):
+        return self.etag is not None or self.last_modified is not None
+
+    def not_modified_head(self):
+        """
+        :rtype bytes: header block of a ``304`` for the entry.
+        """
+        lines = [b"HTTP/1.1 304 Not Modified"]
+        for line in self.head.split(b"\r\n")[1:]:
+            if line.split(b":", 1)[0].strip().lower().decode("latin-1") in REFRESHED_HEADERS:
+                lines.append(line)
+        return b"\r\n".join(lines)
+
+    def not_modified(self, headers):
+        """
+        :param headers (dict): lower-cased request headers.
+
+        :rtype bool: True if the client's conditional request matches the entry.
+        """
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            return self.etag is not None and etag_matches(if_none_match, self.etag)
+        since = headers.get("if-modified-since")
+        if since and self.last_modified:
+            try:
+                return parsedate_to_datetime(self.last_modified) <= parsedate_to_datetime(since)
+            except (TypeError, ValueError, IndexError):
+                return False
+        return False
+
+
+class CacheLookup:
+    """
+    Result of :meth:`ResponseCache.lookup` for one request.
+
+    Attributes:
+        key (tuple): Cache key of the request, also the key of its fill lock.
+        base (tuple): Host and request target, the key without ``Vary`` values.
+        names (tuple): ``Vary`` header names ``key`` was derived with.
+        entry (CacheEntry): Fresh entry (``hit``) or stale one to revalidate.
+        hit (bool): True if ``entry`` can be sent as is.
+        locked (bool): True if this request holds the fill lock of ``key``.
+        lifetime (int): Configured lifetime overriding the upstream's freshness.
+        cookie (bool): True if the request carries a ``Cookie``.
+    """
+
+    __slots__ = ("key", "base", "names", "entry", "hit", "locked", "lifetime", "cookie")
+
+    def __init__(self, key, base, names=(), entry=None, hit=False, locked=False,
+                 lifetime=None, cookie=False):
+        self.key = key
+        self.base = base
+        self.names = names
+        self.entry = entry
+        self.hit = hit
+        self.locked = locked
+        self.lifetime = lifetime
+        self.cookie = cookie
+
+
+class ResponseCache:
+    """
+    The :class:`ResponseCache <ResponseCache>` object is a thread-safe HTTP
+    cache: a memory LRU bounded by size plus an optional disk LRU.
+
+    Attributes:
+        max_bytes (int): Total memory size limit.
+        max_entry_size (int): Largest entry kept in memory.
+        disk_dir (str): Directory of the disk tier, None disables it.
+        disk_bytes (int): Total disk size limit.
+        max_disk_entry_size (int): Largest entry kept on disk.
+        lock_timeout (float): Seconds a request waits for a concurrent fetch.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_SIZE, max_entry_size=DEFAULT_MAX_ENTRY_SIZE,
+                 disk_dir=None, disk_bytes=DEFAULT_DISK_SIZE,
+                 max_disk_entry_size=DEFAULT_MAX_DISK_ENTRY_SIZE, lock_timeout=DEFAULT_LOCK_TIMEOUT):
+        """
+        Initialize a new ResponseCache instance.
+
+        :param max_bytes (int): Total memory size limit.
+        :param max_entry_size (int): Largest entry kept in memory.
+        :param disk_dir (str): Directory of the disk tier, None disables it.
+        :param disk_bytes (int): Total disk size limit.
+        :param max_disk_entry_size (int): Largest entry kept on disk.
+        :param lock_timeout (float): Seconds a request waits for a concurrent fetch.
+        """
+        self.max_bytes = max_bytes
+        self.max_entry_size = min(max_entry_size, max_bytes)
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self.max_disk_entry_size = min(max_disk_entry_size, disk_bytes) if disk_dir else 0
+        self.lock_timeout = lock_timeout
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size = 0
+        self.disk_entries = OrderedDict()
+        self.disk_size = 0
+        self.vary = {}
+        self.filling = {}
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.coalesced = 0
+        self.stores = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            for name in os.listdir(disk_dir):
+                if name.endswith(_DISK_SUFFIX):
+                    self._unlink(os.path.join(disk_dir, name))
+
+    @property
+    def max_store_size(self):
+        """Largest response that can be stored in either tier."""
+        return max(self.max_entry_size, self.max_disk_entry_size)
+
+    def request_base(self, host, head, headers):
+        """
+        :param host (str): Host header of the request.
+        :param head (bytes): request header block.
+        :param headers (dict): lower-cased request headers.
+
+        :rtype tuple: (host, target) for a cacheable request, else None.
+        """
+        method, _, rest = head.partition(b" ")
+        if method != b"GET":
+            return None
+        if "authorization" in headers or "range" in headers:
+            return None
+        if "transfer-encoding" in headers or headers.get("content-length", "0") != "0":
+            return None
+        if "no-store" in parse_cache_control(headers.get("cache-control", "")):
+            return None
+        target = rest.split(b" ", 1)[0].decode("latin-1")
+        return host.lower(), target
+
+    def _key(self, base, headers, names):
+        return base + tuple(headers.get(name, "") for name in names)
+
+    def lookup(self, host, head, headers, lifetime=None):
+        """
+        Look a request up, taking the fill lock of its key on a miss.
+
+        When another request is filling the same key, waits for it and looks
+        up again. The caller must pass the result to :meth:`done`.
+
+        :param host (str): Host header of the request.
+        :param head (bytes): request header block.
+        :param headers (dict): lower-cased request headers.
+        :param lifetime (int): lifetime of the stored response, overriding
+                               the upstream's ``Cache-Control``.
+
+        A request carrying a ``Cookie`` only uses ``public`` entries and
+        neither takes nor waits for a fill lock: the response it gets may
+        not be storable.
+
+        :rtype CacheLookup: the lookup, or None if the request bypasses the cache.
+        """
+        base = self.request_base(host, head, headers)
+        if base is None:
+            return None
+        request_cc = parse_cache_control(headers.get("cache-control", ""))
+        revalidate = ("no-cache" in request_cc or request_cc.get("max-age") == "0"
+                      or "no-cache" in headers.get("pragma", "").lower())
+        cookie = "cookie" in headers
+
+        waited = False
+        while True:
+            with self.lock:
+                names = self.vary.get(base, ())
+            key = self._key(base, headers, names)
+            entry = self._get(key)
+            if entry is not None and cookie and not entry.public:
+                entry = None
+            now = time.monotonic()
+            if entry is not None and not revalidate and entry.is_fresh(now):
+                with self.lock:
+                    self.hits += 1
+                    if waited:
+                        self.coalesced += 1
+                return CacheLookup(key, base, names, entry, hit=True, lifetime=lifetime,
+                                   cookie=cookie)
+
+            with self.lock:
+                event = None if cookie else self.filling.get(key)
+                if event is None or waited:
+                    locked = event is None and not cookie
+                    if locked:
+                        self.filling[key] = threading.Event()
+                    self.misses += 1
+                    return CacheLookup(key, base, names, entry, locked=locked, lifetime=lifetime,
+                                       cookie=cookie)
+            # Another request fetches this key, wait and look up again.
+            event.wait(self.lock_timeout)
+            waited = True
+
+    def done(self, lookup):
+        """
+        Release the fill lock of a lookup, waking the requests waiting for it.
+
+        :param lookup (CacheLookup): result of :meth:`lookup`.
+        """
+        if lookup is None or not lookup.locked:
+            return
+        with self.lock:
+            event = self.filling.pop(lookup.key, None)
+        lookup.locked = False
+        if event is not None:
+            event.set()
+
+    def store(self, lookup, headers, head, body):
+        """
+        Store an upstream response.
+
+        :param lookup (CacheLookup): lookup of the request being answered.
+        :param headers (dict): lower-cased request headers.
+        :param head (bytes): response header block.
+        :param body (bytes): response body as sent by the upstream.
+
+        :rtype bool: True if the response was stored.
+        """
+        resp_headers = parse_headers(head)
+        status = int(head.split(None, 2)[1])
+        if not storable(status, resp_headers, lookup.lifetime, lookup.cookie):
+            return False
+        names = vary_names(resp_headers)
+        entry = self._entry(lookup, head, body, resp_headers)
+        if entry.size > self.max_store_size:
+            return False
+
+        with self.lock:
+            self.vary[lookup.base] = names
+            self.stores += 1
+        # Same derivation as the lookup: the entry lands under the fill lock's
+        # key unless the response brought other Vary names.
+        key = lookup.key if names == lookup.names else self._key(lookup.base, headers, names)
+        if entry.size > self.max_entry_size:
+            self._store_disk(key, entry)
+        else:
+            self._store_memory(key, entry)
+        return True
+
+    def refresh(self, lookup, head):
+        """
+        Update a stale entry from the ``304`` answering its revalidation.
+
+        :param lookup (CacheLookup): lookup holding the stale entry.
+        :param head (bytes): header block of the 304 response.
+
+        :rtype CacheEntry: the refreshed entry.
+        """
+        old = lookup.entry
+        updates = parse_headers(head)
+        replaced = {name for name in updates if name in REFRESHED_HEADERS}
+        name_of = lambda line: line.split(b":", 1)[0].strip().lower().decode("latin-1")
+        lines = [line for line in old.head.split(b"\r\n") if name_of(line) not in replaced]
+        lines += [line for line in head.split(b"\r\n")[1:] if name_of(line) in replaced]
+        new_head = b"\r\n".join(lines)
+        entry = self._entry(lookup, new_head, old.body, parse_headers(new_head))
+        with self.lock:
+            self.revalidated += 1
+        if entry.size > self.max_entry_size:
+            self._store_disk(lookup.key, entry)
+        else:
+            self._store_memory(lookup.key, entry)
+        return entry
+
+    def _entry(self, lookup, head, body, resp_headers):
+        lifetime = lookup.lifetime
+        if lifetime is None:
+            lifetime = freshness_lifetime(resp_headers)
+        public = "public" in parse_cache_control(resp_headers.get("cache-control", ""))
+        return CacheEntry(head, body, time.monotonic(), lifetime, resp_headers.get("etag"),
+                          resp_headers.get("last-modified"), public)
+
+    def _get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+            entry = self.disk_entries.get(key)
+            if entry is None:
+                return None
+            self.disk_entries.move_to_end(key)
+            path = entry.path
+
+        try:
+            with open(path, "rb") as f:
+                body = f.read()
+        except OSError:
+            return None
+        loaded = CacheEntry(entry.head, body, entry.stored, entry.lifetime,
+                            entry.etag, entry.last_modified, entry.public)
+        with self.lock:
+            self.disk_hits += 1
+        if loaded.size <= self.max_entry_size:
+            self._store_memory(key, loaded)
+        return loaded
+
+    def _store_memory(self, key, entry):
+        evicted = []
+        with self.lock:
+            stale_path = self._forget(key)
+            self.entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes and self.entries:
+                old_key, old = self.entries.popitem(last=False)
+                self.size -= old.size
+                self.evictions += 1
+                evicted.append((old_key, old))
+        if stale_path:
+            self._unlink(stale_path)
+        # Entries leaving memory move to the disk tier.
+        for old_key, old in evicted:
+            if old.size <= self.max_disk_entry_size:
+                self._store_disk(old_key, old)
+
+    def _store_disk(self, key, entry):
+        if entry.size > self.max_disk_entry_size:
+            return
+        path = os.path.join(self.disk_dir,
+                            hashlib.sha1(repr(key).encode()).hexdigest() + _DISK_SUFFIX)
+        tmp = "{}.{}.tmp".format(path, threading.get_ident())
+        try:
+            with open(tmp, "wb") as f:
+                f.write(entry.body)
+            os.replace(tmp, path)
+        except OSError as e:
+            print("[Cache] Disk store failed: {}".format(e))
+            self._unlink(tmp)
+            return
+
+        stub = CacheEntry(entry.head, b"", entry.stored, entry.lifetime, entry.etag,
+                          entry.last_modified, entry.public)
+        stub.size = entry.size
+        stub.path = path
+        removed = []
+        with self.lock:
+            if key in self.entries:
+                # Stored in memory again meanwhile, the disk copy is useless.
+                removed.append(path)
+            else:
+                old = self.disk_entries.pop(key, None)
+                if old is not None:
+                    self.disk_size -= old.size
+                self.disk_entries[key] = stub
+                self.disk_size += stub.size
+                while self.disk_size > self.disk_bytes and self.disk_entries:
+                    _, old = self.disk_entries.popitem(last=False)
+                    self.disk_size -= old.size
+                    self.disk_evictions += 1
+                    removed.append(old.path)
+        for old_path in removed:
+            self._unlink(old_path)
+
+    def _forget(self, key):
+        """
+        Drop ``key`` from both tiers, with the lock held.
+
+        :rtype str: file of the dropped disk copy to unlink, if any.
+        """
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= old.size
+        old = self.disk_entries.pop(key, None)
+        if old is not None:
+            self.disk_size -= old.size
+            return old.path
+        return None
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        """
+        :rtype dict: entries and bytes per tier, hits, misses, revalidations,
+                     coalesced requests, stores and evictions.
+        """
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "disk_entries": len(self.disk_entries),
+                "disk_bytes": self.disk_size,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "revalidated": self.revalidated,
+                "coalesced": self.coalesced,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+            }
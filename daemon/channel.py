@@ -1,96 +1,90 @@
-import threading 
 import time
-import json 
 
-class ChannelManager: 
+from .sessionstore import MemoryStore
+
+#: Namespace of the channels: name to creator and creation time.
+CHANNELS = "channels"
+
+#: Prefix of the namespace of each channel's members: username to join time.
+MEMBERS = "channel:"
+
+
+class ChannelManager:
     """
-    Manage channels and members
+    Manage channels and members, kept in a session store so that every
+    worker process sees the same channels when the store is shared.
     """
-    
-    def __init__(self):
-        self.channel = {}
-        self.user_channels = {}
-        self.lock = threading.Lock()
-        
-        
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else MemoryStore()
+
+    def set_store(self, store):
+        """
+        Replace the storage backend (before serving).
+
+        :param store (SessionStore): the new store, e.g. from :func:`open_store`.
+        """
+        self.store = store
+
     def create_channel(self, channel_name, creator_username):
         """
         Create a new channel.
-        
+
         :param channel_name: The name of the channel to create (unique)
         :param creator_username: The username of the channel creator
-        :return: True if create successful , create this channel 
+        :return: True if create successful , create this channel
         """
-
-        with self.lock: 
-            if channel_name in self.channel:
-                return False
-            self.channel[channel_name] = {
-                'creator' : creator_username,
-                'members' : [creator_username],
-                'created_at': time.time()
-            }
-        if creator_username not in self.user_channels: 
-            self.user_channels[creator_username] = []
-        self.user_channels[creator_username].append(channel_name)
+        now = time.time()
+        if not self.store.add(CHANNELS, channel_name,
+                              {'creator': creator_username, 'created_at': now}):
+            return False
+        self.store.put(MEMBERS + channel_name, creator_username, now)
         print(f"[ChannelManager] Channel '{channel_name}' created by {creator_username}")
         return True
-    
+
     def list_all_channels(self):
         """
         Get all active channels in this app
-        
+
         :return: List of channels
         """
-        with self.lock:
-            channels = []
-            for channel_name, channel_info in self.channel.items():
-                channels.append({
-                    'name' : channel_name,
-                    'creator': channel_info['creator'], 
-                    'members_count': len(channel_info['members']),
-                    'created_at': channel_info['created_at']
-                })
-            return channels 
-    
+        channels = []
+        for channel_name, channel_info in self.store.items(CHANNELS).items():
+            channels.append({
+                'name' : channel_name,
+                'creator': channel_info['creator'],
+                'members_count': len(self.store.items(MEMBERS + channel_name)),
+                'created_at': channel_info['created_at']
+            })
+        return channels
+
     def join_channel(self, channel_name, username):
         """
         Join a channel.
-        
+
         :param channel_name: The name of the channel to join
-        :param username: The username of the user joining the channel       
-        :return: True if join successful 
+        :param username: The username of the user joining the channel
+        :return: True if join successful
         """
-        with self.lock: 
-            if channel_name not in self.channel:
-                return False
-
-            channel_info = self.channel[channel_name]
-            if username not in channel_info['members']:
-                channel_info['members'].append(channel_name)
-                
-                if username not in self.user_channels: 
-                    self.user_channels[username] = []
-                self.user_channels[username].append(channel_name)
-                
-                print(f"[ChannelManager] User '{username}' joined channel '{channel_name}'")
-            else:
-                print(f"[ChannelManager] User ''{username}' is already in channel '{channel_name}'")
-        return True 
-    
-    
-    def get_channel_members(self, channel_name): 
+        if self.store.get(CHANNELS, channel_name) is None:
+            return False
+
+        if self.store.add(MEMBERS + channel_name, username, time.time()):
+            print(f"[ChannelManager] User '{username}' joined channel '{channel_name}'")
+        else:
+            print(f"[ChannelManager] User '{username}' is already in channel '{channel_name}'")
+        return True
+
+
+    def get_channel_members(self, channel_name):
         """"
         Get the members of a channel.
-        
-        :param channel_name: the name of channel 
-        :return: lis of usernames have joined this channel
+
+        :param channel_name: the name of channel
+        :return: lis of usernames have joined this channel, in join order
         """
-        
-        with self.lock:
-            if channel_name not in self.channel:
-                return []
-            return self.channel[channel_name]['members']
-        
-
-channel_manager = ChannelManager()
\ No newline at end of file
+        members = self.store.items(MEMBERS + channel_name)
+        return sorted(members, key=members.get)
+
+
+channel_manager = ChannelManager()
@@ -0,0 +1,190 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.compression
+~~~~~~~~~~~~~~~~~
+
+This module provides ``Content-Encoding`` support for responses:
+``Accept-Encoding`` negotiation, gzip compression (and brotli when the
+optional ``brotli`` package is installed), and a bounded cache of
+precompressed static file variants keyed by path and encoding, tagged with
+the file mtime, so a static file is compressed once per version instead of
+once per request.
+
+Usage Example:
+--------------
+>>> encoding = negotiate("gzip, deflate, br")
+>>> body = compress(b"..." * 1000, encoding)
+
+"""
+
+import gzip
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+#: Bodies smaller than this are sent uncompressed.
+MIN_COMPRESS_SIZE = 1024
+
+#: gzip level used for dynamic (per request) bodies.
+GZIP_LEVEL = 6
+
+#: gzip level used for cached static variants, compressed once.
+STATIC_GZIP_LEVEL = 9
+
+#: Total bytes of precompressed static variants kept in memory.
+DEFAULT_VARIANT_CACHE_SIZE = 16 * 1024 * 1024
+
+#: Static variants (compressed or not worth compressing) kept in memory.
+DEFAULT_VARIANT_CACHE_ENTRIES = 4096
+
+#: MIME types (besides text/*) worth compressing.
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+}
+
+
+def supported_encodings():
+    """
+    :rtype tuple: encodings this server can produce, by preference.
+    """
+    if brotli is not None:
+        return ('br', 'gzip')
+    return ('gzip',)
+
+
+def is_compressible(mime_type):
+    """
+    :params mime_type (str): response MIME type.
+
+    :rtype bool: True if the type benefits from compression.
+    """
+    mime_type = mime_type.split(';', 1)[0].strip()
+    return mime_type.startswith('text/') or mime_type in COMPRESSIBLE_TYPES
+
+
+def negotiate(accept_encoding):
+    """
+    Picks a content coding from an ``Accept-Encoding`` header.
+
+    :params accept_encoding (str): request header value (may be empty).
+
+    :rtype str: 'br' or 'gzip', or None to send the identity coding.
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data, encoding, level=GZIP_LEVEL):
+    """
+    Compresses a body with the given content coding.
+
+    :params data (bytes): body to compress.
+    :params encoding (str): 'gzip' or 'br'.
+    :params level (int): gzip level.
+
+    :rtype bytes: compressed body.
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=5 if level < STATIC_GZIP_LEVEL else 11)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class VariantCache:
+    """
+    The :class:`VariantCache <VariantCache>` object keeps compressed copies of
+    static files in an LRU bounded by total size and by entry count (files
+    not worth compressing are remembered as None, which takes no bytes). One
+    variant is kept per path and encoding, tagged with the file mtime: a
+    modified file replaces its old variant and never serves a stale one.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_VARIANT_CACHE_SIZE,
+                 max_entries=DEFAULT_VARIANT_CACHE_ENTRIES):
+        """
+        Initialize a new VariantCache instance.
+
+        :param max_bytes (int): Total size limit of cached variants.
+        :param max_entries (int): Variants (and files not worth compressing) kept.
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # {(path, encoding): (mtime, variant or None)}
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, entry, encoding):
+        """
+        Returns the compressed variant of a cached static file.
+
+        :param entry (FileEntry): file with in-memory content.
+        :param encoding (str): content coding.
+
+        :rtype bytes: the variant, or None if compressing does not pay off.
+        """
+        key = (entry.path, encoding)
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None and cached[0] == entry.mtime:
+                self.entries.move_to_end(key)
+                return cached[1]
+
+        data = compress(entry.content, encoding, STATIC_GZIP_LEVEL)
+        if len(data) >= entry.size:
+            data = None
+
+        with self.lock:
+            old = self.entries.get(key)
+            if old is not None and old[0] > entry.mtime:
+                # A newer version was cached meanwhile.
+                return data
+            if old is not None:
+                del self.entries[key]
+                self.size -= len(old[1]) if old[1] else 0
+            self.entries[key] = (entry.mtime, data)
+            self.size += len(data) if data else 0
+            while self.entries and (self.size > self.max_bytes
+                                    or len(self.entries) > self.max_entries):
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted) if evicted else 0
+        return data
+
+
+#: Process wide cache of precompressed static variants.
+variant_cache = VariantCache()
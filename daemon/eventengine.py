@@ -0,0 +1,240 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.eventengine
+~~~~~~~~~~~~~~~~~
+
+This module provides an event-driven connection engine built on Python's
+``selectors`` library. All client sockets are multiplexed on a single event
+loop thread, so an idle connection costs one file descriptor and a small
+bookkeeping object instead of a whole thread stack.
+
+A connection is handed off to a worker only once it becomes readable, i.e.
+when the client has actually sent a request. The worker runs the blocking
+dispatch routine (``HttpAdapter.handle_available`` for the backend), so route
+handlers and the ``routes`` dict keep working unchanged. When the dispatch
+routine keeps the connection alive, the socket is parked on the loop again
+until the next request arrives.
+
+The dispatch contract is ``dispatch(conn, addr, context) -> context``: the
+returned context (e.g. the connection's adapter) is handed back on the next
+dispatch of the same socket, ``None`` means the connection has been closed.
+Dispatch may also return a :class:`concurrent.futures.Future` when the reply
+waits on a coroutine: the worker is released, and once the future completes
+its result, a callable following the same contract, runs on a worker.
+
+Requirements:
+--------------
+- selectors: provides the epoll/kqueue/select abstraction.
+- workerpool: bounded worker threads for request dispatching.
+
+Usage Example:
+--------------
+>>> engine = EventEngine(server, dispatch=lambda conn, addr, context: ...)
+>>> engine.serve_forever()
+
+"""
+
+import selectors
+import socket
+import threading
+import time
+from concurrent.futures import Future
+
+from .workerpool import WorkerPool, DEFAULT_WORKERS, DEFAULT_QUEUE_SIZE
+
+#: Seconds a connection may stay idle (no request sent) before it is closed.
+DEFAULT_IDLE_TIMEOUT = 60
+
+
+class _Connection:
+    """Bookkeeping for a client socket parked on the event loop."""
+
+    __slots__ = ("conn", "addr", "context", "last_active")
+
+    def __init__(self, conn, addr):
+        self.conn = conn
+        self.addr = addr
+        self.context = None
+        self.last_active = time.monotonic()
+
+
+class EventEngine:
+    """
+    The :class:`EventEngine <EventEngine>` object multiplexes the listening
+    socket and every idle client socket on one selector, and dispatches
+    readable connections to a :class:`WorkerPool <WorkerPool>`.
+
+    Attributes:
+        server (socket): Listening socket, already bound and listening.
+        dispatch (callable): ``dispatch(conn, addr, context)`` blocking handler
+            returning the context to park the connection with, or None once
+            the connection is closed.
+        pool (WorkerPool): Worker threads and their bounded queue.
+        idle_timeout (float): Idle seconds before a parked socket is closed.
+    """
+
+    def __init__(self, server, dispatch, workers=DEFAULT_WORKERS,
+                 queue_size=DEFAULT_QUEUE_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        """
+        Initialize a new EventEngine instance.
+
+        :param server (socket): Listening socket.
+        :param dispatch (callable): Blocking connection handler.
+        :param workers (int): Number of worker threads.
+        :param queue_size (int): Readable connections allowed to wait for a worker.
+        :param idle_timeout (float): Idle timeout in seconds.
+        """
+        self.server = server
+        self.dispatch = dispatch
+        self.idle_timeout = idle_timeout
+        self.selector = selectors.DefaultSelector()
+        self.pool = WorkerPool(self._run, workers, queue_size, name="EventWorker")
+        self.connections = {}
+
+        # Workers hand kept-alive connections back through this list and
+        # wake the selector with a byte on the socket pair.
+        self.lock = threading.Lock()
+        self.returned = []
+        self.waker, self.wakeup = socket.socketpair()
+        self.waker.setblocking(False)
+        self.wakeup.setblocking(False)
+
+    def serve_forever(self):
+        """
+        Run the event loop: accept new clients, park them on the selector
+        and hand readable ones to the worker threads.
+        """
+        self.server.setblocking(False)
+        self.selector.register(self.server, selectors.EVENT_READ, None)
+        self.selector.register(self.wakeup, selectors.EVENT_READ, self.wakeup)
+        self.pool.start()
+        print("[EventEngine] Multiplexing connections with {}".format(
+            type(self.selector).__name__))
+
+        next_sweep = time.monotonic() + 1
+        try:
+            while True:
+                for key, _ in self.selector.select(timeout=1.0):
+                    if key.data is None:
+                        self._accept()
+                    elif key.data is self.wakeup:
+                        self._resume()
+                    else:
+                        self._handoff(key.data)
+
+                now = time.monotonic()
+                if now >= next_sweep:
+                    self._close_idle(now)
+                    next_sweep = now + 1
+        finally:
+            self.selector.close()
+
+    def _accept(self):
+        """Accept every pending client and park it on the selector."""
+        while True:
+            try:
+                conn, addr = self.server.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                # EMFILE and friends: keep serving the sockets we already have.
+                print("[EventEngine] Accept error: {}".format(e))
+                return
+
+            self._park(_Connection(conn, addr))
+
+    def _park(self, state):
+        """Register a connection on the selector until it becomes readable."""
+        state.conn.setblocking(False)
+        state.last_active = time.monotonic()
+        self.connections[state.conn.fileno()] = state
+        self.selector.register(state.conn, selectors.EVENT_READ, state)
+
+    def _resume(self):
+        """Park again the connections handed back by the workers."""
+        try:
+            while self.wakeup.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+        with self.lock:
+            returned, self.returned = self.returned, []
+        for state in returned:
+            self._park(state)
+
+    def _handoff(self, state):
+        """Detach a readable connection from the loop and dispatch it."""
+        self._forget(state)
+        state.conn.setblocking(True)
+        self.pool.submit(state.conn, state.addr, state)
+
+    def _run(self, conn, addr, state, pending=None):
+        """Worker-side wrapper: dispatch, then hand a kept-alive socket back."""
+        try:
+            if pending is None:
+                context = self.dispatch(conn, addr, state.context)
+            else:
+                context = pending.result()()
+        except Exception as e:
+            print("[EventEngine] Dispatch error for {}: {}".format(addr, e))
+            context = None
+            conn.close()
+
+        if isinstance(context, Future):
+            # Neither parked nor closed until the deferred reply is sent.
+            context.add_done_callback(
+                lambda future: self.pool.submit(conn, addr, state, future))
+            return
+
+        state.context = context
+        if state.context is None:
+            return
+
+        with self.lock:
+            self.returned.append(state)
+        try:
+            self.waker.send(b"\0")
+        except BlockingIOError:
+            # The wakeup pipe is full, the loop is going to drain it anyway.
+            pass
+
+    def _forget(self, state):
+        """Unregister a connection from the selector."""
+        self.connections.pop(state.conn.fileno(), None)
+        try:
+            self.selector.unregister(state.conn)
+        except (KeyError, ValueError):
+            pass
+
+    def _close_idle(self, now):
+        """Close parked connections that have been idle for too long."""
+        deadline = now - self.idle_timeout
+        for state in list(self.connections.values()):
+            if state.last_active < deadline:
+                self._forget(state)
+                try:
+                    state.conn.close()
+                except OSError:
+                    pass
+
+    def stats(self):
+        """
+        Snapshot of the engine state.
+
+        :rtype dict: parked connections plus the worker pool metrics.
+        """
+        stats = self.pool.stats()
+        stats["parked"] = len(self.connections)
+        return stats
@@ -0,0 +1,167 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.filecache
+~~~~~~~~~~~~~~~~~
+
+This module provides an in-memory cache for the static files served from
+``www/`` and ``static/``. Small files are kept in a size-bounded LRU and
+revalidated against the file's modification time on every lookup, so hot
+files (``p2p-agent.js``, HTML pages, images) are read from disk once.
+Each entry also carries its ``ETag`` and ``Last-Modified`` validators, so
+they are computed once per file version.
+Files above the per-file limit are never loaded: the returned entry only
+carries the metadata and the response streams them with ``sendfile``.
+
+Usage Example:
+--------------
+>>> entry = file_cache.get("www/index.html")
+>>> entry.size, entry.content is not None
+(1234, True)
+
+"""
+
+import os
+import stat
+import threading
+from collections import OrderedDict
+from email.utils import formatdate
+
+#: Total bytes of file content kept in memory.
+DEFAULT_CACHE_SIZE = 32 * 1024 * 1024
+
+#: Files larger than this are served with sendfile and never cached.
+DEFAULT_MAX_FILE_SIZE = 256 * 1024
+
+
+class FileEntry:
+    """
+    Metadata (and content, for cacheable files) of a static file.
+
+    Attributes:
+        path (str): File path on disk.
+        size (int): File size in bytes.
+        mtime (int): Modification time in nanoseconds.
+        content (bytes): File content, None for files served with sendfile.
+        etag (str): Strong validator derived from size and mtime.
+        last_modified (str): HTTP date of the modification time.
+    """
+
+    __slots__ = ("path", "size", "mtime", "content", "etag", "last_modified")
+
+    def __init__(self, path, size, mtime, content=None):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.content = content
+        self.etag = '"{:x}-{:x}"'.format(mtime, size)
+        self.last_modified = formatdate(mtime / 1e9, usegmt=True)
+
+
+class FileCache:
+    """
+    The :class:`FileCache <FileCache>` object is a thread-safe LRU of small
+    static files, bounded by the total size of the cached content.
+
+    Attributes:
+        max_bytes (int): Total content size limit.
+        max_file_size (int): Largest file kept in memory.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_SIZE, max_file_size=DEFAULT_MAX_FILE_SIZE):
+        """
+        Initialize a new FileCache instance.
+
+        :param max_bytes (int): Total content size limit.
+        :param max_file_size (int): Largest file kept in memory.
+        """
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        """
+        Look a file up, loading it if it is missing or modified on disk.
+
+        :param path (str): File path.
+
+        :rtype FileEntry: the entry, or None if the file does not exist.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.invalidate(path)
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry.mtime == st.st_mtime_ns and entry.size == st.st_size:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        if st.st_size > self.max_file_size:
+            self.invalidate(path)
+            return FileEntry(path, st.st_size, st.st_mtime_ns)
+
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except OSError:
+            return None
+
+        entry = FileEntry(path, len(content), st.st_mtime_ns, content)
+        with self.lock:
+            old = self.entries.pop(path, None)
+            if old is not None:
+                self.size -= old.size
+            self.entries[path] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted.size
+        return entry
+
+    def invalidate(self, path):
+        """
+        Drop a file from the cache.
+
+        :param path (str): File path.
+        """
+        with self.lock:
+            old = self.entries.pop(path, None)
+            if old is not None:
+                self.size -= old.size
+
+    def stats(self):
+        """
+        :rtype dict: cached files, cached bytes, hits and misses.
+        """
+        with self.lock:
+            return {
+                "files": len(self.entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+#: Process wide cache used by :class:`Response <Response>`.
+file_cache = FileCache()
@@ -0,0 +1,249 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.health
+~~~~~~~~~~~~~~~~~
+
+This module tracks the health of the proxy's upstreams so the balancer skips
+dead backends.
+
+Passive checks: every relayed request reports its outcome to the upstream's
+:class:`CircuitBreaker <CircuitBreaker>`. After ``max_fails`` consecutive
+failures the upstream is ejected for ``eject_time`` seconds (doubled on each
+new ejection, up to ``max_eject_time``). Once that time is over, one trial
+request per second is let through; a success closes the breaker and the
+upstream is re-admitted slowly, its share of traffic ramping from 10% to
+100% over ``slow_start`` seconds.
+
+Active checks: a :class:`HealthChecker <HealthChecker>` thread periodically
+sends ``GET /ping`` (exposed by ``apps/Hybridapi.py``) to every upstream and
+reports the result to the same breakers, so a backend is ejected before a
+live request hits it and re-admitted as soon as it answers again.
+
+Usage Example:
+--------------
+>>> breaker = CircuitBreaker()
+>>> breaker.admission(time.monotonic())
+1.0
+>>> HealthChecker(routing_table, interval=5).start()
+
+"""
+
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+#: Consecutive failures ejecting an upstream.
+DEFAULT_MAX_FAILS = 3
+
+#: Seconds of the first ejection, doubled on each new one up to the max.
+DEFAULT_EJECT_TIME = 10
+DEFAULT_MAX_EJECT_TIME = 60
+
+#: Seconds for a re-admitted upstream to get back its full share of traffic.
+DEFAULT_SLOW_START = 30
+
+#: Seconds between two trial requests to an upstream whose ejection expired.
+TRIAL_INTERVAL = 1.0
+
+#: Share of traffic given to an upstream right after re-admission.
+MIN_ADMISSION = 0.1
+
+#: Active check settings.
+DEFAULT_HEALTH_INTERVAL = 5
+DEFAULT_HEALTH_TIMEOUT = 2
+DEFAULT_HEALTH_PATH = "/ping"
+
+CLOSED = "up"
+OPEN = "down"
+HALF_OPEN = "trial"
+
+
+class CircuitBreaker:
+    """
+    The :class:`CircuitBreaker <CircuitBreaker>` object holds the health
+    state of one upstream. All methods are thread-safe.
+
+    Attributes:
+        state (str): ``up``, ``down`` (ejected) or ``trial``.
+        failures (int): Consecutive failures.
+        ejections (int): Consecutive ejections, for the back-off.
+    """
+
+    def __init__(self, max_fails=DEFAULT_MAX_FAILS, eject_time=DEFAULT_EJECT_TIME,
+                 max_eject_time=DEFAULT_MAX_EJECT_TIME, slow_start=DEFAULT_SLOW_START):
+        """
+        Initialize a new CircuitBreaker instance.
+
+        :param max_fails (int): Consecutive failures ejecting the upstream.
+        :param eject_time (float): Seconds of the first ejection.
+        :param max_eject_time (float): Longest ejection.
+        :param slow_start (float): Re-admission ramp in seconds.
+        """
+        self.max_fails = max_fails
+        self.eject_time = eject_time
+        self.max_eject_time = max_eject_time
+        self.slow_start = slow_start
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.ejections = 0
+        self.down_until = 0.0
+        self.next_trial = 0.0
+        self.recovered_at = None
+
+    def admission(self, now):
+        """
+        Share of its normal traffic the upstream may receive right now.
+
+        :param now (float): ``time.monotonic()``.
+
+        :rtype float: 0 while ejected, up to 1 once fully re-admitted.
+        """
+        with self.lock:
+            if self.state == CLOSED:
+                if self.recovered_at is None:
+                    return 1.0
+                ramp = (now - self.recovered_at) / self.slow_start if self.slow_start else 1.0
+                if ramp >= 1.0:
+                    self.recovered_at = None
+                    return 1.0
+                return max(ramp, MIN_ADMISSION)
+            if now < self.down_until or now < self.next_trial:
+                return 0.0
+            return MIN_ADMISSION
+
+    def picked(self, now):
+        """Record that a request was sent, the next trial has to wait."""
+        with self.lock:
+            if self.state != CLOSED:
+                self.state = HALF_OPEN
+                self.next_trial = now + TRIAL_INTERVAL
+
+    def success(self, now=None):
+        """Record a successful request or health check."""
+        with self.lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self.ejections = 0
+                self.recovered_at = time.monotonic() if now is None else now
+
+    def failure(self, now=None):
+        """Record a failed request or health check."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.max_fails):
+                self.ejections += 1
+                eject = min(self.eject_time * 2 ** (self.ejections - 1), self.max_eject_time)
+                self.state = OPEN
+                self.down_until = now + eject
+                self.next_trial = self.down_until
+                self.recovered_at = None
+
+    def stats(self):
+        """
+        :rtype dict: state, consecutive failures and ejections.
+        """
+        with self.lock:
+            return {"state": self.state, "failures": self.failures, "ejections": self.ejections}
+
+
+def check_upstream(host, port, path=DEFAULT_HEALTH_PATH, timeout=DEFAULT_HEALTH_TIMEOUT):
+    """
+    Sends one health check request to an upstream.
+
+    :param host (str): backend IP address.
+    :param port (int): backend port.
+    :param path (str): path answering 2xx/3xx when healthy.
+    :param timeout (float): connect and read timeout in seconds.
+
+    :rtype bool: True if the upstream answered with a 2xx or 3xx status.
+    """
+    request = ("GET {} HTTP/1.1\r\nHost: {}:{}\r\nConnection: close\r\n\r\n"
+               .format(path, host, port)).encode()
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as conn:
+            conn.sendall(request)
+            status_line = conn.recv(64).split(b"\r\n", 1)[0]
+        status = int(status_line.split(None, 2)[1])
+    except (OSError, ValueError, IndexError):
+        return False
+    return 200 <= status < 400
+
+
+class HealthChecker:
+    """
+    The :class:`HealthChecker <HealthChecker>` object actively checks the
+    upstreams of every balancer of a routing table in a daemon thread.
+
+    Attributes:
+        registry (RoutingTable): any object whose ``upstreams()`` are checked.
+        interval (float): Seconds between two rounds.
+        timeout (float): Timeout of each check.
+        path (str): Health check path.
+    """
+
+    def __init__(self, registry, interval=DEFAULT_HEALTH_INTERVAL,
+                 timeout=DEFAULT_HEALTH_TIMEOUT, path=DEFAULT_HEALTH_PATH, workers=8):
+        """
+        Initialize a new HealthChecker instance.
+
+        :param registry (RoutingTable): upstreams to check, read every round.
+        :param interval (float): Seconds between two rounds.
+        :param timeout (float): Timeout of each check.
+        :param path (str): Health check path.
+        :param workers (int): Checks run concurrently.
+        """
+        self.registry = registry
+        self.interval = interval
+        self.timeout = timeout
+        self.path = path
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="HealthCheck")
+        self.stopped = threading.Event()
+
+    def start(self):
+        """Start the checker thread, returns self."""
+        threading.Thread(target=self._run, daemon=True, name="HealthChecker").start()
+        return self
+
+    def stop(self):
+        """Stop after the current round."""
+        self.stopped.set()
+
+    def check_all(self):
+        """Run one round of checks and report the results to the breakers."""
+        upstreams = {}
+        for upstream in self.registry.upstreams():
+            upstreams.setdefault((upstream.host, upstream.port), []).append(upstream)
+
+        def check(address):
+            return address, check_upstream(address[0], address[1], self.path, self.timeout)
+
+        for address, healthy in self.executor.map(check, list(upstreams)):
+            for upstream in upstreams[address]:
+                if healthy:
+                    upstream.breaker.success()
+                else:
+                    if upstream.breaker.state == CLOSED:
+                        print("[Health] Upstream {}:{} failed its health check".format(*address))
+                    upstream.breaker.failure()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.check_all()
+            except Exception as e:
+                print("[Health] Check round failed: {}".format(e))
@@ -20,9 +20,25 @@ raw URL paths and RESTful route definitions, and integrates with
 Request and Response objects to handle client-server communication.
 """
 
+import socket
+import functools
+from concurrent.futures import Future
+
 from .request import Request
 from .response import Response
+from .httpreader import HttpReader, DEFAULT_MAX_HEADER_SIZE, DEFAULT_MAX_BODY_SIZE
 from .dictionary import CaseInsensitiveDict
+from . import aioloop
+
+#: Seconds an idle keep-alive connection is kept open.
+KEEPALIVE_TIMEOUT = 15
+
+#: Idle timeout when a worker of a bounded pool waits on the connection: an
+#: idle client must not hold one of the few workers for long.
+POOL_KEEPALIVE_TIMEOUT = 2
+
+#: Maximum number of requests answered on one persistent connection.
+MAX_KEEPALIVE_REQUESTS = 100
 
 class HttpAdapter:
     """
@@ -42,6 +58,9 @@ class HttpAdapter:
         routes (dict): Mapping of route paths to handler functions.
         request (Request): Request object for parsing incoming data.
         response (Response): Response object for building and sending replies.
+        keepalive_timeout (float): Idle seconds before a persistent connection is closed.
+        max_requests (int): Requests answered before the connection is closed.
+        reader (HttpReader): Buffered request reader of the connection.
     """
 
     __attrs__ = [
@@ -52,9 +71,14 @@ class HttpAdapter:
         "routes",
         "request",
         "response",
+        "keepalive_timeout",
+        "max_requests",
+        "reader",
     ]
 
-    def __init__(self, ip, port, conn, connaddr, routes):
+    def __init__(self, ip, port, conn, connaddr, routes,
+                 keepalive_timeout=KEEPALIVE_TIMEOUT, max_requests=MAX_KEEPALIVE_REQUESTS,
+                 max_header_size=DEFAULT_MAX_HEADER_SIZE, max_body_size=DEFAULT_MAX_BODY_SIZE):
         """
         Initialize a new HttpAdapter instance.
 
@@ -63,6 +87,10 @@ class HttpAdapter:
         :param conn (socket): Active socket connection.
         :param connaddr (tuple): Address of the connected client.
         :param routes (dict): Mapping of route paths to handler functions.
+        :param keepalive_timeout (float): Idle timeout of persistent connections.
+        :param max_requests (int): Requests answered per connection.
+        :param max_header_size (int): Request header block limit in bytes.
+        :param max_body_size (int): Request body limit in bytes.
         """
 
         #: IP address.
@@ -79,65 +107,263 @@ class HttpAdapter:
         self.request = Request()
         #: Response
         self.response = Response()
-
-    def handle_client(self, conn, addr, routes):
+        #: Keep-alive idle timeout
+        self.keepalive_timeout = keepalive_timeout
+        #: Maximum requests per connection
+        self.max_requests = max_requests
+        #: Requests answered so far on this connection
+        self.served = 0
+        #: Request size limits
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        #: Buffered reader, bound to the connection on first use
+        self.reader = None
+
+    def handle_client(self, conn, addr, routes, contended=None, defer=False):
         """
         Handle an incoming client connection.
 
-        This method reads the request from the socket, prepares the request object,
+        This method reads requests from the socket, prepares the request object,
         invokes the appropriate route handler if available, builds the response,
-        and sends it back to the client.
+        and sends it back to the client. Persistent (keep-alive) connections are
+        served in a loop until the client asks to close, the idle timeout expires
+        or :attr:`max_requests` requests have been answered. Pipelined requests
+        are answered in order.
 
         :param conn (socket): The client socket connection.
         :param addr (tuple): The client's address.
         :param routes (dict): The route mapping for dispatching requests.
+        :param contended (callable): returns True when other connections wait
+                                     for this thread; the connection is then
+                                     closed after the response instead of
+                                     waiting for the next request.
+        :param defer (bool): Return instead of waiting for coroutine handlers.
+
+        :rtype: False once the connection must be closed, or with ``defer`` a
+                Future while an ``async def`` handler is pending. The future's
+                result is a callable, to run on a worker thread, that sends the
+                response, goes on serving the connection and returns one of
+                these values.
         """
 
         # Connection handler.
         self.conn = conn        
         # Connection address.
         self.connaddr = addr
-        # Request handler
-        req = self.request
-        # Response handler
-        resp = self.response
+
+        self.prepare_socket(conn)
+        return self.serve_persistent(conn, addr, routes, contended, defer)
+
+    def serve_persistent(self, conn, addr, routes, contended=None, defer=False):
+        """Answer requests until the connection must close, see :meth:`handle_client`."""
+        while True:
+            keep_alive = self.handle_request(conn, addr, routes, defer)
+            if isinstance(keep_alive, Future):
+                return aioloop.then(keep_alive, lambda finish: functools.partial(
+                    self.resume_persistent, finish, conn, addr, routes, contended))
+            if not keep_alive:
+                return False
+            if contended is not None and not self.reader.pending() and contended():
+                return False
+
+    def resume_persistent(self, finish, conn, addr, routes, contended):
+        """Send a deferred response, then go on with the connection."""
+        if not finish():
+            return False
+        if contended is not None and not self.reader.pending() and contended():
+            return False
+        return self.serve_persistent(conn, addr, routes, contended, defer=True)
+
+    def prepare_socket(self, conn):
+        """
+        Configure the client socket for persistent connections.
+
+        Responses are written with a single ``sendall`` each, so Nagle's
+        algorithm only delays back-to-back (pipelined) responses.
+
+        :param conn (socket): The client socket connection.
+        """
+        conn.settimeout(self.keepalive_timeout)
+        try:
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass
+
+    def handle_available(self, conn, addr, routes):
+        """
+        Serve the requests already sent on a readable connection.
+
+        Used by event-driven engines: instead of blocking on an idle keep-alive
+        socket, the adapter returns as soon as no pipelined request is buffered
+        so the connection can be parked on the event loop again.
+
+        :param conn (socket): The client socket connection.
+        :param addr (tuple): The client's address.
+        :param routes (dict): The route mapping for dispatching requests.
+
+        :rtype bool: True if the connection stays open, False if it must be closed,
+                     or a Future while an ``async def`` handler is pending. The
+                     future's result is a callable, to run on a worker thread,
+                     that sends the response and returns one of these values.
+        """
+        self.conn = conn
+        self.connaddr = addr
+
+        self.prepare_socket(conn)
+        return self.serve_pending(conn, addr, routes)
+
+    def serve_pending(self, conn, addr, routes):
+        """Answer buffered requests, deferring on ``async def`` handlers."""
+        while True:
+            keep_alive = self.handle_request(conn, addr, routes, defer=True)
+            if isinstance(keep_alive, Future):
+                return aioloop.then(keep_alive, lambda finish: functools.partial(
+                    self.resume_pending, finish, conn, addr, routes))
+            if not keep_alive:
+                return False
+            if not self.reader.pending():
+                return True
+
+    def resume_pending(self, finish, conn, addr, routes):
+        """Send a deferred response, then go on with pipelined requests."""
+        if not finish():
+            return False
+        if not self.reader.pending():
+            return True
+        return self.serve_pending(conn, addr, routes)
+
+    def read_request(self, conn):
+        """
+        Read exactly one request from the connection.
+
+        The header block is read up to the blank line, then exactly
+        ``Content-Length`` bytes (or a chunked body) follow. Bytes received
+        after the end of the request (pipelined requests) stay in the
+        :class:`HttpReader <HttpReader>` buffer for the next call.
+
+        :param conn (socket): The client socket connection.
+
+        :rtype str: the raw request, or None if the peer closed the connection.
+
+        :raises HttpError: if the request is malformed or exceeds the size limits.
+        """
+        if self.reader is None or self.reader.conn is not conn:
+            self.reader = HttpReader(conn, self.max_header_size, self.max_body_size)
+
+        message = self.reader.read_message()
+        if message is None:
+            return None
+        head, body = message
+        return (head + b"\r\n\r\n" + body).decode()
+
+    def keep_alive(self, req):
+        """
+        Decide whether the connection stays open after answering ``req``.
+
+        HTTP/1.1 connections are persistent unless the client sends
+        ``Connection: close``; HTTP/1.0 clients must ask for ``keep-alive``.
+
+        :param req (Request): The request being answered.
+
+        :rtype bool: True to keep the connection open.
+        """
+        if self.served >= self.max_requests:
+            return False
+        connection = (req.headers or {}).get("connection", "").lower()
+        if req.version == "HTTP/1.1":
+            return connection != "close"
+        return connection == "keep-alive"
+
+    def handle_request(self, conn, addr, routes, defer=False):
+        """
+        Read, dispatch and answer a single request.
+
+        ``async def`` handlers run on the shared loop of :mod:`daemon.aioloop`.
+        By default the calling thread waits for them; with ``defer`` the
+        pending response is returned as a Future instead.
+
+        :param conn (socket): The client socket connection.
+        :param addr (tuple): The client's address.
+        :param routes (dict): The route mapping for dispatching requests.
+        :param defer (bool): Return instead of waiting for coroutine handlers.
+
+        :rtype bool: True if the connection should be kept alive, or with
+                     ``defer`` a Future of a callable sending the response.
+        """
+
+        # Fresh request/response state for every request on the connection.
+        self.request = req = Request()
+        self.response = resp = Response()
 
         # Handle the request
         try: 
-            msg = conn.recv(1024).decode()
-            print (msg)
+            msg = self.read_request(conn)
             if not msg or msg.strip() == "":
-                print(f"[HttpAdapter] Empty request from {addr}, closing connection")
-                return
+                if self.served == 0:
+                    print(f"[HttpAdapter] Empty request from {addr}, closing connection")
+                return False
             first_line = msg.split('\r\n')[0] if '\r\n' in msg else msg.split('\n')[0]
             print(f"[HttpAdapter] {first_line}")
             req.prepare(msg, routes)
+
+            self.served += 1
+            keep_alive = self.keep_alive(req)
+            if keep_alive:
+                resp.headers['Connection'] = 'keep-alive'
+                resp.headers['Keep-Alive'] = 'timeout={}, max={}'.format(
+                    int(self.keepalive_timeout), self.max_requests - self.served)
+            else:
+                resp.headers['Connection'] = 'close'
     
             if req.hook:
                 print("[HttpAdapter] hook in route-path METHOD {} PATH {}".format(req.hook._route_path,req.hook._route_methods))
-                hook_result = req.hook(headers = req.headers,body = req.body)
-                response = resp.build_app ( req,hook_result )
-                conn.sendall(response)
-
-                return
-
-    
-                        
+                kwargs = dict(req.params)
+                if getattr(req.hook, '_route_wants_query', False):
+                    kwargs['query'] = req.query
+                if aioloop.is_async(req.hook):
+                    future = aioloop.submit(req.hook(headers = req.headers,body = req.body, **kwargs))
+                    if defer:
+                        return aioloop.then(future, lambda result: functools.partial(
+                            self.send_app, conn, req, resp, result, keep_alive))
+                    hook_result = future.result()
+                else:
+                    hook_result = req.hook(headers = req.headers,body = req.body, **kwargs)
+                return self.send_app(conn, req, resp, hook_result, keep_alive)
+
+            if req.allowed:
+                resp.send(conn, resp.build_method_not_allowed(req.allowed))
+                return keep_alive
 
             # Build response
             response = resp.build_response(req)
 
             #print(response)
-            conn.sendall(response)
+            resp.send(conn, response)
+            return keep_alive
+        except socket.timeout:
+            return False
         except ValueError as e:
             print(f"[HttpAdapter] Parse error from {addr}: {e}")
-        # Send 400 Bad Request
-            error_response = b"HTTP/1.1 400 Bad Request\r\n\r\nBad Request"
+        # Send 400 Bad Request (or 413/431 for oversized requests)
+            status = getattr(e, "status", 400)
+            reason = getattr(e, "reason", "Bad Request")
+            error_response = "HTTP/1.1 {} {}\r\nContent-Length: {}\r\nConnection: close\r\n\r\n{}".format(
+                status, reason, len(reason), reason).encode()
             try:
                 conn.sendall(error_response)
             except:
                 pass
+            return False
         
+    def send_app(self, conn, req, resp, hook_result, keep_alive):
+        """
+        Send the response built from a route handler's result.
+
+        :rtype bool: ``keep_alive``, passed through.
+        """
+        response = resp.build_app(req, hook_result)
+        resp.send(conn, response)
+        return keep_alive
 
     @property
     def extract_cookies(self, req, resp):
@@ -0,0 +1,331 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.httpreader
+~~~~~~~~~~~~~~~~~
+
+This module provides a buffered, size-correct reader for HTTP/1.x messages
+received on a socket. It reads the header block up to ``\\r\\n\\r\\n``, then
+exactly ``Content-Length`` bytes or a ``Transfer-Encoding: chunked`` body,
+so requests larger than a single ``recv`` (e.g. WebRTC SDP offers) arrive
+complete. Bytes received past the end of a message stay buffered for the
+next one (pipelining).
+
+Received data goes through one reusable receive buffer (``recv_into`` a
+``memoryview``) and is accumulated in a ``bytearray``, avoiding repeated
+``bytes`` concatenation.
+
+The ``relay_*`` methods copy a body to another socket as it arrives instead
+of returning it, through the same receive buffer, so a proxy streams
+messages of any size in constant memory.
+
+Usage Example:
+--------------
+>>> reader = HttpReader(conn)
+>>> head, body = reader.read_message()
+
+"""
+
+import socket
+import time
+
+#: Maximum size of the request line plus headers.
+DEFAULT_MAX_HEADER_SIZE = 64 * 1024
+
+#: Maximum size of a (decoded) message body.
+DEFAULT_MAX_BODY_SIZE = 10 * 1024 * 1024
+
+#: Size of the reusable receive buffer.
+RECV_SIZE = 64 * 1024
+
+
+class HttpError(ValueError):
+    """
+    A malformed or oversized HTTP message.
+
+    Subclasses :class:`ValueError` so existing parse-error handling keeps
+    working; ``status`` and ``reason`` describe the reply to send.
+    """
+
+    status = 400
+    reason = "Bad Request"
+
+
+class HeaderTooLarge(HttpError):
+    """The header block exceeds the configured limit."""
+
+    status = 431
+    reason = "Request Header Fields Too Large"
+
+
+class BodyTooLarge(HttpError):
+    """The message body exceeds the configured limit."""
+
+    status = 413
+    reason = "Payload Too Large"
+
+
+def parse_headers(head):
+    """
+    Parse a raw header block into a dict with lower-cased names.
+
+    :param head (bytes): start line and headers, without the blank line.
+
+    :rtype dict: header name (str, lower case) to value (str).
+    """
+    headers = {}
+    for line in head.split(b"\r\n")[1:]:
+        key, sep, value = line.partition(b":")
+        if sep:
+            headers[key.strip().lower().decode("latin-1")] = value.strip().decode("latin-1")
+    return headers
+
+
+class HttpReader:
+    """
+    The :class:`HttpReader <HttpReader>` object reads complete HTTP messages
+    from a connected socket.
+
+    Attributes:
+        conn (socket): Socket to read from.
+        max_header_size (int): Header block limit in bytes.
+        max_body_size (int): Body limit in bytes.
+        buffer (bytearray): Received bytes not consumed yet.
+    """
+
+    def __init__(self, conn, max_header_size=DEFAULT_MAX_HEADER_SIZE,
+                 max_body_size=DEFAULT_MAX_BODY_SIZE):
+        """
+        Initialize a new HttpReader instance.
+
+        :param conn (socket): Socket to read from.
+        :param max_header_size (int): Header block limit in bytes.
+        :param max_body_size (int): Body limit in bytes.
+        """
+        self.conn = conn
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        self.buffer = bytearray()
+        self._recv = bytearray(RECV_SIZE)
+        self._view = memoryview(self._recv)
+
+    def pending(self):
+        """
+        :rtype bool: True if received bytes are waiting to be consumed.
+        """
+        return bool(self.buffer)
+
+    def fill(self):
+        """
+        Receive more bytes into :attr:`buffer`.
+
+        :rtype int: number of bytes received, 0 when the peer closed.
+        """
+        n = self.conn.recv_into(self._view)
+        if n:
+            self.buffer += self._view[:n]
+        return n
+
+    def read_head(self, deadline=None):
+        """
+        Read and consume the start line and headers.
+
+        :param deadline (float): ``time.monotonic()`` by which the whole
+                                 header block must be received, however
+                                 slowly its bytes trickle in.
+
+        :rtype bytes: header block without the terminating blank line, or
+                      None if the peer closed before sending anything.
+
+        :raises HttpError: if the peer closed mid-header or the limit is hit.
+        :raises socket.timeout: past the deadline (or the socket timeout).
+        """
+        scanned = 0
+        while True:
+            end = self.buffer.find(b"\r\n\r\n", max(scanned - 3, 0))
+            if end != -1:
+                if end > self.max_header_size:
+                    raise HeaderTooLarge("header block of {} bytes".format(end))
+                head = bytes(self.buffer[:end])
+                del self.buffer[:end + 4]
+                return head
+
+            scanned = len(self.buffer)
+            if scanned > self.max_header_size:
+                raise HeaderTooLarge("header block over {} bytes".format(self.max_header_size))
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout("header block not received in time")
+                self.conn.settimeout(remaining)
+            if not self.fill():
+                if self.buffer:
+                    raise HttpError("connection closed inside the header block")
+                return None
+
+    def read_exact(self, length):
+        """
+        Read and consume exactly ``length`` body bytes.
+
+        :param length (int): number of bytes.
+
+        :rtype bytes: the body.
+        """
+        if length > self.max_body_size:
+            raise BodyTooLarge("body of {} bytes".format(length))
+        while len(self.buffer) < length:
+            if not self.fill():
+                raise HttpError("connection closed inside the body")
+        body = bytes(self.buffer[:length])
+        del self.buffer[:length]
+        return body
+
+    def _read_line(self, pos):
+        """Return (line, next_pos) for the CRLF terminated line at ``pos``."""
+        while True:
+            end = self.buffer.find(b"\r\n", pos)
+            if end != -1:
+                return bytes(self.buffer[pos:end]), end + 2
+            if len(self.buffer) - pos > self.max_header_size:
+                raise HttpError("chunk header line too long")
+            if not self.fill():
+                raise HttpError("connection closed inside a chunked body")
+
+    def read_chunked(self, keep_framing=False):
+        """
+        Read and consume a ``Transfer-Encoding: chunked`` body.
+
+        :param keep_framing (bool): return the raw chunked bytes (size lines,
+            trailers) instead of the decoded payload, e.g. to relay it as is.
+
+        :rtype bytes: decoded body, or the raw chunked body.
+        """
+        pos = 0
+        size_total = 0
+        parts = []
+        while True:
+            line, pos = self._read_line(pos)
+            try:
+                size = int(line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise HttpError("invalid chunk size {!r}".format(line[:32]))
+
+            if size == 0:
+                # Trailer section, terminated by an empty line.
+                while True:
+                    line, pos = self._read_line(pos)
+                    if not line:
+                        break
+                break
+
+            size_total += size
+            if size_total > self.max_body_size:
+                raise BodyTooLarge("chunked body over {} bytes".format(self.max_body_size))
+            while len(self.buffer) < pos + size + 2:
+                if not self.fill():
+                    raise HttpError("connection closed inside a chunk")
+            if not keep_framing:
+                parts.append(bytes(self.buffer[pos:pos + size]))
+            pos += size + 2
+
+        if keep_framing:
+            body = bytes(self.buffer[:pos])
+        else:
+            body = b"".join(parts)
+        del self.buffer[:pos]
+        return body
+
+    def read_message(self, keep_framing=False):
+        """
+        Read one complete HTTP request.
+
+        :param keep_framing (bool): keep chunked framing in the returned body.
+
+        :rtype tuple: (head bytes, body bytes), or None if the peer closed
+                      the connection between messages.
+        """
+        head = self.read_head()
+        if head is None:
+            return None
+
+        headers = parse_headers(head)
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            return head, self.read_chunked(keep_framing)
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HttpError("invalid Content-Length")
+        if length < 0:
+            raise HttpError("invalid Content-Length")
+        return head, self.read_exact(length)
+
+    def _send_buffered(self, dst, length):
+        """Send and consume up to ``length`` buffered bytes."""
+        n = min(len(self.buffer), length)
+        if n:
+            with memoryview(self.buffer) as view:
+                dst.sendall(view[:n])
+            del self.buffer[:n]
+        return n
+
+    def relay_exact(self, dst, length):
+        """
+        Copy exactly ``length`` body bytes to another socket as they arrive.
+
+        :param dst (socket): destination socket.
+        :param length (int): number of bytes.
+        """
+        remaining = length - self._send_buffered(dst, length)
+        while remaining:
+            n = self.conn.recv_into(self._view[:min(remaining, RECV_SIZE)])
+            if not n:
+                raise HttpError("connection closed inside the body")
+            dst.sendall(self._view[:n])
+            remaining -= n
+
+    def relay_chunked(self, dst):
+        """
+        Copy a ``Transfer-Encoding: chunked`` body, framing included, to
+        another socket chunk by chunk.
+
+        :param dst (socket): destination socket.
+        """
+        while True:
+            line, pos = self._read_line(0)
+            try:
+                size = int(line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise HttpError("invalid chunk size {!r}".format(line[:32]))
+            self._send_buffered(dst, pos)
+
+            if size == 0:
+                while True:
+                    line, pos = self._read_line(0)
+                    self._send_buffered(dst, pos)
+                    if not line:
+                        return
+            self.relay_exact(dst, size + 2)
+
+    def relay_to_eof(self, dst):
+        """
+        Copy everything up to the end of the stream to another socket.
+
+        :param dst (socket): destination socket.
+        """
+        self._send_buffered(dst, len(self.buffer))
+        while True:
+            n = self.conn.recv_into(self._view)
+            if not n:
+                return
+            dst.sendall(self._view[:n])
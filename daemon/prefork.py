@@ -0,0 +1,244 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.prefork
+~~~~~~~~~~~~~~~~~
+
+This module runs a server in several worker processes, so route handlers are
+not serialized by a single interpreter lock and throughput scales with the
+CPU cores.
+
+A :class:`Supervisor <Supervisor>` forks the workers, restarts the ones that
+exit (with a growing delay for workers dying right after their start, so a
+broken worker does not fork in a loop) and stops them all on ``SIGINT`` /
+``SIGTERM``.
+
+Workers share the listening port in one of two ways:
+
+- ``SO_REUSEPORT`` (Linux): every worker binds its own socket and the kernel
+  spreads new connections over them, so workers never contend on ``accept``.
+- an inherited socket (elsewhere): the supervisor opens the socket before
+  forking and every worker accepts on it.
+
+State kept in module globals (sessions, channels, caches) is per worker:
+anything that must be seen by every worker needs a store shared between
+processes.
+
+Usage Example:
+--------------
+>>> server = open_listener("0.0.0.0", 9000, 128)
+>>> Supervisor(4, lambda slot: serve(server), name="Backend").run()
+
+"""
+
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+#: Worker processes started when none is requested.
+DEFAULT_PROCESSES = 1
+
+#: A worker exiting sooner than this (seconds) after its start is crash looping.
+MIN_UPTIME = 1.0
+
+#: Longest delay before restarting a crash looping worker.
+MAX_RESTART_DELAY = 30.0
+
+#: Seconds given to the workers to exit before they are killed.
+STOP_TIMEOUT = 10.0
+
+
+def available():
+    """
+    :rtype bool: True if worker processes can be forked on this platform.
+    """
+    return hasattr(os, "fork")
+
+
+def can_reuse_port():
+    """
+    :rtype bool: True if ``SO_REUSEPORT`` balances connections over the
+                 sockets bound to a port (Linux; BSD and macOS only give
+                 them to the last socket bound).
+    """
+    return hasattr(socket, "SO_REUSEPORT") and sys.platform.startswith("linux")
+
+
+def open_listener(ip, port, backlog, reuse_port=False):
+    """
+    Opens a listening TCP socket.
+
+    :param ip (str): IP address to bind.
+    :param port (int): Port number to bind.
+    :param backlog (int): ``listen`` backlog.
+    :param reuse_port (bool): set ``SO_REUSEPORT`` so several processes bind the port.
+
+    :rtype socket.socket: the listening socket.
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        server.bind((ip, port))
+        server.listen(backlog)
+    except OSError:
+        server.close()
+        raise
+    return server
+
+
+def _describe(status):
+    if os.WIFSIGNALED(status):
+        return "killed by signal {}".format(os.WTERMSIG(status))
+    return "exited with status {}".format(os.WEXITSTATUS(status))
+
+
+class Supervisor:
+    """
+    The :class:`Supervisor <Supervisor>` object forks and watches worker
+    processes. Each worker runs ``worker(slot)``, ``slot`` being its index in
+    ``range(processes)``; a restarted worker keeps the slot of the one it
+    replaces.
+
+    Attributes:
+        processes (int): Number of workers.
+        name (str): Prefix of the log lines.
+        children (dict): pid to slot of the running workers.
+    """
+
+    def __init__(self, processes, worker, name="Supervisor"):
+        """
+        Initialize a new Supervisor instance.
+
+        :param processes (int): Number of workers.
+        :param worker (callable): ``worker(slot)``, run in each child process.
+        :param name (str): Prefix of the log lines.
+        """
+        self.processes = max(1, processes)
+        self.worker = worker
+        self.name = name
+        self.children = {}
+        self.started = {}
+        self.failures = [0] * self.processes
+        self.restarts = {}
+        self.stopping = False
+
+    def run(self):
+        """
+        Start the workers and supervise them until ``SIGINT`` or ``SIGTERM``.
+
+        Without ``fork`` the worker of slot 0 runs in this process.
+        """
+        if not available():
+            print("[{}] fork is not available, running a single process".format(self.name))
+            self.worker(0)
+            return
+
+        previous = {sig: signal.signal(sig, self._request_stop)
+                    for sig in (signal.SIGINT, signal.SIGTERM)}
+        try:
+            for slot in range(self.processes):
+                self._spawn(slot)
+            while not self.stopping:
+                self._reap()
+                now = time.monotonic()
+                for slot, at in list(self.restarts.items()):
+                    if at <= now and not self.stopping:
+                        del self.restarts[slot]
+                        self._spawn(slot)
+                time.sleep(0.2)
+        finally:
+            self._stop_children()
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+
+    def _request_stop(self, signum, frame):
+        self.stopping = True
+
+    def _spawn(self, slot):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = slot
+            self.started[slot] = time.monotonic()
+            print("[{}] Worker {} started (pid {})".format(self.name, slot, pid))
+            return
+
+        # Child: Ctrl+C reaches the whole process group, the supervisor
+        # alone decides when workers stop (it sends SIGTERM).
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            self.worker(slot)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def _reap(self):
+        """Collect exited workers and schedule their restart."""
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = self.children.pop(pid, None)
+            if slot is None:
+                continue
+            print("[{}] Worker {} (pid {}) {}".format(self.name, slot, pid, _describe(status)))
+            if self.stopping:
+                continue
+
+            uptime = time.monotonic() - self.started[slot]
+            if uptime >= MIN_UPTIME:
+                self.failures[slot] = 0
+                delay = 0.0
+            else:
+                self.failures[slot] += 1
+                delay = min(0.5 * 2 ** (self.failures[slot] - 1), MAX_RESTART_DELAY)
+                print("[{}] Worker {} died after {:.1f}s, restarting in {:.1f}s".format(
+                    self.name, slot, uptime, delay))
+            self.restarts[slot] = time.monotonic() + delay
+
+    def _stop_children(self):
+        """Send SIGTERM to the workers, then SIGKILL to those still alive."""
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+
+        deadline = time.monotonic() + STOP_TIMEOUT
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+            self.children.pop(pid, None)
+        print("[{}] All workers stopped".format(self.name))
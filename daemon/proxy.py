@@ -18,10 +18,26 @@ This module implements a simple proxy server using Python's socket and threading
 It routes incoming HTTP requests to backend services based on hostname mappings and returns
 the corresponding responses to clients.
 
+Requests and responses are relayed as they arrive: the request body is streamed to the
+backend and the response is sent to the client as soon as its header block is received, so
+time-to-first-byte does not depend on the response size. WebSocket ``Upgrade`` requests are
+tunnelled, bytes are piped both ways until either side closes.
+
+With a :class:`ResponseCache <ResponseCache>`, cacheable ``GET`` responses are copied to the
+cache while they are relayed; later requests are answered from it (``X-Cache: HIT``),
+revalidated with a conditional request once stale, or served stale when no upstream answers.
+
 Requirement:
 -----------------
 - socket: provides socket networking interface.
 - threading: enables concurrent client handling via threads.
+- httpreader: :class: `HttpReader <HttpReader>` reads complete, size-checked requests.
+- upstream: :class: `UpstreamPool <UpstreamPool>` keep-alive connections to the backends.
+- balancer: :class: `Balancer <Balancer>` per host load-balancing policies.
+- routing: :class: `RoutingTable <RoutingTable>` hot-reloadable compiled routing snapshot.
+- cache: :class: `ResponseCache <ResponseCache>` memory and disk response cache.
+- health: :class: `HealthChecker <HealthChecker>` active and passive upstream health checks.
+- workerpool: :class: `WorkerPool <WorkerPool>` bounded worker threads with accept backpressure.
 - response: customized :class: `Response <Response>` utilities.
 - httpadapter: :class: `HttpAdapter <HttpAdapter >` adapter for HTTP request processing.
 - dictionary: :class: `CaseInsensitiveDict <CaseInsensitiveDict>` for managing headers and cookies.
@@ -29,10 +45,18 @@ Requirement:
 """
 
 
+import select
 import socket
 import threading
+import time
 from .response import *
 from .httpadapter import HttpAdapter
+from .httpreader import HttpReader, HttpError, parse_headers
+from .routing import RoutingTable
+from .cache import storable
+from .health import HealthChecker, DEFAULT_HEALTH_INTERVAL
+from .upstream import upstream_pool, UpstreamError, response_has_body, parse_status
+from .workerpool import WorkerPool, DEFAULT_WORKERS, DEFAULT_QUEUE_SIZE
 from .dictionary import CaseInsensitiveDict
 
 #: A dictionary mapping hostnames to backend IP and port tuples.
@@ -43,86 +67,447 @@ PROXY_PASS = {
     "app2.local": ('192.168.56.103', 9002),
 }
 
+#: Size of each direction's reusable buffer in a WebSocket tunnel.
+TUNNEL_BUFFER_SIZE = 64 * 1024
+
+#: Seconds a tunnel may stay silent in both directions before it is closed.
+TUNNEL_IDLE_TIMEOUT = 300
+
+#: Seconds a client has to send a whole request header block: a slow or idle
+#: client must not hold a worker of the bounded pool.
+CLIENT_HEADER_TIMEOUT = 10
+
+#: Seconds the client may stay silent while its body is relayed, or stop
+#: reading while the response is.
+CLIENT_BODY_TIMEOUT = 30
+
+#: Outcomes of a relay: answered, failed before anything was consumed or sent
+#: (another upstream may be tried), failed after that, or aborted by the
+#: client (gone, too slow or malformed body), which says nothing of the upstream.
+RELAY_OK = "ok"
+RELAY_RETRY = "retry"
+RELAY_FAILED = "failed"
+RELAY_CLIENT_ERROR = "client-error"
+
+#: Upstreams tried for one request before giving up.
+MAX_UPSTREAM_TRIES = 2
+
+#: Methods sent again after an upstream got the request but failed to answer.
+IDEMPOTENT_METHODS = frozenset([b"GET", b"HEAD"])
+
+#: Reply sent when the client is too slow to send its request.
+REQUEST_TIMEOUT = (
+    "HTTP/1.1 408 Request Timeout\r\n"
+    "Content-Type: text/plain\r\n"
+    "Content-Length: 15\r\n"
+    "Connection: close\r\n"
+    "\r\n"
+    "Request Timeout"
+).encode('utf-8')
+
+#: Reply sent when the target backend is unknown or unreachable.
+NOT_FOUND = (
+    "HTTP/1.1 404 Not Found\r\n"
+    "Content-Type: text/plain\r\n"
+    "Content-Length: 13\r\n"
+    "Connection: close\r\n"
+    "\r\n"
+    "404 Not Found"
+).encode('utf-8')
+
+
+def rewrite_headers(head, overrides):
+    """
+    Replaces or adds headers in a raw request header block.
+
+    :params head (bytes): start line and headers, without the blank line.
+    :params overrides (dict): header name to value, None removes the header.
+
+    :rtype bytes: the rewritten header block.
+    """
+    names = {name.lower() for name in overrides}
+    lines = [line for line in head.split(b"\r\n")
+             if line.split(b":", 1)[0].strip().lower().decode("latin-1") not in names]
+    for name, value in overrides.items():
+        if value is not None:
+            lines.append("{}: {}".format(name, value).encode("latin-1"))
+    return b"\r\n".join(lines)
+
+
+class ClientError(Exception):
+    """The client side of a relay failed, see :data:`RELAY_CLIENT_ERROR`."""
+
+
+class _Side:
+    """
+    Socket stand-in raising ``error`` when ``sendall`` fails, so a relay
+    between two sockets knows which side failed.
+    """
+
+    def __init__(self, sock, error):
+        self.sock = sock
+        self.error = error
+
+    def sendall(self, data):
+        try:
+            self.sock.sendall(data)
+        except OSError as e:
+            raise self.error(str(e)) from e
+
+
+def bad_request(conn, error):
+    """
+    Answers a malformed request with its 4xx status, ignoring a client
+    already gone.
+
+    :params conn (socket.socket): client connection socket.
+    :params error (HttpError): the parse error.
+    """
+    reason = getattr(error, "reason", "Bad Request")
+    try:
+        conn.sendall("HTTP/1.1 {} {}\r\nContent-Length: {}\r\nConnection: close\r\n\r\n{}".format(
+            getattr(error, "status", 400), reason, len(reason), reason).encode())
+    except OSError:
+        pass
+
 
-def forward_request(host, port, request):
+def is_upgrade(headers):
     """
-    Forwards an HTTP request to a backend server and retrieves the response.
+    :params headers (dict): parsed request headers.
+
+    :rtype bool: True for a WebSocket ``Upgrade`` request.
+    """
+    return (headers.get("upgrade", "").lower() == "websocket"
+            and "upgrade" in headers.get("connection", "").lower())
+
+
+def tunnel(client, upstream, idle_timeout=TUNNEL_IDLE_TIMEOUT):
+    """
+    Pipes bytes both ways between two sockets until both directions closed.
+
+    Each direction has one reusable buffer; when a side closes, the write half
+    of the other side is shut down so the close propagates.
+
+    :params client (socket): client side socket.
+    :params upstream (socket): backend side socket.
+    :params idle_timeout (float): seconds without traffic before giving up.
+    """
+    peers = {client: upstream, upstream: client}
+    buffers = {sock: memoryview(bytearray(TUNNEL_BUFFER_SIZE)) for sock in peers}
+    open_reads = [client, upstream]
+    while open_reads:
+        readable, _, _ = select.select(open_reads, [], [], idle_timeout)
+        if not readable:
+            return
+        for sock in readable:
+            view = buffers[sock]
+            try:
+                n = sock.recv_into(view)
+            except OSError:
+                n = 0
+            if n:
+                peers[sock].sendall(view[:n])
+                continue
+            open_reads.remove(sock)
+            try:
+                peers[sock].shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+
+
+class _Capture:
+    """
+    Socket stand-in relaying to the client while keeping a copy of the bytes
+    for the cache, until they exceed ``limit``.
+    """
+
+    def __init__(self, conn, limit):
+        self.conn = conn
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+
+    def sendall(self, data):
+        self.conn.sendall(data)
+        if self.parts is not None:
+            self.size += len(data)
+            if self.size > self.limit:
+                self.parts = None
+            else:
+                self.parts.append(bytes(data))
+
+    def body(self):
+        """:rtype bytes: the copied bytes, None past the limit."""
+        return None if self.parts is None else b"".join(self.parts)
+
+
+def send_cached(conn, entry, headers, status):
+    """
+    Answers a request from a cache entry, with a 304 if the client's
+    conditional headers match it.
+
+    :params conn (socket.socket): client connection socket.
+    :params entry (CacheEntry): the cached response.
+    :params headers (dict): lower-cased request headers.
+    :params status (str): ``X-Cache`` value, e.g. ``HIT``.
+    """
+    not_modified = entry.not_modified(headers)
+    head = entry.not_modified_head() if not_modified else entry.head
+    head = rewrite_headers(head, {"Connection": "close", "Keep-Alive": None,
+                                  "Age": str(entry.age(time.monotonic())), "X-Cache": status})
+    conn.sendall(head + b"\r\n\r\n" + (b"" if not_modified else entry.body))
+
+
+def relay_upgrade(host, port, head, reader, conn, overrides=None):
+    """
+    Tunnels a WebSocket ``Upgrade`` request to a backend.
+
+    Upgraded connections are never returned to the upstream pool, a dedicated
+    connection is opened for the lifetime of the tunnel. Once the request is
+    sent, the tunnel runs on its own thread with its own handle on the client
+    socket: it may last for hours and must not hold a worker of the bounded
+    pool, which closes ``conn`` when this returns.
 
     :params host (str): IP address of the backend server.
     :params port (int): port number of the backend server.
-    :params request (str): incoming HTTP request.
+    :params head (bytes): request header block.
+    :params reader (HttpReader): client reader, bytes it buffered are relayed.
+    :params conn (socket.socket): client connection socket.
+    :params overrides (dict): ``proxy_set_header`` values of the host.
 
-    :rtype bytes: Raw HTTP response from the backend server. If the connection
-                  fails, returns a 404 Not Found response.
+    :rtype str: :data:`RELAY_OK`, or :data:`RELAY_RETRY` if the backend is unreachable.
+    """
+    if overrides:
+        head = rewrite_headers(head, overrides)
+    try:
+        upstream = socket.create_connection((host, port), timeout=upstream_pool.connect_timeout)
+    except OSError as e:
+        print("[Proxy] Upgrade to {}:{} failed: {}".format(host, port, e))
+        return RELAY_RETRY
+    try:
+        upstream.settimeout(None)
+        upstream.sendall(head + b"\r\n\r\n" + bytes(reader.buffer))
+        reader.buffer.clear()
+        client = conn.dup()
+    except OSError:
+        upstream.close()
+        raise
+    client.settimeout(None)
+    threading.Thread(target=run_tunnel, args=(client, upstream),
+                     daemon=True, name="ProxyTunnel").start()
+    return RELAY_OK
+
+
+def run_tunnel(client, upstream):
     """
+    Runs :func:`tunnel` then closes both sockets.
 
-    backend = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    :params client (socket): client side socket, owned by the tunnel.
+    :params upstream (socket): backend side socket, owned by the tunnel.
+    """
+    try:
+        tunnel(client, upstream)
+    except OSError as e:
+        print("[Proxy] Tunnel closed: {}".format(e))
+    finally:
+        client.close()
+        upstream.close()
+
+
+def relay_request(host, port, head, reader, conn, overrides=None, cache=None, lookup=None):
+    """
+    Streams a request to a backend and its response back to the client.
 
+    The request body is copied from the client as it arrives, and the
+    response is sent to the client as soon as its header block is read, then
+    streamed by its ``Content-Length``, chunked framing or until EOF. The
+    upstream connection comes from, and goes back to, :data:`upstream_pool`.
+
+    :params host (str): IP address of the backend server.
+    :params port (int): port number of the backend server.
+    :params head (bytes): request header block.
+    :params reader (HttpReader): client reader positioned at the body.
+    :params conn (socket.socket): client connection socket.
+    :params overrides (dict): ``proxy_set_header`` values of the host.
+    :params cache (ResponseCache): cache storing the response, if any.
+    :params lookup (CacheLookup): cache lookup of the request; its stale
+                                  entry is revalidated.
+
+    :rtype str: :data:`RELAY_OK`; :data:`RELAY_RETRY` if the backend failed
+                before anything was sent back and the request can be sent
+                again (it never reached the backend, or is a bodiless
+                ``GET``/``HEAD``), the caller then answers or tries another
+                upstream;
+                :data:`RELAY_FAILED` once an error reply or partial response
+                went out; or :data:`RELAY_CLIENT_ERROR` if the client failed
+                (a malformed body is answered with 400).
+    """
+    headers = parse_headers(head)
+    method = head.split(b" ", 1)[0]
+    chunked = "chunked" in headers.get("transfer-encoding", "").lower()
     try:
-        backend.connect((host, port))
-        backend.sendall(request.encode())
-        response = b""
-        while True:
-            chunk = backend.recv(4096)
-            if not chunk:
-                break
-            response += chunk
-        return response
-    except socket.error as e:
-      print("Socket error: {}".format(e))
-      return (
-            "HTTP/1.1 404 Not Found\r\n"
-            "Content-Type: text/plain\r\n"
-            "Content-Length: 13\r\n"
-            "Connection: close\r\n"
-            "\r\n"
-            "404 Not Found"
-        ).encode('utf-8')
+        length = int(headers.get("content-length", 0))
+        if length < 0:
+            raise ValueError(length)
+    except ValueError:
+        bad_request(conn, HttpError("invalid Content-Length"))
+        return RELAY_CLIENT_ERROR
+    # Upstream connections are pooled, whatever the client asked for.
+    overrides = dict(overrides or {}, Connection="keep-alive")
+    revalidating = lookup is not None and lookup.entry is not None and lookup.entry.can_revalidate()
+    if revalidating:
+        overrides.update(lookup.entry.validators())
+    head = rewrite_headers(head, overrides) + b"\r\n\r\n"
+
+    # A request failing on a stale pooled connection is retried once, if it
+    # can be sent again (see RELAY_RETRY).
+    for attempt in range(2):
+        try:
+            upstream, upstream_reader, reused = upstream_pool.acquire(host, port)
+        except UpstreamError as e:
+            print("[Proxy] Relay to {}:{} failed: {}".format(host, port, e))
+            return RELAY_RETRY
+        head_sent = response_started = False
+        client = _Side(conn, ClientError)
+        try:
+            upstream.sendall(head)
+            head_sent = True
+            # Reading the body fails on the client, writing it on the upstream.
+            try:
+                if chunked:
+                    reader.relay_chunked(_Side(upstream, UpstreamError))
+                elif length:
+                    reader.relay_exact(_Side(upstream, UpstreamError), length)
+            except UpstreamError:
+                raise
+            except (OSError, HttpError) as e:
+                raise ClientError(str(e)) from e
+
+            resp_head = upstream_reader.read_head()
+            if resp_head is None:
+                raise UpstreamError("upstream closed the connection")
+            resp_headers = parse_headers(resp_head)
+            reusable = "close" not in resp_headers.get("connection", "").lower()
+            status = parse_status(resp_head)
+
+            if revalidating and status == 304:
+                upstream_pool.release(host, port, upstream, upstream_reader, reusable)
+                response_started = True
+                send_cached(client, cache.refresh(lookup, resp_head), headers, "REVALIDATED")
+                return RELAY_OK
+
+            dst = client
+            client_head = {"Connection": "close", "Keep-Alive": None}
+            if lookup is not None:
+                client_head["X-Cache"] = "MISS"
+                if (storable(status, resp_headers, lookup.lifetime, lookup.cookie)
+                        and int(resp_headers.get("content-length", 0)) <= cache.max_store_size):
+                    dst = _Capture(client, cache.max_store_size)
+
+            response_started = True
+            client.sendall(rewrite_headers(resp_head, client_head) + b"\r\n\r\n")
+            if not response_has_body(method, status):
+                pass
+            elif "chunked" in resp_headers.get("transfer-encoding", "").lower():
+                upstream_reader.relay_chunked(dst)
+            elif "content-length" in resp_headers:
+                upstream_reader.relay_exact(dst, int(resp_headers["content-length"]))
+            else:
+                upstream_reader.relay_to_eof(dst)
+                reusable = False
+        except ClientError as e:
+            upstream_pool.discard(host, port, upstream)
+            print("[Proxy] Client failed during relay to {}:{}: {}".format(host, port, e))
+            if isinstance(e.__cause__, HttpError) and not response_started:
+                bad_request(conn, e.__cause__)
+            elif isinstance(e.__cause__, socket.timeout) and not response_started:
+                try:
+                    conn.sendall(REQUEST_TIMEOUT)
+                except OSError:
+                    pass
+            return RELAY_CLIENT_ERROR
+        except (OSError, HttpError, ValueError) as e:
+            upstream_pool.discard(host, port, upstream)
+            # The upstream may have run a request it got: only an idempotent
+            # one is sent again.
+            replayable = not response_started and (
+                not head_sent or (method in IDEMPOTENT_METHODS and not (chunked or length)))
+            if reused and replayable and attempt == 0 and not isinstance(e, socket.timeout):
+                continue
+            print("[Proxy] Relay to {}:{} failed: {}".format(host, port, e))
+            if response_started:
+                return RELAY_FAILED
+            if replayable:
+                return RELAY_RETRY
+            try:
+                conn.sendall(NOT_FOUND)
+            except OSError:
+                pass
+            return RELAY_FAILED
+        upstream_pool.release(host, port, upstream, upstream_reader, reusable)
+        if dst is not client and dst.body() is not None:
+            cache.store(lookup, headers, resp_head, dst.body())
+        return RELAY_OK
+
+
+#: Routing tables of the plain ``routes`` dicts given to :func:`handle_client`.
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def routing_table(routes):
+    """
+    Returns the :class:`RoutingTable <RoutingTable>` of ``routes``.
+
+    :params routes: a RoutingTable, or a dictionary mapping hostnames and
+                    location, compiled once and cached.
+
+    :rtype RoutingTable: the table.
+    """
+    if isinstance(routes, RoutingTable):
+        return routes
+    with _tables_lock:
+        entry = _tables.get(id(routes))
+        if entry is None or entry[0] is not routes:
+            entry = _tables[id(routes)] = (routes, RoutingTable(routes))
+        return entry[1]
 
 
-def resolve_routing_policy(hostname, routes):
+def select_upstream(hostname, routes, client_ip=None, headers=None, exclude=()):
+    """
+    Applies the routing policy of a host to choose the upstream of a request.
+
+    :params hostname (str): Host header of the request.
+    :params routes: RoutingTable, RoutingSnapshot or dictionary mapping hostnames and location.
+    :params client_ip (str): client address, for ``ip-hash``.
+    :params headers (dict): request headers, for ``cookie-hash``.
+    :params exclude (iterable): upstreams already tried for this request.
+
+    :rtype tuple: (:class:`Balancer <Balancer>`, :class:`Upstream <Upstream>`),
+                  the upstream is None when every one was excluded.
+    """
+    if not hasattr(routes, 'lookup'):
+        routes = routing_table(routes)
+    balancer = routes.lookup(hostname).balancer
+    return balancer, balancer.pick(client_ip, headers, exclude)
+
+
+def resolve_routing_policy(hostname, routes, client_ip=None, headers=None):
     """
     Handles an routing policy to return the matching proxy_pass.
     It determines the target backend to forward the request to.
 
-    :params host (str): IP address of the request target server.
-    :params port (int): port number of the request target server.
+    :params hostname (str): Host header of the request.
     :params routes (dict): dictionary mapping hostnames and location.
+    :params client_ip (str): client address, for ``ip-hash``.
+    :params headers (dict): request headers, for ``cookie-hash``.
+
+    :rtype tuple: (proxy_host, proxy_port) of the chosen upstream.
     """
+    _, upstream = select_upstream(hostname, routes, client_ip, headers)
+    return upstream.host, upstream.port
 
-    print(hostname)
-    proxy_map, policy = routes.get(hostname,('127.0.0.1:9000','round-robin'))
-    print (proxy_map)
-    print (policy)
-
-    proxy_host = ''
-    proxy_port = '9000'
-    if isinstance(proxy_map, list):
-        if len(proxy_map) == 0:
-            print("[Proxy] Emtpy resolved routing of hostname {}".format(hostname))
-            print ("Empty proxy_map result")
-            # TODO: implement the error handling for non mapped host
-            #       the policy is design by team, but it can be 
-            #       basic default host in your self-defined system
-            # Use a dummy host to raise an invalid connection
-            proxy_host = '127.0.0.1'
-            proxy_port = '9000'
-        elif len(value) == 1:
-            proxy_host, proxy_port = proxy_map[0].split(":", 2)
-        #elif: # apply the policy handling 
-        #   proxy_map
-        #   policy
-        else:
-            # Out-of-handle mapped host
-            proxy_host = '127.0.0.1'
-            proxy_port = '9000'
-    else:
-        print("[Proxy] resolve route of hostname {} is a singulair to".format(hostname))
-        proxy_host, proxy_port = proxy_map.split(":", 2)
-
-    return proxy_host, proxy_port
-
-def handle_client(ip, port, conn, addr, routes):
+def handle_client(ip, port, conn, addr, routes, cache=None):
     """
     Handles an individual client connection by parsing the request,
     determining the target backend, and forwarding the request.
@@ -138,87 +523,145 @@ def handle_client(ip, port, conn, addr, routes):
     :params port (int): port number of the proxy server.
     :params conn (socket.socket): client connection socket.
     :params addr (tuple): client address (IP, port).
-    :params routes (dict): dictionary mapping hostnames and location.
+    :params routes: RoutingTable or dictionary mapping hostnames and location.
+    :params cache (ResponseCache): response cache, None disables caching.
     """
 
-    request = conn.recv(1024).decode()
+    reader = HttpReader(conn)
+    try:
+        head = reader.read_head(deadline=time.monotonic() + CLIENT_HEADER_TIMEOUT)
+    except socket.timeout:
+        print("[Proxy] Request timeout from {}".format(addr))
+        if reader.buffer:
+            try:
+                conn.sendall(REQUEST_TIMEOUT)
+            except OSError:
+                pass
+        head = None
+    except (socket.error, HttpError) as e:
+        print("[Proxy] Invalid request from {}: {}".format(addr, e))
+        head = None
+    if head is None:
+        conn.close()
+        return
+    conn.settimeout(CLIENT_BODY_TIMEOUT)
+
     # Extract hostname
-    for line in request.splitlines():
-        if line.lower().startswith('host:'):
-            hostname = line.split(':', 1)[1].strip()
+    headers = parse_headers(head)
+    hostname = headers.get('host', '')
 
     print("[Proxy] {} at Host: {}".format(addr, hostname))
 
-    # Resolve the matching destination in routes and need conver port
-    # to integer value
-    resolved_host, resolved_port = resolve_routing_policy(hostname, routes)
+    # One snapshot for the whole request, reloads swap in a new one.
+    route = routing_table(routes).snapshot.lookup(hostname)
+    balancer = route.balancer
+    overrides = route.header_overrides(headers, addr[0])
+
+    lookup = None
+    if cache is not None and not is_upgrade(headers):
+        path = head.split(b" ", 2)[1].split(b"?", 1)[0].decode("latin-1") if b" " in head else ""
+        lookup = cache.lookup(hostname, head, headers, route.cache_valid.get(path))
+
     try:
-        resolved_port = int(resolved_port)
-    except ValueError:
-        print("Not a valid integer")
-
-    if resolved_host:
-        print("[Proxy] Host name {} is forwarded to {}:{}".format(hostname,resolved_host, resolved_port))
-        response = forward_request(resolved_host, resolved_port, request)        
-    else:
-        response = (
-            "HTTP/1.1 404 Not Found\r\n"
-            "Content-Type: text/plain\r\n"
-            "Content-Length: 13\r\n"
-            "Connection: close\r\n"
-            "\r\n"
-            "404 Not Found"
-        ).encode('utf-8')
-    conn.sendall(response)
-    conn.close()
-
-def run_proxy(ip, port, routes):
+        if lookup is not None and lookup.hit:
+            send_cached(conn, lookup.entry, headers, "HIT")
+            return
+
+        # Resolve the matching destination in routes with the host's policy,
+        # a request the upstream failed before consuming goes to another one.
+        tried = []
+        outcome = RELAY_RETRY
+        while outcome == RELAY_RETRY and len(tried) < MAX_UPSTREAM_TRIES:
+            upstream = balancer.pick(addr[0], headers, tried)
+            if upstream is None:
+                break
+            tried.append(upstream)
+            resolved_host, resolved_port = upstream.host, upstream.port
+            with balancer.track(upstream):
+                if is_upgrade(headers):
+                    print("[Proxy] Host name {} is tunnelled to {}:{}".format(hostname, resolved_host, resolved_port))
+                    outcome = relay_upgrade(resolved_host, resolved_port, head, reader, conn, overrides)
+                else:
+                    print("[Proxy] Host name {} is forwarded to {}:{}".format(hostname,resolved_host, resolved_port))
+                    outcome = relay_request(resolved_host, resolved_port, head, reader, conn,
+                                            overrides, cache, lookup)
+            if outcome != RELAY_CLIENT_ERROR:
+                # A client going away is no sign of a failing upstream.
+                balancer.report(upstream, outcome == RELAY_OK)
+        if outcome == RELAY_RETRY:
+            if lookup is not None and lookup.entry is not None:
+                # No upstream answered, a stale response beats an error.
+                send_cached(conn, lookup.entry, headers, "STALE")
+            else:
+                conn.sendall(NOT_FOUND)
+    except (socket.error, HttpError) as e:
+        print("[Proxy] Relay error for {}: {}".format(addr, e))
+    finally:
+        if cache is not None:
+            cache.done(lookup)
+        conn.close()
+
+def run_proxy(ip, port, routes, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+              health_interval=DEFAULT_HEALTH_INTERVAL, cache=None):
     """
     Starts the proxy server and listens for incoming connections. 
 
     The process dinds the proxy server to the specified IP and port.
     In each incomping connection, it accepts the connections and
-    spawns a new thread for each client using `handle_client`.
+    queues the client for a fixed-size :class:`WorkerPool <WorkerPool>`
+    running `handle_client`. When ``queue_size`` clients are already
+    waiting, the connection is answered with 503 right away.
+    A :class:`HealthChecker <HealthChecker>` checks every upstream of
+    ``routes`` each ``health_interval`` seconds. Pass a
+    :class:`RoutingTable <RoutingTable>` to reload routes without restarting.
  
 
     :params ip (str): IP address to bind the proxy server.
     :params port (int): port number to listen on.
-    :params routes (dict): dictionary mapping hostnames and location.
+    :params routes: RoutingTable or dictionary mapping hostnames and location.
+    :params workers (int): number of worker threads.
+    :params queue_size (int): pending connections allowed to wait for a worker.
+    :params health_interval (float): seconds between active health checks, 0 disables them.
+    :params cache (ResponseCache): response cache shared by all clients, None disables it.
 
     """
+    routes = routing_table(routes)
     proxy = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    pool = WorkerPool(
+        lambda conn, addr: handle_client(ip, port, conn, addr, routes, cache),
+        workers,
+        queue_size,
+        name="Proxy"
+    )
 
     try:
         proxy.bind((ip, port))
 
         proxy.listen(50)
         print("[Proxy] Listening on IP {} port {}".format(ip,port))
+        pool.start()
+        if health_interval:
+            HealthChecker(routes, interval=health_interval).start()
         while True:
             conn, addr = proxy.accept()
             
             print(f"Connected by {addr}")
-            # data = conn.recv(1024).decode()
-            # print("Client says:", data)
-            
-            # t = handle_client(ip, port,conn, addr,routes)
-            t = threading.Thread(target=handle_client, args=(ip, port, conn, addr, routes))
-            t.start()
-            # t.join() 
-            #
-            #  TODO: implement the step of the client incomping connection
-            #        using multi-thread programming with the
-            #        provided handle_client routine
-            #
+            pool.submit(conn, addr)
     except socket.error as e:
       print("Socket error: {}".format(e))
 
-def create_proxy(ip, port, routes):
+def create_proxy(ip, port, routes, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 health_interval=DEFAULT_HEALTH_INTERVAL, cache=None):
     """
     Entry point for launching the proxy server.
 
     :params ip (str): IP address to bind the proxy server.
     :params port (int): port number to listen on.
-    :params routes (dict): dictionary mapping hostnames and location.
+    :params routes: RoutingTable or dictionary mapping hostnames and location.
+    :params workers (int): number of worker threads.
+    :params queue_size (int): pending connections allowed to wait for a worker.
+    :params health_interval (float): seconds between active health checks, 0 disables them.
+    :params cache (ResponseCache): response cache shared by all clients, None disables it.
     """
 
-    run_proxy(ip, port, routes)
+    run_proxy(ip, port, routes, workers, queue_size, health_interval, cache)
@@ -0,0 +1,349 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.pubsub
+~~~~~~~~~~~~~~~~~
+
+This module provides the publish/subscribe buses connecting the WebSocket
+servers of several backends, so a signaling message reaches a user
+connected to another node:
+
+- :class:`LocalBus <LocalBus>`: callbacks of this process (the default,
+  single node).
+- :class:`RespBus <RespBus>`: ``PUBLISH``/``SUBSCRIBE`` over the Redis
+  protocol, to a Redis server or to the :class:`RespServer <RespServer>`
+  stand-in, on TCP or on a UNIX socket (a local broker for the backends of
+  one host). Messages published while a batch is on the wire are sent
+  together in the next one, one ``PUBLISH`` per channel.
+
+Messages are JSON-serializable dicts. :class:`PresenceDirectory
+<PresenceDirectory>` tracks which node each connected user is on, from the
+presence events the nodes publish.
+
+Usage Example:
+--------------
+>>> bus = open_bus("unix:/tmp/weaprous.sock")
+>>> bus.subscribe("node.a1b2", lambda channel, message: print(message))
+>>> bus.publish("node.a1b2", {"to": "alice", "message": {...}})
+
+"""
+
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from .resp import RespConnection, RespError, encode_command, read_reply
+
+#: Seconds a published message may wait to be batched with others: none by
+#: default, a batch gathers what was published while the previous one was sent.
+BATCH_INTERVAL = 0
+
+#: Messages that trigger a batch without waiting.
+BATCH_SIZE = 256
+
+#: Seconds between two reconnection attempts of the subscriber.
+RECONNECT_DELAY = 1.0
+
+#: Seconds between two presence announcements of a node.
+PRESENCE_INTERVAL = 5.0
+
+#: Seconds without announcement after which a node is considered gone.
+PRESENCE_TIMEOUT = 3 * PRESENCE_INTERVAL
+
+
+class Bus(ABC):
+    """
+    Interface of the buses. ``publish`` and ``subscribe`` are thread-safe;
+    callbacks ``(channel, message)`` run on a thread of the bus and must
+    not block.
+
+    Attributes:
+        shared (bool): True if other processes receive what is published.
+    """
+
+    shared = False
+
+    @abstractmethod
+    def subscribe(self, channel, callback):
+        """Call ``callback(channel, message)`` for every message of ``channel``."""
+
+    @abstractmethod
+    def publish(self, channel, message):
+        """Send a message to the subscribers of ``channel`` (this process included)."""
+
+    def stats(self):
+        """:rtype dict: counters of the bus."""
+        return {}
+
+    def close(self):
+        """Stop delivering messages."""
+
+
+class LocalBus(Bus):
+    """Bus of a single process: ``publish`` calls the callbacks directly."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.callbacks = {}
+        self.published = 0
+
+    def subscribe(self, channel, callback):
+        with self.lock:
+            self.callbacks.setdefault(channel, []).append(callback)
+
+    def publish(self, channel, message):
+        self.published += 1
+        for callback in list(self.callbacks.get(channel, ())):
+            callback(channel, message)
+
+    def stats(self):
+        return {'published': self.published}
+
+
+class RespBus(Bus):
+    """
+    Bus over Redis ``PUBLISH``/``SUBSCRIBE``.
+
+    Published messages are queued and sent by a flusher thread: it takes
+    every queued message (after waiting ``batch_interval``, unless
+    ``batch_size`` are queued) and sends one ``PUBLISH`` per channel carrying
+    the JSON array of its messages, all in one pipeline. A lone message goes
+    out at once, under load the queue fills while a batch is sent. A batch
+    that fails is dropped, never sent twice. A subscriber thread holds the
+    subscribed connection, reconnecting and subscribing again if it drops;
+    messages published meanwhile are lost. Threads start on first use, in
+    each process.
+
+    Attributes:
+        host (str): Server address.
+        port (int): Server port.
+        unix_path (str): UNIX socket of the server, instead of host and port.
+        batch_interval (float): Seconds a message may wait for others.
+        batch_size (int): Messages sent without waiting.
+    """
+
+    shared = True
+
+    def __init__(self, host="127.0.0.1", port=6379, unix_path=None,
+                 batch_interval=BATCH_INTERVAL, batch_size=BATCH_SIZE):
+        """
+        Initialize a new RespBus instance, connecting lazily.
+
+        :param host (str): Server address.
+        :param port (int): Server port.
+        :param unix_path (str): UNIX socket of the server, instead of host and port.
+        :param batch_interval (float): Seconds a message may wait for others.
+        :param batch_size (int): Messages sent without waiting.
+        """
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.batch_interval = batch_interval
+        self.batch_size = batch_size
+        self.cond = threading.Condition()
+        self.pending = {}        # {channel: [messages]} not sent yet
+        self.pending_count = 0
+        self.callbacks = {}      # {channel: [callbacks]}
+        self.publisher = None    # (pid, thread) of the flusher
+        self.subscriber = None   # (pid, thread) of the reader
+        self.sub_sock = None     # socket of the subscribed connection
+        self.sub_lock = threading.Lock()
+        self.published = 0
+        self.batches = 0
+        self.received = 0
+        self.dropped = 0
+
+    def _connection(self, timeout=5):
+        return RespConnection(self.host, self.port, timeout=timeout, unix_path=self.unix_path)
+
+    def _running(self, thread):
+        return thread is not None and thread[0] == os.getpid()
+
+    def publish(self, channel, message):
+        with self.cond:
+            self.pending.setdefault(channel, []).append(message)
+            self.pending_count += 1
+            self.published += 1
+            if not self._running(self.publisher):
+                # Threads do not survive a fork: each worker process starts its own.
+                thread = threading.Thread(target=self._flush_loop, daemon=True, name="BusPublisher")
+                self.publisher = (os.getpid(), thread)
+                thread.start()
+            if self.pending_count == 1 or self.pending_count >= self.batch_size:
+                self.cond.notify()
+
+    def _flush_loop(self):
+        conn = self._connection()
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                if self.batch_interval and self.pending_count < self.batch_size:
+                    # Let the batch fill for a moment.
+                    self.cond.wait(self.batch_interval)
+                batch, self.pending, self.pending_count = self.pending, {}, 0
+            commands = [("PUBLISH", channel, json.dumps(messages))
+                        for channel, messages in batch.items()]
+            try:
+                # A batch is lost rather than delivered twice if the
+                # connection breaks.
+                conn.pipeline(commands, retry=False)
+                self.batches += len(commands)
+            except (OSError, RespError) as e:
+                self.dropped += sum(len(messages) for messages in batch.values())
+                print("[Bus] Publish failed: {}".format(e))
+
+    def subscribe(self, channel, callback):
+        with self.sub_lock:
+            new = channel not in self.callbacks
+            self.callbacks.setdefault(channel, []).append(callback)
+            if not self._running(self.subscriber):
+                thread = threading.Thread(target=self._read_loop, daemon=True, name="BusSubscriber")
+                self.subscriber = (os.getpid(), thread)
+                self.sub_sock = None
+                thread.start()
+            elif new and self.sub_sock is not None:
+                try:
+                    self.sub_sock.sendall(encode_command(["SUBSCRIBE", channel]))
+                except OSError:
+                    pass  # the reader reconnects and subscribes to every channel
+
+    def _read_loop(self):
+        while True:
+            conn = self._connection()
+            try:
+                conn.connect()
+                conn.sock.settimeout(None)
+                with self.sub_lock:
+                    self.sub_sock = conn.sock
+                    conn.sock.sendall(encode_command(["SUBSCRIBE"] + list(self.callbacks)))
+                while True:
+                    reply = read_reply(conn.stream)
+                    if isinstance(reply, list) and reply and reply[0] == b"message":
+                        self._deliver(reply[1].decode(), reply[2])
+            except (OSError, ConnectionError, RespError) as e:
+                print("[Bus] Subscriber disconnected: {}".format(e))
+            finally:
+                with self.sub_lock:
+                    self.sub_sock = None
+                conn.close()
+            time.sleep(RECONNECT_DELAY)
+
+    def _deliver(self, channel, payload):
+        try:
+            messages = json.loads(payload)
+        except ValueError:
+            print("[Bus] Invalid message on {}".format(channel))
+            return
+        callbacks = list(self.callbacks.get(channel, ()))
+        for message in messages:
+            self.received += 1
+            for callback in callbacks:
+                try:
+                    callback(channel, message)
+                except Exception as e:
+                    print("[Bus] Callback error on {}: {}".format(channel, e))
+
+    def stats(self):
+        return {'published': self.published, 'batches': self.batches,
+                'received': self.received, 'dropped': self.dropped}
+
+
+class PresenceDirectory:
+    """
+    The node each connected user is on, built from the presence events of
+    every node: ``join``/``leave`` of a user and periodic ``sync`` of all
+    the users of a node. A node silent for ``timeout`` seconds is gone and
+    its users with it. Not thread-safe: used from the event loop.
+    """
+
+    def __init__(self, timeout=PRESENCE_TIMEOUT):
+        self.timeout = timeout
+        self.owners = {}  # {username: node}
+        self.users = {}   # {node: set of usernames}
+        self.seen = {}    # {node: time of its last event}
+
+    def owner(self, username):
+        """:rtype str: the node of ``username``, or None if not connected."""
+        return self.owners.get(username)
+
+    def join(self, node, username):
+        """Record a user on a node, True if it was not there before."""
+        self.seen[node] = time.monotonic()
+        previous = self.owners.get(username)
+        if previous == node:
+            return False
+        if previous is not None:
+            self.users[previous].discard(username)
+        self.owners[username] = node
+        self.users.setdefault(node, set()).add(username)
+        return previous is None
+
+    def leave(self, node, username):
+        """Remove a user of a node, True if it was there."""
+        self.seen[node] = time.monotonic()
+        if self.owners.get(username) != node:
+            return False
+        del self.owners[username]
+        self.users[node].discard(username)
+        return True
+
+    def sync(self, node, usernames):
+        """
+        Replace the users of a node.
+
+        :rtype tuple: (joined, left) usernames.
+        """
+        usernames = set(usernames)
+        current = self.users.get(node, set())
+        left = [username for username in current - usernames if self.leave(node, username)]
+        joined = [username for username in usernames - current if self.join(node, username)]
+        self.seen[node] = time.monotonic()
+        return joined, left
+
+    def expire(self, keep=None):
+        """
+        Forget the nodes silent for ``timeout`` seconds (but ``keep``).
+
+        :rtype list: usernames of the nodes gone.
+        """
+        deadline = time.monotonic() - self.timeout
+        left = []
+        for node, seen in list(self.seen.items()):
+            if node != keep and seen < deadline:
+                left += self.sync(node, ())[1]
+                del self.seen[node]
+                self.users.pop(node, None)
+        return left
+
+
+def open_bus(url):
+    """
+    Creates a bus from its URL.
+
+    :param url (str): ``local``, ``unix:<socket>`` or ``redis://host[:port]``.
+
+    :rtype Bus: the bus.
+
+    :raises ValueError: for an unknown URL scheme.
+    """
+    if url in (None, "", "local"):
+        return LocalBus()
+    if url.startswith("unix:"):
+        return RespBus(unix_path=url[len("unix:"):])
+    if url.startswith("redis://"):
+        host, _, port = url[len("redis://"):].partition("/")[0].partition(":")
+        return RespBus(host or "127.0.0.1", int(port or 6379))
+    raise ValueError("Unknown bus {!r}".format(url))
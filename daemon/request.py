@@ -18,6 +18,7 @@ This module provides a Request object to manage and persist
 request settings (cookies, auth, proxies).
 """
 from .dictionary import CaseInsensitiveDict
+from urllib.parse import parse_qsl
 import json
 
 class Request():
@@ -47,6 +48,8 @@ class Request():
         "body",
         "routes",
         "hook",
+        "query",
+        "params",
     ]
 
     def __init__(self):
@@ -66,6 +69,14 @@ class Request():
         self.routes = {}
         #: Hook point for routed mapped-path
         self.hook = None
+        #: Raw query string (without the '?')
+        self.query_string = ''
+        #: Parsed query string, name -> last value
+        self.query = {}
+        #: Path parameters captured by the router, e.g. {'peer_id': 3}
+        self.params = {}
+        #: Methods accepted for the path when only the method did not match
+        self.allowed = ()
 
     def extract_request_line(self, request):
         try:
@@ -73,6 +84,8 @@ class Request():
             first_line = lines[0]
             method, path, version = first_line.split()
 
+            path, _, self.query_string = path.partition('?')
+            self.query = dict(parse_qsl(self.query_string, keep_blank_values=True))
             if path == '/':
                 path = '/index.html'
         except Exception:
@@ -114,7 +127,10 @@ class Request():
         
         if not routes == {}:
             self.routes = routes
-            self.hook = routes.get((self.method, self.path))
+            if hasattr(routes, 'match'):
+                self.hook, self.params, self.allowed = routes.match(self.method, self.path)
+            else:
+                self.hook = routes.get((self.method, self.path))
             #
             # self.hook manipulation goes here
             # ...
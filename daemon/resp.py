@@ -0,0 +1,434 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.resp
+~~~~~~~~~~~~~~~~~
+
+This module speaks the Redis serialization protocol (RESP): a small client,
+:class:`RespConnection <RespConnection>`, used by the Redis backed session
+store and pub/sub bus, and :class:`RespServer <RespServer>`, an in-memory
+stand-in implementing the few commands they use, so they can be run and
+benchmarked without a Redis server. Both also work over a UNIX socket, which
+makes the stand-in a local pub/sub broker for the backends of one host::
+
+  python3 -m daemon.resp --unix /tmp/weaprous.sock
+
+Usage Example:
+--------------
+>>> server = RespServer("127.0.0.1", 0).start()
+>>> conn = RespConnection("127.0.0.1", server.port)
+>>> conn.execute("HSET", "sessions", "token", "{}")
+1
+>>> conn.pipeline([("HGET", "sessions", "token"), ("PING",)])
+[b'{}', 'PONG']
+>>> broker = RespServer(unix_path="/tmp/weaprous.sock").start()
+
+"""
+
+import argparse
+import os
+import socket
+import threading
+
+#: Seconds to connect to, and wait for, the server.
+DEFAULT_TIMEOUT = 5
+
+
+class RespError(Exception):
+    """Error reply of the server, or protocol failure."""
+
+
+def encode_command(args):
+    """
+    :param args (iterable): command name and arguments (str, bytes or numbers).
+
+    :rtype bytes: the command as a RESP array of bulk strings.
+    """
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(out)
+
+
+def read_reply(stream):
+    """
+    Read one reply.
+
+    :param stream (file): buffered binary file of the socket.
+
+    :rtype: str for simple strings, int, bytes or None for bulk strings,
+            list for arrays.
+
+    :raises RespError: on an error reply (returned, not raised, inside arrays).
+    """
+    reply = _read(stream)
+    if isinstance(reply, RespError):
+        raise reply
+    return reply
+
+
+def _read(stream):
+    line = stream.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("connection closed by the server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        return RespError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        if len(data) != length + 2:
+            raise ConnectionError("connection closed by the server")
+        return data[:-2]
+    if kind == b"*":
+        count = int(rest)
+        if count < 0:
+            return None
+        return [_read(stream) for _ in range(count)]
+    raise RespError("invalid reply {!r}".format(line[:32]))
+
+
+class RespConnection:
+    """
+    A connection to a RESP server. Not thread-safe: use one per thread.
+
+    Attributes:
+        host (str): Server address.
+        port (int): Server port.
+        timeout (float): Connect and read timeout.
+        unix_path (str): UNIX socket of the server, used instead of host and port.
+    """
+
+    def __init__(self, host="127.0.0.1", port=6379, timeout=DEFAULT_TIMEOUT, unix_path=None):
+        """
+        Initialize a new RespConnection instance, connecting lazily.
+
+        :param host (str): Server address.
+        :param port (int): Server port.
+        :param timeout (float): Connect and read timeout.
+        :param unix_path (str): UNIX socket of the server, instead of host and port.
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.unix_path = unix_path
+        self.sock = None
+        self.stream = None
+
+    def connect(self):
+        if self.unix_path:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(self.timeout)
+            try:
+                self.sock.connect(self.unix_path)
+            except OSError:
+                self.sock.close()
+                self.sock = None
+                raise
+        else:
+            self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.stream = self.sock.makefile("rb")
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.stream.close()
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = self.stream = None
+
+    def execute(self, *args):
+        """
+        Send one command and read its reply.
+
+        :raises RespError: on an error reply.
+        :raises OSError: if the server is unreachable.
+        """
+        return self.pipeline([args])[0]
+
+    def pipeline(self, commands, retry=True):
+        """
+        Send several commands in one write and read all their replies.
+
+        A failure on a connection that was idle is retried once on a new one.
+        Once written, the commands may have run even if their replies were
+        lost: with ``retry=False``, for commands that must not run twice
+        (``PUBLISH``), only a failed write is retried.
+
+        :param commands (list): argument tuples.
+        :param retry (bool): also retry when the replies could not be read.
+
+        :rtype list: replies in order; error replies are :class:`RespError` objects.
+        """
+        payload = b"".join(encode_command(args) for args in commands)
+        for attempt in range(2):
+            fresh = self.sock is None
+            sent = False
+            try:
+                if fresh:
+                    self.connect()
+                self.sock.sendall(payload)
+                sent = True
+                replies = [_read(self.stream) for _ in commands]
+            except (OSError, ConnectionError):
+                self.close()
+                if fresh or attempt or (sent and not retry):
+                    raise
+                continue
+            if len(commands) == 1 and isinstance(replies[0], RespError):
+                raise replies[0]
+            return replies
+
+
+class RespServer:
+    """
+    The :class:`RespServer <RespServer>` object is an in-memory stand-in for
+    a Redis server, for development and benchmarks. It implements ``PING``,
+    ``GET``, ``SET``, ``DEL``, ``HGET``, ``HSET``, ``HSETNX``, ``HDEL``,
+    ``HGETALL``, ``HLEN``, ``PUBLISH``, ``SUBSCRIBE`` and ``UNSUBSCRIBE``, one
+    thread per client, on TCP or on a UNIX socket.
+
+    Attributes:
+        host (str): Bound address.
+        port (int): Bound port (the chosen one when created with port 0).
+        unix_path (str): Bound UNIX socket, if any.
+        data (dict): key to bytes (strings) or dict (hashes).
+        channels (dict): channel to the set of subscribed clients.
+    """
+
+    def __init__(self, host="127.0.0.1", port=6379, unix_path=None):
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(unix_path)
+            self.host, self.port = None, None
+        else:
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.server.bind((host, port))
+            self.host, self.port = self.server.getsockname()[:2]
+        self.server.listen(64)
+        self.unix_path = unix_path
+        self.data = {}
+        self.channels = {}
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Accept clients in a daemon thread, returns self."""
+        threading.Thread(target=self.serve_forever, daemon=True, name="RespServer").start()
+        return self
+
+    def serve_forever(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def close(self):
+        self.server.close()
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+    def _serve(self, conn):
+        if not self.unix_path:
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = _Client(conn)
+        stream = conn.makefile("rb")
+        try:
+            while True:
+                try:
+                    command = _read(stream)
+                except (ConnectionError, ValueError):
+                    return
+                if not isinstance(command, list) or not command:
+                    client.send(b"-ERR protocol error\r\n")
+                    return
+                name = command[0].upper()
+                if name in (b"SUBSCRIBE", b"UNSUBSCRIBE"):
+                    self._subscription(client, name, command[1:])
+                elif name == b"PUBLISH" and len(command) == 3:
+                    client.send(self._encode(self.publish(command[1], command[2])))
+                else:
+                    client.send(self._encode(self.dispatch(command)))
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                for channel in client.channels:
+                    self.channels.get(channel, set()).discard(client)
+            stream.close()
+            conn.close()
+
+    def _subscription(self, client, name, channels):
+        # One confirmation per channel, as Redis does.
+        subscribe = name == b"SUBSCRIBE"
+        with self.lock:
+            if not subscribe and not channels:
+                channels = list(client.channels)
+            for channel in channels:
+                if subscribe:
+                    client.channels.add(channel)
+                    self.channels.setdefault(channel, set()).add(client)
+                else:
+                    client.channels.discard(channel)
+                    self.channels.get(channel, set()).discard(client)
+                client.send(self._encode([name.lower(), channel, len(client.channels)]))
+
+    def publish(self, channel, message):
+        """
+        Push a message to the subscribers of a channel.
+
+        :rtype int: number of subscribers it was sent to.
+        """
+        with self.lock:
+            targets = list(self.channels.get(channel, ()))
+        frame = self._encode([b"message", channel, message])
+        sent = 0
+        for client in targets:
+            try:
+                client.send(frame)
+                sent += 1
+            except OSError:
+                pass
+        return sent
+
+    def _encode(self, value):
+        if isinstance(value, RespError):
+            return b"-%s\r\n" % str(value).encode()
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, str):
+            return b"+%s\r\n" % value.encode()
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, bytes):
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        return b"*%d\r\n" % len(value) + b"".join(self._encode(item) for item in value)
+
+    def dispatch(self, command):
+        """
+        Run one command.
+
+        :param command (list): command name and arguments (bytes).
+
+        :rtype: reply value, a :class:`RespError` for errors.
+        """
+        name, args = command[0].upper().decode(), command[1:]
+        handler = getattr(self, "cmd_" + name.lower(), None)
+        if handler is None:
+            return RespError("ERR unknown command '{}'".format(name))
+        with self.lock:
+            try:
+                return handler(*args)
+            except TypeError:
+                return RespError("ERR wrong number of arguments for '{}'".format(name))
+
+    def _hash(self, key, create=False):
+        value = self.data.get(key)
+        if value is None and create:
+            value = self.data[key] = {}
+        if value is not None and not isinstance(value, dict):
+            raise TypeError
+        return value
+
+    def cmd_ping(self):
+        return "PONG"
+
+    def cmd_get(self, key):
+        return self.data.get(key)
+
+    def cmd_set(self, key, value):
+        self.data[key] = value
+        return "OK"
+
+    def cmd_del(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def cmd_hget(self, key, field):
+        return (self._hash(key) or {}).get(field)
+
+    def cmd_hset(self, key, *pairs):
+        if not pairs or len(pairs) % 2:
+            raise TypeError
+        hash_ = self._hash(key, create=True)
+        added = 0
+        for field, value in zip(pairs[0::2], pairs[1::2]):
+            added += field not in hash_
+            hash_[field] = value
+        return added
+
+    def cmd_hsetnx(self, key, field, value):
+        hash_ = self._hash(key, create=True)
+        if field in hash_:
+            return 0
+        hash_[field] = value
+        return 1
+
+    def cmd_hdel(self, key, *fields):
+        hash_ = self._hash(key) or {}
+        return sum(hash_.pop(field, None) is not None for field in fields)
+
+    def cmd_hgetall(self, key):
+        return [item for pair in (self._hash(key) or {}).items() for item in pair]
+
+    def cmd_hlen(self, key):
+        return len(self._hash(key) or {})
+
+
+class _Client:
+    """A connection of :class:`RespServer`, written by its thread and by publishers."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.channels = set()
+
+    def send(self, data):
+        with self.lock:
+            self.conn.sendall(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python3 -m daemon.resp",
+        description="In-memory Redis stand-in: session store and pub/sub broker")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--unix", help="listen on this UNIX socket instead of TCP")
+    args = parser.parse_args()
+
+    server = RespServer(args.host, args.port, unix_path=args.unix)
+    print("[Resp] Listening on {}".format(args.unix or "{}:{}".format(server.host, server.port)))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
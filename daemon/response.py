@@ -18,16 +18,180 @@ This module provides a :class: `Response <Response>` object to manage and persis
 response settings (cookies, auth, proxies), and to construct HTTP responses
 based on incoming requests. 
 
-The current version supports MIME type detection, content loading and header formatting
+The current version supports MIME type detection, content loading and header formatting.
+Static files are looked up in an mtime-validated in-memory cache and large ones are
+streamed with ``sendfile``. They carry ``ETag``/``Last-Modified`` validators and a
+per-MIME-type ``Cache-Control`` policy (:data:`CACHE_POLICIES`); conditional GETs
+that still match are answered with 304 Not Modified. Text-like static files and
+large JSON bodies are gzip/brotli encoded according to ``Accept-Encoding``.
+Single byte ranges are answered with 206 Partial Content; large files are streamed
+from the file handle so memory use does not depend on the file size.
 """
 import datetime
 import os
 import mimetypes
+from email.utils import parsedate_to_datetime
 from .dictionary import CaseInsensitiveDict
+from .filecache import file_cache
+from .compression import (compress, negotiate, is_compressible, variant_cache,
+                          MIN_COMPRESS_SIZE)
 import json
 
 BASE_DIR = ""
 
+#: ``Cache-Control`` max-age (seconds) of static files, looked up by full
+#: MIME type first, then by main type. ``0`` means ``no-cache``: the browser
+#: keeps the file but revalidates it (cheap 304) before every use.
+CACHE_POLICIES = {
+    'text/html': 0,
+    'text/css': 3600,
+    'text/javascript': 3600,
+    'application/javascript': 3600,
+    'application/json': 0,
+    'image': 86400,
+    'video': 86400,
+    'audio': 86400,
+}
+
+#: max-age used for MIME types without a policy.
+DEFAULT_MAX_AGE = 300
+
+#: Chunk size used when streaming files without ``sendfile``.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def cache_control_for(mime_type):
+    """
+    Returns the ``Cache-Control`` value for a static file MIME type.
+
+    :params mime_type (str): e.g. 'text/css'.
+
+    :rtype str: header value.
+    """
+    max_age = CACHE_POLICIES.get(mime_type)
+    if max_age is None:
+        max_age = CACHE_POLICIES.get(mime_type.split('/', 1)[0], DEFAULT_MAX_AGE)
+    if max_age <= 0:
+        return "no-cache"
+    return "public, max-age={}".format(max_age)
+
+
+def is_not_modified(reqhdr, entry, etag=None):
+    """
+    Evaluates the conditional request headers against a static file.
+
+    ``If-None-Match`` takes precedence over ``If-Modified-Since``.
+
+    :params reqhdr (dict): request headers (lower-case names).
+    :params entry (FileEntry): the requested file.
+    :params etag (str): validator of the representation being sent, defaults
+                        to the file's own ETag.
+
+    :rtype bool: True if a 304 Not Modified reply is enough.
+    """
+    if_none_match = reqhdr.get('if-none-match')
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        # Weak comparison, as required for If-None-Match.
+        return '*' in tags or (etag or entry.etag) in [t[2:] if t.startswith('W/') else t for t in tags]
+
+    if_modified_since = reqhdr.get('if-modified-since')
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(entry.mtime // 1_000_000_000) <= since
+    return False
+
+
+def parse_range(value, size):
+    """
+    Parses a single-range ``Range`` header against a resource size.
+
+    Multiple ranges are not supported; like other units they are ignored
+    and the full resource is served.
+
+    :params value (str): header value, e.g. 'bytes=0-1023', 'bytes=-500'.
+    :params size (int): resource size in bytes.
+
+    :rtype tuple: (start, end) inclusive, None to ignore the header.
+
+    :raises ValueError: if the range cannot be satisfied.
+    """
+    unit, _, spec = value.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, sep, last = spec.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if first == '':
+            # Suffix range: the last N bytes.
+            length = int(last)
+            if length <= 0:
+                raise ValueError("empty suffix range")
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        raise ValueError("invalid range {!r}".format(value))
+    if start >= size or end < start:
+        raise ValueError("range {!r} not satisfiable for {} bytes".format(value, size))
+    return start, min(end, size - 1)
+
+
+def stream_file(conn, path, offset, count, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Streams ``count`` bytes of a file starting at ``offset``.
+
+    Uses the kernel ``sendfile`` when available, otherwise fixed-size chunks
+    are read into one reusable buffer, so memory stays flat whatever the
+    file size.
+
+    :params conn (socket): connected socket.
+    :params path (str): file path.
+    :params offset (int): first byte to send.
+    :params count (int): number of bytes to send.
+    :params chunk_size (int): size of the read buffer.
+    """
+    with open(path, 'rb') as f:
+        if hasattr(os, 'sendfile'):
+            conn.sendfile(f, offset, count)
+            return
+
+        f.seek(offset)
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        while count > 0:
+            n = f.readinto(view[:min(chunk_size, count)])
+            if not n:
+                break
+            conn.sendall(view[:n])
+            count -= n
+
+
+def sendall_vectored(conn, buffers):
+    """
+    Sends several buffers back to back without joining them first.
+
+    :params conn (socket): connected socket.
+    :params buffers (iterable): bytes-like objects to send in order.
+    """
+    if not hasattr(conn, 'sendmsg'):
+        for buf in buffers:
+            conn.sendall(buf)
+        return
+
+    views = [memoryview(buf) for buf in buffers if len(buf)]
+    while views:
+        sent = conn.sendmsg(views)
+        while views and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if views and sent:
+            views[0] = views[0][sent:]
+
 class Response():   
     """The :class:`Response <Response>` object, which contains a
     server's response to an HTTP request.
@@ -119,6 +283,16 @@ class Response():
         #: is a response.
         self.request = None
 
+        #: In-memory body still to be sent after the built header.
+        self._body = None
+
+        #: :class:`FileEntry <FileEntry>` still to be streamed after the built header.
+        self._file = None
+
+        #: Byte range of :attr:`_file` to stream (offset, count).
+        self._offset = 0
+        self._count = 0
+
 
     def get_mime_type(self, path):
         """
@@ -164,6 +338,9 @@ class Response():
                 base_dir = BASE_DIR+"static/"
             elif sub_type == 'xml':
                 base_dir = BASE_DIR+"static/"
+            elif sub_type == 'javascript':
+                # Newer mimetypes tables map .js to text/javascript
+                base_dir = BASE_DIR+"www/"
             else:
                 # Default for other text types
                 base_dir = BASE_DIR+"static/"
@@ -214,20 +391,36 @@ class Response():
         :rtype tuple: (int, bytes) representing content length and content data.
         """
 
-        filepath = os.path.join(base_dir, path.lstrip('/'))
-
-        print("[Response] serving the object at location {}".format(filepath))
-            #
-            #  TODO: implement the step of fetch the object file
-            #        store in the return value of content
-            #
+        entry = self.find_file(path, base_dir)
+        if entry is None:
+            return 0, b''
+        if entry.content is not None:
+            return entry.size, entry.content
         try:
-            with open(filepath, 'rb') as f:
+            with open(entry.path, 'rb') as f:
                 content = f.read()
             return len(content), content
-        except FileNotFoundError:
+        except OSError:
             return 0, b''
 
+    def find_file(self, path, base_dir):
+        """
+        Looks the objects file up in the static :data:`file_cache`.
+
+        Small files come back with their (cached) content, larger ones with
+        metadata only so they can be streamed with ``sendfile``.
+
+        :params path (str): relative path to the file.
+        :params base_dir (str): base directory where the file is located.
+
+        :rtype FileEntry: the file entry, or None if the file does not exist.
+        """
+
+        filepath = os.path.join(base_dir, path.lstrip('/'))
+
+        print("[Response] serving the object at location {}".format(filepath))
+        return file_cache.get(filepath)
+
 
     def build_response_header(self, request):
         """
@@ -248,7 +441,8 @@ class Response():
                 "Authorization": "{}".format(reqhdr.get("Authorization", "Basic <credentials>")),
                 "Cache-Control": "no-cache",
                 "Content-Type": "{}".format(self.headers['Content-Type']),
-                "Content-Length": "{}".format(len(self._content)),
+                "Content-Length": "{}".format(
+                    self._count if self._file is not None else len(self._content)),
 #                "Cookie": "{}".format(reqhdr.get("Cookie", "sessionid=xyz789")), #dummy cooki
         #
         # TODO prepare the request authentication
@@ -262,6 +456,11 @@ class Response():
                 "User-Agent": "{}".format(reqhdr.get("User-Agent", "Chrome/123.0.0.0")),
             }
 
+        # Response specific headers (Connection, Keep-Alive, Cache-Control, ...).
+        headers.update(rsphdr)
+        if 'Cache-Control' in rsphdr:
+            del headers['Pragma']
+
         # Header text alignment
             #
             #  TODO: implement the header building to create formated
@@ -290,10 +489,70 @@ class Response():
                 "Content-Type: text/html\r\n"
                 "Content-Length: 13\r\n"
                 "Cache-Control: max-age=86000\r\n"
-                "Connection: close\r\n"
+                "Connection: {}\r\n"
                 "\r\n"
                 "404 Not Found"
-            ).encode('utf-8')
+            ).format(self.headers.get('Connection', 'close')).encode('utf-8')
+
+
+    def build_range_not_satisfiable(self, size):
+        """
+        Constructs a 416 Range Not Satisfiable response.
+
+        :params size (int): size of the resource.
+
+        :rtype bytes: Encoded 416 response.
+        """
+        self.status_code = 416
+        self.reason = "Range Not Satisfiable"
+        return (
+                "HTTP/1.1 416 Range Not Satisfiable\r\n"
+                "Content-Range: bytes */{}\r\n"
+                "Content-Length: 0\r\n"
+                "Connection: {}\r\n"
+                "\r\n"
+            ).format(size, self.headers.get('Connection', 'close')).encode('utf-8')
+
+
+    def build_method_not_allowed(self, allowed):
+        """
+        Constructs a 405 Method Not Allowed response for a routed path
+        registered with other methods.
+
+        :params allowed (iterable): methods accepted for the path.
+
+        :rtype bytes: Encoded 405 response.
+        """
+        self.status_code = 405
+        self.reason = "Method Not Allowed"
+        return (
+                "HTTP/1.1 405 Method Not Allowed\r\n"
+                "Allow: {}\r\n"
+                "Content-Type: text/plain\r\n"
+                "Content-Length: 18\r\n"
+                "Connection: {}\r\n"
+                "\r\n"
+                "Method Not Allowed"
+            ).format(', '.join(allowed), self.headers.get('Connection', 'close')).encode('utf-8')
+
+
+    def build_not_modified(self):
+        """
+        Constructs a 304 Not Modified response for a conditional GET.
+
+        Only the validators, caching and connection headers are sent, there
+        is no body.
+
+        :rtype bytes: Encoded 304 response.
+        """
+        self.status_code = 304
+        self.reason = "Not Modified"
+        lines = ["HTTP/1.1 304 Not Modified",
+                 "Date: {}".format(datetime.datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S GMT"))]
+        for key in ('ETag', 'Last-Modified', 'Cache-Control', 'Vary', 'Connection', 'Keep-Alive'):
+            if key in self.headers:
+                lines.append("{}: {}".format(key, self.headers[key]))
+        return ("\r\n".join(lines) + "\r\n\r\n").encode('utf-8')
 
 
     def build_response(self, request):
@@ -303,6 +562,8 @@ class Response():
         :params request (class:`Request <Request>`): incoming request object.
 
         :rtype bytes: complete HTTP response using prepared headers and content.
+                      For static files only the header is returned and the body is
+                      left pending, use :meth:`send` to write both.
         """
 
         path = request.path
@@ -321,15 +582,85 @@ class Response():
         self.status_code = 200
         self.reason = "OK"
 
-        c_len, self._content = self.build_content(path, base_dir)
-        if c_len == 0:
-            # Nếu không tìm thấy file trong build_content, trả về 404
+        entry = self.find_file(path, base_dir)
+        if entry is None or entry.size == 0:
+            # Nếu không tìm thấy file, trả về 404
             return self.build_notfound()
 
+        reqhdr = request.headers or {}
+        body = entry.content
+        etag = entry.etag
+        byte_range = None
+
+        # Range requests address the identity representation.
+        range_header = reqhdr.get('range')
+        if_range = reqhdr.get('if-range')
+        if range_header and request.method == 'GET' and (
+                if_range is None or if_range in (entry.etag, entry.last_modified)):
+            try:
+                byte_range = parse_range(range_header, entry.size)
+            except ValueError:
+                return self.build_range_not_satisfiable(entry.size)
+
+        self.headers['Accept-Ranges'] = 'bytes'
+
+        # Serve a cached precompressed variant when the client accepts one.
+        if body is not None and is_compressible(mime_type):
+            self.headers['Vary'] = 'Accept-Encoding'
+            encoding = negotiate(reqhdr.get('accept-encoding', ''))
+            if encoding and entry.size >= MIN_COMPRESS_SIZE and byte_range is None:
+                variant = variant_cache.get(entry, encoding)
+                if variant is not None:
+                    body = variant
+                    etag = '{}-{}"'.format(entry.etag[:-1], encoding)
+                    self.headers['Content-Encoding'] = encoding
+
+        self.headers['Cache-Control'] = cache_control_for(mime_type)
+        self.headers['ETag'] = etag
+        self.headers['Last-Modified'] = entry.last_modified
+
+        if is_not_modified(reqhdr, entry, etag):
+            return self.build_not_modified()
+
+        if byte_range is not None:
+            start, end = byte_range
+            self.status_code = 206
+            self.reason = "Partial Content"
+            self.headers['Content-Range'] = 'bytes {}-{}/{}'.format(start, end, entry.size)
+        else:
+            start, end = 0, len(body) - 1 if body is not None else entry.size - 1
+
+        if body is not None:
+            self._content = self._body = memoryview(body)[start:end + 1]
+        else:
+            self._content = b''
+            self._file = entry
+            self._offset = start
+            self._count = end - start + 1
+
         self._header = self.build_response_header(request)
 
-        return self._header + self._content
+        # The body is not copied behind the header, :meth:`send` writes it.
+        return self._header
     
+    def send(self, conn, data):
+        """
+        Sends a built response and the body left pending by :meth:`build_response`.
+
+        In-memory bodies are written together with the header using a
+        scatter/gather ``sendmsg`` (no concatenated copy); large files (or
+        the requested range of them) are streamed from the file handle.
+
+        :params conn (socket): client connection.
+        :params data (bytes): the bytes returned by one of the ``build_*`` methods.
+        """
+        if self._body is not None:
+            sendall_vectored(conn, (data, self._body))
+        elif self._file is not None:
+            conn.sendall(data)
+            stream_file(conn, self._file.path, self._offset, self._count)
+        else:
+            conn.sendall(data)
     
     def build_app (self, request, data): 
         """
@@ -345,6 +676,14 @@ class Response():
             data = {}
         json_content = json.dumps(data)
         self._content = json_content.encode('utf-8') 
+
+        # Compress large JSON bodies (peer lists, channel lists) on the fly.
+        if len(self._content) >= MIN_COMPRESS_SIZE:
+            self.headers['Vary'] = 'Accept-Encoding'
+            encoding = negotiate((request.headers or {}).get('accept-encoding', ''))
+            if encoding:
+                self._content = compress(self._content, encoding)
+                self.headers['Content-Encoding'] = encoding
         
         self.status_code = 200
         self.reason = "OK"
@@ -0,0 +1,180 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.router
+~~~~~~~~~~~~~~~~~
+
+This module provides the :class:`Router <Router>` used by WeApRous to match
+request paths. Routes are compiled into a trie over path segments, so a
+lookup walks the request path once whatever the number of routes, and
+supports typed path parameters::
+
+    /channels/<name>/messages
+    /peers/<int:peer_id>
+    /files/<path:rest>
+
+Supported converters are ``str`` (default, one segment), ``int``, ``float``
+and ``path`` (the remaining segments). Static segments take precedence over
+parameters. The router is still the ``{(METHOD, path): func}`` dict the rest
+of the daemon expects, the trie is maintained alongside it.
+
+Usage Example:
+--------------
+>>> router = Router()
+>>> router[('GET', '/channels/<name>/messages')] = handler
+>>> router.match('GET', '/channels/general/messages')
+RouteMatch(func=<function handler>, params={'name': 'general'}, allowed=())
+
+"""
+
+from collections import namedtuple
+from urllib.parse import unquote
+
+#: Result of :meth:`Router.match`. ``func`` is None when nothing matched;
+#: ``allowed`` then lists the methods accepted for the path (405 detection).
+RouteMatch = namedtuple("RouteMatch", ["func", "params", "allowed"])
+
+NO_MATCH = RouteMatch(None, {}, ())
+
+#: Converters from a path segment to a parameter value. Lower rank is tried first.
+CONVERTERS = {
+    "int": (0, int),
+    "float": (1, float),
+    "str": (2, str),
+}
+
+
+def split_path(path):
+    """
+    Splits a URL path into its non-empty segments.
+
+    :param path (str): e.g. '/channels/general/'.
+
+    :rtype list: e.g. ['channels', 'general'].
+    """
+    return [segment for segment in path.split('/') if segment]
+
+
+class _Node:
+    """A trie node: static children, typed parameter children and handlers."""
+
+    __slots__ = ("static", "params", "rest", "handlers")
+
+    def __init__(self):
+        self.static = {}
+        self.params = []      # [(rank, converter, name, node)] sorted by rank
+        self.rest = None      # (name, node) for a <path:...> parameter
+        self.handlers = {}    # {METHOD: func}
+
+
+class Router(dict):
+    """
+    The :class:`Router <Router>` object maps ``(METHOD, pattern)`` keys to
+    handler functions and compiles every pattern into a segment trie.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.root = _Node()
+        for key, func in dict(*args, **kwargs).items():
+            self[key] = func
+
+    def __setitem__(self, key, func):
+        method, pattern = key
+        super().__setitem__(key, func)
+        self._insert(method.upper(), pattern, func)
+
+    def _insert(self, method, pattern, func):
+        """Compile a pattern into the trie."""
+        node = self.root
+        for segment in split_path(pattern):
+            if segment.startswith('<') and segment.endswith('>'):
+                kind, _, name = segment[1:-1].rpartition(':')
+                kind = kind or "str"
+                if kind == "path":
+                    if node.rest is None:
+                        node.rest = (name, _Node())
+                    node = node.rest[1]
+                    break
+                if kind not in CONVERTERS:
+                    raise ValueError("Unknown route converter {!r} in {}".format(kind, pattern))
+                rank, converter = CONVERTERS[kind]
+                for item in node.params:
+                    if item[1] is converter and item[2] == name:
+                        node = item[3]
+                        break
+                else:
+                    child = _Node()
+                    node.params.append((rank, converter, name, child))
+                    node.params.sort(key=lambda item: item[0])
+                    node = child
+            else:
+                node = node.static.setdefault(segment, _Node())
+        node.handlers[method] = func
+
+    def _find(self, node, segments, i, params):
+        """Walk the trie, backtracking from static to parameter children."""
+        if i == len(segments):
+            return node if node.handlers else None
+
+        segment = segments[i]
+        child = node.static.get(segment)
+        if child is not None:
+            found = self._find(child, segments, i + 1, params)
+            if found is not None:
+                return found
+
+        for _, converter, name, child in node.params:
+            try:
+                value = converter(segment)
+            except ValueError:
+                continue
+            params[name] = value
+            found = self._find(child, segments, i + 1, params)
+            if found is not None:
+                return found
+            del params[name]
+
+        if node.rest is not None:
+            name, child = node.rest
+            if child.handlers:
+                params[name] = '/'.join(segments[i:])
+                return child
+        return None
+
+    def match(self, method, path):
+        """
+        Finds the handler for a request.
+
+        :param method (str): HTTP method.
+        :param path (str): URL path without the query string.
+
+        :rtype RouteMatch: handler and path parameters, or no handler and the
+                           allowed methods if only the method did not match.
+        """
+        # Static routes (no parameters) are answered by the dict itself.
+        func = dict.get(self, (method, path))
+        if func is not None and '<' not in path:
+            return RouteMatch(func, {}, ())
+
+        segments = split_path(path)
+        if '%' in path:
+            segments = [unquote(segment) for segment in segments]
+        params = {}
+        node = self._find(self.root, segments, 0, params)
+        if node is None:
+            return NO_MATCH
+        func = node.handlers.get(method.upper())
+        if func is None:
+            return RouteMatch(None, {}, tuple(sorted(node.handlers)))
+        return RouteMatch(func, params, ())
@@ -0,0 +1,337 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.routing
+~~~~~~~~~~~~~~~~~
+
+This module compiles the proxy configuration (``config/proxy.conf``) into an
+immutable :class:`RoutingSnapshot <RoutingSnapshot>`: host name to
+:class:`HostRoute <HostRoute>` (balancer plus compiled ``proxy_set_header``
+directives). A :class:`RoutingTable <RoutingTable>` holds the current
+snapshot and swaps it atomically when the file is reloaded, on ``SIGHUP``
+or when a change of the file is detected.
+
+Requests read ``table.snapshot`` once and keep using it, so a reload never
+blocks or disturbs in-flight requests. Host blocks whose upstreams and
+policy did not change keep their :class:`Balancer <Balancer>`, with its
+in-flight counters and health state. A configuration that fails to parse or
+compile is rejected and the previous snapshot stays active.
+
+Supported ``proxy_set_header`` variables: ``$host``, ``$remote_addr``,
+``$proxy_add_x_forwarded_for``, ``$scheme`` and ``$http_<name>``. An empty
+value removes the header.
+
+``proxy_cache_valid <seconds> <path>...;`` lets the proxy's response cache
+keep the ``GET`` responses of the listed paths for ``seconds``, whatever
+their ``Cache-Control`` says (``private``, ``no-store`` and ``Set-Cookie``
+are still honoured, and requests carrying a ``Cookie`` still need a
+``public`` response).
+
+Usage Example:
+--------------
+>>> table = RoutingTable.from_file("config/proxy.conf")
+>>> table.watch()
+>>> route = table.snapshot.lookup("app2.local")
+>>> route.balancer.pick(client_ip, headers)
+
+"""
+
+import os
+import re
+import signal
+import threading
+from types import MappingProxyType
+
+from .balancer import Balancer, DEFAULT_POLICY
+
+#: Upstream of hosts missing from the configuration.
+DEFAULT_UPSTREAM = '127.0.0.1:9000'
+
+#: Seconds between two checks of the configuration file's mtime.
+DEFAULT_RELOAD_INTERVAL = 2
+
+_VARIABLE = re.compile(r'\$(\w+)')
+
+
+def parse_virtual_hosts(config_file):
+    """
+    Parses virtual host blocks from a config file.
+
+    :config_file (str): Path to the NGINX config file.
+    :rtype dict: host to ``(proxy_map, dist_policy, set_headers, cache_valid)``,
+                 where ``proxy_map`` is a single ``'ip:port'`` or a list of
+                 them (with their ``weight=N`` parameters), ``set_headers`` a
+                 tuple of ``(name, value)`` pairs and ``cache_valid`` a tuple
+                 of ``(path, seconds)`` pairs.
+    """
+
+    with open(config_file, 'r') as f:
+        config_text = f.read()
+
+    # Match each host block
+    host_blocks = re.findall(r'host\s+"([^"]+)"\s*\{(.*?)\}', config_text, re.DOTALL)
+
+    routes = {}
+    for host, block in host_blocks:
+        # Find all proxy_pass entries
+        proxy_passes = [(target + params).strip() for target, params in
+                        re.findall(r'proxy_pass\s+http://([^\s;]+)([^;\n]*);', block)]
+
+        # Find dist_policy if present, default policy is round_robin
+        policy_match = re.search(r'dist_policy\s+([\w-]+(?:[ \t]+\w+)?)', block)
+        dist_policy = policy_match.group(1) if policy_match else DEFAULT_POLICY
+
+        set_headers = tuple(
+            (name, value.strip().strip('"'))
+            for name, value in re.findall(r'proxy_set_header\s+([\w-]+)\s*([^;\n]*);', block))
+
+        cache_valid = tuple(
+            (path, int(seconds))
+            for seconds, paths in re.findall(r'proxy_cache_valid\s+(\d+)\s+([^;\n]+);', block)
+            for path in paths.split())
+
+        if len(proxy_passes) == 1:
+            routes[host] = (proxy_passes[0], dist_policy, set_headers, cache_valid)
+        else:
+            routes[host] = (proxy_passes, dist_policy, set_headers, cache_valid)
+    return routes
+
+
+def compile_header(value):
+    """
+    Compiles a ``proxy_set_header`` value into a render function.
+
+    :param value (str): value template, e.g. ``'$remote_addr'``.
+
+    :rtype callable: ``render(headers, client_ip) -> str``.
+    """
+    parts = _VARIABLE.split(value)
+    literals, names = parts[0::2], parts[1::2]
+    if not names:
+        return lambda headers, client_ip: value
+
+    def variable(name):
+        if name == 'host':
+            return lambda headers, client_ip: headers.get('host', '')
+        if name == 'remote_addr':
+            return lambda headers, client_ip: client_ip or ''
+        if name == 'scheme':
+            return lambda headers, client_ip: 'http'
+        if name == 'proxy_add_x_forwarded_for':
+            def forwarded_for(headers, client_ip):
+                previous = headers.get('x-forwarded-for')
+                return "{}, {}".format(previous, client_ip) if previous else (client_ip or '')
+            return forwarded_for
+        if name.startswith('http_'):
+            header = name[5:].replace('_', '-')
+            return lambda headers, client_ip: headers.get(header, '')
+        raise ValueError("Unknown proxy_set_header variable ${}".format(name))
+
+    getters = [variable(name) for name in names]
+
+    def render(headers, client_ip):
+        out = [literals[0]]
+        for getter, literal in zip(getters, literals[1:]):
+            out.append(getter(headers, client_ip))
+            out.append(literal)
+        return ''.join(out)
+    return render
+
+
+class HostRoute:
+    """
+    The compiled routing of one host block.
+
+    Attributes:
+        balancer (Balancer): Upstreams and policy.
+        set_headers (tuple): ``(name, render)`` pairs from ``proxy_set_header``.
+        config (tuple): ``(proxy_map, policy)`` the balancer was built from.
+        cache_valid (dict): path to cache lifetime from ``proxy_cache_valid``.
+    """
+
+    __slots__ = ("balancer", "set_headers", "config", "cache_valid")
+
+    def __init__(self, balancer, set_headers, config, cache_valid=None):
+        self.balancer = balancer
+        self.set_headers = set_headers
+        self.config = config
+        self.cache_valid = cache_valid or {}
+
+    def header_overrides(self, headers, client_ip):
+        """
+        :param headers (dict): lower-cased request headers.
+        :param client_ip (str): client address.
+
+        :rtype dict: header overrides for :func:`rewrite_headers`, None removes.
+        """
+        overrides = {}
+        for name, render in self.set_headers:
+            overrides[name] = render(headers, client_ip) or None
+        return overrides
+
+
+class RoutingSnapshot:
+    """
+    Immutable host to :class:`HostRoute <HostRoute>` mapping.
+
+    Attributes:
+        hosts (mappingproxy): host name to route.
+        default (HostRoute): route of unknown hosts.
+        version (int): reload counter.
+    """
+
+    def __init__(self, routes, previous=None, version=0):
+        """
+        Compile parsed routes, reusing unchanged balancers of ``previous``.
+
+        :param routes (dict): host to ``(proxy_map, policy[, set_headers[, cache_valid]])``.
+        :param previous (RoutingSnapshot): snapshot being replaced.
+        :param version (int): reload counter.
+
+        :raises ValueError: on an invalid upstream, policy or header variable.
+        """
+        old = previous.hosts if previous is not None else {}
+        hosts = {}
+        for host, entry in routes.items():
+            proxy_map, policy = entry[0], entry[1] or DEFAULT_POLICY
+            set_headers = entry[2] if len(entry) > 2 else ()
+            cache_valid = dict(entry[3]) if len(entry) > 3 else {}
+            if not isinstance(proxy_map, list):
+                proxy_map = [proxy_map]
+            if not proxy_map:
+                print("[Routing] Empty proxy_pass list for host {}".format(host))
+                proxy_map = [DEFAULT_UPSTREAM]
+            config = (tuple(proxy_map), policy)
+
+            if host in old and old[host].config == config:
+                balancer = old[host].balancer
+            else:
+                balancer = Balancer.from_config(proxy_map, policy)
+            compiled = tuple((name, compile_header(value)) for name, value in set_headers)
+            hosts[host] = HostRoute(balancer, compiled, config, cache_valid)
+
+        self.hosts = MappingProxyType(hosts)
+        if previous is not None:
+            self.default = previous.default
+        else:
+            self.default = HostRoute(Balancer.from_config([DEFAULT_UPSTREAM]), (),
+                                     ((DEFAULT_UPSTREAM,), DEFAULT_POLICY))
+        self.version = version
+
+    def lookup(self, hostname):
+        """
+        :param hostname (str): Host header of the request.
+
+        :rtype HostRoute: the host's route, or the default one.
+        """
+        return self.hosts.get(hostname, self.default)
+
+    def upstreams(self):
+        """
+        :rtype list: every upstream of the snapshot.
+        """
+        return [u for route in self.hosts.values() for u in route.balancer.upstreams]
+
+
+class RoutingTable:
+    """
+    The :class:`RoutingTable <RoutingTable>` object holds the current
+    :class:`RoutingSnapshot <RoutingSnapshot>` and reloads it.
+
+    Attributes:
+        snapshot (RoutingSnapshot): current routing, replaced as a whole.
+        config_file (str): file reloaded by :meth:`reload`, if any.
+    """
+
+    def __init__(self, routes, config_file=None):
+        """
+        Initialize a new RoutingTable instance.
+
+        :param routes (dict): parsed routes, see :func:`parse_virtual_hosts`.
+        :param config_file (str): file the routes were parsed from.
+        """
+        self.config_file = config_file
+        self.snapshot = RoutingSnapshot(routes)
+        self.lock = threading.Lock()
+        self.mtime = self._mtime()
+
+    @classmethod
+    def from_file(cls, config_file):
+        """
+        :param config_file (str): proxy configuration path.
+
+        :rtype RoutingTable: table of the parsed file.
+        """
+        return cls(parse_virtual_hosts(config_file), config_file)
+
+    def _mtime(self):
+        if self.config_file is None:
+            return None
+        try:
+            return os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self):
+        """
+        Parse and compile the configuration file again, then swap it in.
+
+        :rtype bool: True if the new configuration is active.
+        """
+        if self.config_file is None:
+            return False
+        with self.lock:
+            self.mtime = self._mtime()
+            try:
+                routes = parse_virtual_hosts(self.config_file)
+                snapshot = RoutingSnapshot(routes, self.snapshot, self.snapshot.version + 1)
+            except (OSError, ValueError) as e:
+                print("[Routing] Reload of {} rejected: {}".format(self.config_file, e))
+                return False
+            self.snapshot = snapshot
+        print("[Routing] Loaded {} (version {}, {} hosts)".format(
+            self.config_file, snapshot.version, len(snapshot.hosts)))
+        return True
+
+    def watch(self, interval=DEFAULT_RELOAD_INTERVAL):
+        """
+        Reload whenever the configuration file's mtime changes, checked
+        every ``interval`` seconds in a daemon thread.
+        """
+        def run():
+            stopped = threading.Event()
+            while not stopped.wait(interval):
+                if self._mtime() != self.mtime:
+                    self.reload()
+
+        threading.Thread(target=run, daemon=True, name="RoutingWatcher").start()
+
+    def install_sighup(self):
+        """
+        Reload on ``SIGHUP``. Must be called from the main thread.
+
+        :rtype bool: False where SIGHUP is not available.
+        """
+        if not hasattr(signal, "SIGHUP"):
+            return False
+        signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(
+            target=self.reload, daemon=True).start())
+        return True
+
+    def lookup(self, hostname):
+        """Shortcut for ``table.snapshot.lookup(hostname)``."""
+        return self.snapshot.lookup(hostname)
+
+    def upstreams(self):
+        """Upstreams of the current snapshot, for the health checker."""
+        return self.snapshot.upstreams()
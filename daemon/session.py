@@ -1,152 +1,673 @@
+import atexit
+import heapq
+import json
+import os
 import time
 import uuid
 import threading
+from bisect import bisect_left, insort
+from collections import deque, namedtuple
+
+from .sessionstore import MemoryStore, SESSIONS, USERS, PEERS, ACTIVE
+
+#: Seconds a session read from a shared store is trusted before reading it again.
+DEFAULT_CACHE_TTL = 1.0
+
+#: Seconds between two batched writes of ``last_active`` timestamps.
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+#: Seconds without request after which a session expires (0 disables).
+DEFAULT_IDLE_TTL = 30 * 60
+
+#: Seconds after login after which a session expires whatever its activity (0 disables).
+DEFAULT_MAX_AGE = 24 * 60 * 60
+
+#: Lock stripes; a session maps to one by the hash of its token (or username).
+DEFAULT_STRIPES = 16
+
+#: One page of the peer registry: ``total`` peers match, ``count`` are in
+#: ``peers`` (dicts, or the JSON text of the array).
+PeerPage = namedtuple("PeerPage", ["epoch", "version", "total", "count", "peers"])
+
+#: Peer changes since a version: JSON arrays of the peers that ``joined``
+#: and were ``updated`` and of the usernames that ``left``.
+PeerDelta = namedtuple("PeerDelta", ["epoch", "version", "count", "joined", "updated", "left"])
+
+#: Changes kept by the peer registry to answer "changes since version N".
+CHANGE_LOG_SIZE = 4096
+
+#: Precision of ``last_active``: requests closer than this record nothing
+#: (a quarter of the idle TTL if that is shorter).
+ACTIVITY_RESOLUTION = 1.0
+
+
+class PeerRegistry:
+    """
+    Registered peers indexed by session token and by username.
+
+    Usernames are kept sorted, so a page is a slice and a username prefix
+    filter is a bisect: lookups are O(1) and pages O(log n + page) however
+    many peers are registered. Each peer is serialized to JSON once when it
+    registers; the JSON of the whole list is built once per ``version``,
+    which every change increments.
+
+    The last ``log_size`` changes are logged so a client holding version N
+    can fetch only what changed since (:meth:`changes_json`). Versions are
+    numbered per registry: ``epoch`` identifies it, and a version of
+    another epoch (another process, a restart) cannot be answered.
+    """
+
+    def __init__(self, log_size=CHANGE_LOG_SIZE):
+        self.lock = threading.Lock()
+        self.peers = {}      # {session_token: peer}
+        self.tokens = {}     # {username: session_token}
+        self.order = []      # usernames, sorted
+        self.fragments = {}  # {username: JSON of the peer}
+        self.version = 0
+        self.blob = None     # (version, JSON of every peer)
+        self.epoch = uuid.uuid4().hex[:8]
+        self.log = deque(maxlen=log_size)  # (version, username, "join"|"update"|"leave")
+
+    def __len__(self):
+        return len(self.peers)
+
+    def put(self, session_token, peer):
+        """Register or update the peer of a session."""
+        with self.lock:
+            self._put(session_token, peer)
+
+    def _put(self, session_token, peer):
+        username = peer['username']
+        old_token = self.tokens.get(username)
+        if old_token is None:
+            insort(self.order, username)
+        elif old_token != session_token:
+            # Logged in again: the new session replaces the old peer.
+            self.peers.pop(old_token, None)
+        self.peers[session_token] = peer
+        self.tokens[username] = session_token
+        self.fragments[username] = json.dumps(peer)
+        self.version += 1
+        self.log.append((self.version, username, "join" if old_token is None else "update"))
+
+    def remove(self, session_token):
+        """Unregister the peer of a session, if any."""
+        with self.lock:
+            self._remove(session_token)
+
+    def _remove(self, session_token):
+        peer = self.peers.pop(session_token, None)
+        if peer is None:
+            return
+        username = peer['username']
+        if self.tokens.get(username) == session_token:
+            del self.tokens[username]
+            del self.fragments[username]
+            del self.order[bisect_left(self.order, username)]
+            self.version += 1
+            self.log.append((self.version, username, "leave"))
+
+    def replace(self, peers):
+        """
+        Make the registry match ``peers`` (e.g. read from a shared store),
+        applying only the differences.
+
+        :param peers (dict): session token to peer.
+        """
+        with self.lock:
+            for session_token in [t for t in self.peers if t not in peers]:
+                self._remove(session_token)
+            for session_token, peer in peers.items():
+                if self.peers.get(session_token) != peer:
+                    self._put(session_token, peer)
+
+    def get(self, username):
+        """:rtype dict: the peer of ``username``, or None."""
+        with self.lock:
+            session_token = self.tokens.get(username)
+            return self.peers.get(session_token) if session_token else None
+
+    def _select(self, offset, limit, prefix, exclude):
+        # Bounds of the matching usernames in self.order.
+        lo, hi = 0, len(self.order)
+        if prefix:
+            lo = bisect_left(self.order, prefix)
+            hi = bisect_left(self.order, prefix + "\U0010ffff", lo)
+        skip = None
+        if exclude is not None and exclude in self.tokens:
+            skip = bisect_left(self.order, exclude, lo, hi)
+            if skip >= hi or self.order[skip] != exclude:
+                skip = None
+        total = hi - lo - (skip is not None)
+        start = lo + max(offset, 0)
+        if skip is not None and start >= skip:
+            start += 1
+        stop = hi if limit is None else min(hi, start + max(limit, 0) + (skip is not None))
+        names = [name for name in self.order[start:stop] if name != exclude]
+        if limit is not None:
+            names = names[:limit]
+        return total, names
+
+    def select(self, offset=0, limit=None, prefix="", exclude=None):
+        """
+        One page of peers, sorted by username.
+
+        :param offset (int): Matching peers to skip.
+        :param limit (int): Page size, None for all.
+        :param prefix (str): Keep usernames starting with this.
+        :param exclude (str): Username to leave out (the caller).
+
+        :rtype PeerPage: peers as dicts.
+        """
+        with self.lock:
+            total, names = self._select(offset, limit, prefix, exclude)
+            peers = [dict(self.peers[self.tokens[name]]) for name in names]
+            return PeerPage(self.epoch, self.version, total, len(peers), peers)
+
+    def select_json(self, offset=0, limit=None, prefix="", exclude=None):
+        """
+        Same as :meth:`select`, with the peers as the JSON text of an array,
+        joined from the cached JSON of each peer. The whole list is served
+        from a blob built once per version.
+
+        :rtype PeerPage: peers as JSON text.
+        """
+        with self.lock:
+            if not offset and limit is None and not prefix and exclude is None:
+                if self.blob is None or self.blob[0] != self.version:
+                    self.blob = (self.version, "[" + ", ".join(
+                        self.fragments[name] for name in self.order) + "]")
+                count = len(self.order)
+                return PeerPage(self.epoch, self.version, count, count, self.blob[1])
+            total, names = self._select(offset, limit, prefix, exclude)
+            text = "[" + ", ".join(self.fragments[name] for name in names) + "]"
+            return PeerPage(self.epoch, self.version, total, len(names), text)
+
+    def changes_json(self, since, epoch, prefix="", exclude=None):
+        """
+        What changed since version ``since``, one entry per username: a peer
+        that joined and left meanwhile is not reported, one that left and
+        came back is an update.
+
+        :param since (int): Version the client has.
+        :param epoch (str): Epoch of that version. Without it the version
+                            may be another registry's, a full snapshot is needed.
+        :param prefix (str): Keep usernames starting with this.
+        :param exclude (str): Username to leave out (the caller).
+
+        :rtype PeerDelta: the changes, or None if they are no longer logged
+                          (or ``since`` is of another or no epoch): the client
+                          needs a full snapshot.
+        """
+        with self.lock:
+            if epoch != self.epoch or since > self.version or since < 0:
+                return None
+            if since < self.version and (not self.log or self.log[0][0] > since + 1):
+                return None
+            first, last = {}, {}
+            for version, username, op in reversed(self.log):
+                if version <= since:
+                    break
+                if username == exclude or (prefix and not username.startswith(prefix)):
+                    continue
+                first[username] = op
+                last.setdefault(username, op)
+            joined, updated, left = [], [], []
+            for username, op in last.items():
+                if op == "leave":
+                    if first[username] != "join":
+                        left.append(username)
+                elif first[username] == "join":
+                    joined.append(self.fragments[username])
+                else:
+                    updated.append(self.fragments[username])
+            return PeerDelta(self.epoch, self.version, len(joined) + len(updated) + len(left),
+                             "[" + ", ".join(joined) + "]", "[" + ", ".join(updated) + "]",
+                             json.dumps(left))
+
 
 class SessionManager:
     """
     Manage Session and tracking peers for P2P application.
+
+    State lives in a :class:`SessionStore <SessionStore>` (process memory by
+    default, SQLite or Redis to share it between backends). With a shared
+    store, sessions are kept in a read-through cache for ``cache_ttl``
+    seconds so ``validate_session`` does not hit the store on every request;
+    a logout on another backend is seen within that delay. ``last_active``
+    updates are coalesced per session and written in batches every
+    ``flush_interval`` seconds.
+
+    The request path takes no global lock: reads are lock-free and the rare
+    writes lock one of ``stripes`` locks, picked by the hash of the session
+    token (activity) or of the username (login, logout). ``last_active`` is
+    approximate to :data:`ACTIVITY_RESOLUTION`, so most requests record
+    nothing at all. Routes should call :meth:`validate_and_get`, one lookup
+    instead of ``validate_session`` followed by ``get_session``.
+
+    Sessions expire after ``idle_ttl`` seconds without request or
+    ``max_age`` seconds after login. A reaper thread keeps a min-heap of
+    deadlines: it sleeps until the earliest one, then either expires the
+    session or, if it was used meanwhile, pushes it back with its new
+    deadline, so requests never touch the heap. Listeners added with
+    :meth:`add_listener` are called for every expired or removed session.
     """
-    def __init__(self):
-        self.lock = threading.Lock()
-        self.sessions = {}   # {session_token: {username: created_at}}
-        self.username_to_token = {} # {username: session_token}
-        self.active_peers = {} # {session_token: {username, ip, port, registerd_at}}
-        self.user_peer_lists = {} # {session_token: [{peer_ip, peer_port, added_at}]}
-    
+    def __init__(self, store=None, cache_ttl=DEFAULT_CACHE_TTL,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, idle_ttl=DEFAULT_IDLE_TTL,
+                 max_age=DEFAULT_MAX_AGE, stripes=DEFAULT_STRIPES):
+        self.lock = threading.Lock()  # store switch and thread start only
+        self.locks = [threading.Lock() for _ in range(stripes)]          # by username
+        self.pending_locks = [threading.Lock() for _ in range(stripes)]  # by token
+        self.store = store or MemoryStore()
+        self.cache_ttl = cache_ttl
+        self.flush_interval = flush_interval
+        self.idle_ttl = idle_ttl
+        self.max_age = max_age
+        self.cache = {}      # {session_token: (session, expires_at)}, shared stores only
+        self.pending = [{} for _ in range(stripes)]  # {session_token: last_active} not written yet
+        self.flusher = None  # (pid, thread) of the batch writer
+        self.listeners = []  # callbacks (event, session_token, session)
+        self.expiry = []     # heap of (deadline, session_token, username)
+        self.scheduled = {}  # {session_token: deadline in the heap}
+        self.expiry_cond = threading.Condition()
+        self.reaper = None   # (pid, thread) of the expiry reaper
+        self.expired = 0
+        self.registry = PeerRegistry()
+        self.peers_synced = 0    # monotonic time of the last registry sync
+        self.sync_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def set_store(self, store):
+        """
+        Switch to another store, e.g. from ``--session-store``. Must be called
+        before serving requests.
+        """
+        self.flush()
+        with self.lock:
+            self.store = store
+            self.cache.clear()
+            self.registry = PeerRegistry()
+            self.peers_synced = 0
+
+    def set_expiry(self, idle_ttl, max_age):
+        """
+        Change the session lifetimes, e.g. from the command line. Must be
+        called before serving requests.
+
+        :param idle_ttl (float): Seconds without request, 0 to disable.
+        :param max_age (float): Seconds after login, 0 to disable.
+        """
+        self.idle_ttl = idle_ttl
+        self.max_age = max_age
+
+    def add_listener(self, callback):
+        """
+        Register ``callback(event, session_token, session)``, called with
+        ``"expired"`` or ``"removed"`` once a session is gone. It runs on the
+        reaper or the calling thread and must not block.
+        """
+        self.listeners.append(callback)
+
+    def _publish(self, event, session_token, session):
+        for callback in list(self.listeners):
+            try:
+                callback(event, session_token, session)
+            except Exception as e:
+                print(f"[SessionManager] Listener error: {e}")
+
+    def _stripe(self, key):
+        return hash(key) % len(self.locks)
+
+    def _load(self, session_token):
+        """Read-through lookup of a session record."""
+        if not self.store.shared:
+            return self.store.get(SESSIONS, session_token)
+        now = time.monotonic()
+        cached = self.cache.get(session_token)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        session = self.store.get(SESSIONS, session_token)
+        if session is not None:
+            self.cache[session_token] = (session, now + self.cache_ttl)
+            if session_token not in self.scheduled:
+                # Created by another process: expire it from here too.
+                self._schedule(session_token, session)
+        else:
+            self.cache.pop(session_token, None)
+        return session
+
+    def _forget(self, session_token):
+        """Drop a session, its peer and its cached copy from this process."""
+        self.store.delete(SESSIONS, session_token)
+        self.store.delete(PEERS, session_token)
+        self.store.delete(ACTIVE, session_token)
+        self.registry.remove(session_token)
+        self.cache.pop(session_token, None)
+        stripe = self._stripe(session_token)
+        with self.pending_locks[stripe]:
+            self.pending[stripe].pop(session_token, None)
+        with self.expiry_cond:
+            self.scheduled.pop(session_token, None)
+
+    def _touch(self, session_token, now):
+        """Record activity, written by the next batch."""
+        stripe = self._stripe(session_token)
+        resolution = min(ACTIVITY_RESOLUTION, self.idle_ttl / 4) if self.idle_ttl else ACTIVITY_RESOLUTION
+        if now - self.pending[stripe].get(session_token, 0) < resolution:
+            return
+        with self.pending_locks[stripe]:
+            self.pending[stripe][session_token] = now
+        flusher = self.flusher
+        if flusher is None or flusher[0] != os.getpid():
+            self._start_flusher()
+
+    def _start_flusher(self):
+        # Threads do not survive a fork: each worker process starts its own.
+        with self.lock:
+            if self.flusher is not None and self.flusher[0] == os.getpid():
+                return
+            thread = threading.Thread(target=self._flush_loop, daemon=True, name="SessionFlush")
+            self.flusher = (os.getpid(), thread)
+        thread.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[SessionManager] Flush failed: {e}")
+
+    def flush(self):
+        """Write the pending ``last_active`` timestamps in one batch."""
+        batch = {}
+        for stripe, lock in enumerate(self.pending_locks):
+            with lock:
+                pending, self.pending[stripe] = self.pending[stripe], {}
+            batch.update(pending)
+        if batch:
+            self.store.put_many(ACTIVE, batch)
+
+    def _deadline(self, session_token, session):
+        """Time a session expires at, None if it never does."""
+        deadlines = []
+        if self.max_age:
+            deadlines.append(session['created_at'] + self.max_age)
+        if self.idle_ttl:
+            last = max(self._pending(session_token) or 0,
+                       self.store.get(ACTIVE, session_token) or 0,
+                       session['last_active'])
+            deadlines.append(last + self.idle_ttl)
+        return min(deadlines) if deadlines else None
+
+    def _pending(self, session_token):
+        return self.pending[self._stripe(session_token)].get(session_token)
+
+    def _schedule(self, session_token, session):
+        """Push the deadline of a session on the expiry heap, O(log n)."""
+        deadline = self._deadline(session_token, session)
+        if deadline is None:
+            return
+        with self.expiry_cond:
+            if self.scheduled.get(session_token, float('inf')) <= deadline:
+                return
+            self.scheduled[session_token] = deadline
+            heapq.heappush(self.expiry, (deadline, session_token, session['username']))
+            if self.expiry[0][1] == session_token:
+                self.expiry_cond.notify()
+            reaper = self.reaper
+            if reaper is None or reaper[0] != os.getpid():
+                # Threads do not survive a fork: each worker process starts its own.
+                thread = threading.Thread(target=self._reap_loop, daemon=True, name="SessionReaper")
+                self.reaper = (os.getpid(), thread)
+                thread.start()
+
+    def watch_user(self, username):
+        """
+        Schedule the expiry of the session of ``username`` if this process
+        did not load it yet, so its listeners hear about it (e.g. the
+        WebSocket server of pre-forked worker 0).
+        """
+        session_token = self.store.get(USERS, username)
+        if session_token and session_token not in self.scheduled:
+            session = self.store.get(SESSIONS, session_token)
+            if session is not None:
+                self._schedule(session_token, session)
+
+    def _reap_loop(self):
+        while True:
+            with self.expiry_cond:
+                while True:
+                    now = time.time()
+                    if self.expiry and self.expiry[0][0] <= now:
+                        break
+                    self.expiry_cond.wait(self.expiry[0][0] - now if self.expiry else None)
+                due = []
+                while self.expiry and self.expiry[0][0] <= now:
+                    deadline, session_token, username = heapq.heappop(self.expiry)
+                    # Skip entries superseded by an earlier deadline.
+                    if self.scheduled.get(session_token) == deadline:
+                        del self.scheduled[session_token]
+                        due.append((session_token, username))
+            for session_token, username in due:
+                try:
+                    self._reap(session_token, username)
+                except Exception as e:
+                    print(f"[SessionManager] Reaper failed on {session_token}: {e}")
+
+    def _reap(self, session_token, username):
+        """Expire a due session, or reschedule it if it was used since."""
+        session = self.store.get(SESSIONS, session_token)
+        if session is None:
+            self.cache.pop(session_token, None)
+            if self.store.shared and self.store.get(USERS, username) is None:
+                # Ended by another process: still tell this one's listeners,
+                # unless the user logged in again meanwhile.
+                self._publish("removed", session_token, {'username': username})
+            return
+        deadline = self._deadline(session_token, session)
+        if deadline is not None and deadline > time.time():
+            self._schedule(session_token, session)
+            return
+        if self._drop(session_token) is not None:
+            self.expired += 1
+            print(f"[SessionManager] Session expired: {session['username']}")
+            self._publish("expired", session_token, session)
+
+    def stats(self):
+        """
+        :rtype dict: scheduled expiries and sessions expired by this process.
+        """
+        with self.expiry_cond:
+            return {'scheduled': len(self.scheduled), 'expired': self.expired}
+
     def create_session(self, username):
         """
         Create session after login successfully
         """
-        with self.lock:
+        with self.locks[self._stripe(username)]:
             # Remove old session if exists
-            if username in self.username_to_token: 
-                old_token = self.username_to_token[username]
-                if old_token in self.sessions:
-                    del self.sessions[old_token]
-                if old_token in self.active_peers: 
-                    del self.active_peers[old_token]
+            old_token = self.store.get(USERS, username)
+            if old_token:
+                self._forget(old_token)
             # Create new session
             session_token = str(uuid.uuid4())
-            self.sessions[session_token] = {
+            now = time.time()
+            session = {
                 'username': username,
-                'created_at': time.time(),
-                'last_active': time.time(),
-                'peer_info': None  
+                'created_at': now,
+                'last_active': now,
+                'peer_info': None
             }
-            
-            self.username_to_token[username] = session_token
-            
-            # Initialize empty peer list
-            self.user_peer_lists[session_token] = [] 
-            
+            self.store.put(SESSIONS, session_token, session)
+            self.store.put(USERS, username, session_token)
+            if self.store.shared:
+                self.cache[session_token] = (session, time.monotonic() + self.cache_ttl)
+            self._schedule(session_token, session)
+
             print(f"[SessionManager] Session created: {username}: {session_token}")
             return session_token
-    
+
+    def validate_and_get(self, session_token):
+        """
+        Check a session and record the request, in one lookup.
+
+        :param session_token (str): token from the cookie, may be None.
+
+        :rtype dict: the session, or None if it is invalid or expired.
+        """
+        if not session_token:
+            return None
+        session = self._load(session_token)
+        if session is None:
+            return None
+        now = time.time()
+        if self.max_age and session['created_at'] + self.max_age <= now:
+            # Past its absolute lifetime, the reaper may not have run yet.
+            return None
+        self._touch(session_token, now)
+        return session
+
     def validate_session(self, session_token):
         """Check if session is valid."""
-        with self.lock:
-            if session_token in self.sessions:
-                self.sessions[session_token]['last_active'] = time.time()
-                return True
-            return False
-    
+        return self.validate_and_get(session_token) is not None
+
     def get_session(self, session_token):
         """Get session info."""
-        with self.lock:
-            return self.sessions.get(session_token)
-    
+        if not session_token:
+            return None
+        return self._load(session_token)
+
+    def last_active(self, session_token):
+        """Time of the last request of a session, None if it does not exist."""
+        session = self._load(session_token)
+        if session is None:
+            return None
+        return (self._pending(session_token)
+                or self.store.get(ACTIVE, session_token)
+                or session['last_active'])
+
     def submit_peer_info(self, session_token, peer_ip, peer_port):
         """
         Submit peer P2P info (IP:Port of P2P listener)
-        
+
         :param session_token:  Session token
         :param peer_ip: IP of P2P listener
         :param peer_port: Port of P2P listener
         :return: True if successful
         """
-        with self.lock:
-            if session_token not in self.sessions:
-                return False
-            
-            username = self.sessions[session_token]['username']
-            self.active_peers[session_token] = {
-                'username': username,
-                'ip': peer_ip,
-                'port': peer_port,
-                'registered_at': time.time()
-            }
-            
-            print(f"[SessionManager] Peer registered: {username} @ {peer_ip}:{peer_port}")
-            return True
-    
+        session = self._load(session_token)
+        if session is None:
+            return False
+
+        username = session['username']
+        peer = {
+            'username': username,
+            'ip': peer_ip,
+            'port': peer_port,
+            'registered_at': time.time()
+        }
+        self.store.put(PEERS, session_token, peer)
+        self.registry.put(session_token, peer)
+
+        print(f"[SessionManager] Peer registered: {username} @ {peer_ip}:{peer_port}")
+        return True
+
+    def _peers(self):
+        """
+        The peer registry. With a shared store it is brought up to date with
+        the peers registered by other processes every ``cache_ttl`` seconds,
+        by one thread while the others keep using the current one.
+        """
+        registry = self.registry
+        if (self.store.shared and time.monotonic() - self.peers_synced >= self.cache_ttl
+                and self.sync_lock.acquire(blocking=False)):
+            try:
+                registry.replace(self.store.items(PEERS))
+                self.peers_synced = time.monotonic()
+            finally:
+                self.sync_lock.release()
+        return registry
+
+    def find_peer(self, username):
+        """
+        Look a peer up by username.
+
+        :rtype dict: the peer (username, ip, port, registered_at), or None.
+        """
+        peer = self._peers().get(username)
+        return dict(peer) if peer is not None else None
+
+    def peer_page(self, offset=0, limit=None, prefix="", exclude=None):
+        """
+        One page of peers sorted by username, see :meth:`PeerRegistry.select`.
+
+        :rtype PeerPage: epoch, version, matching total, count and peers (dicts).
+        """
+        return self._peers().select(offset, limit, prefix, exclude)
+
+    def peer_page_json(self, offset=0, limit=None, prefix="", exclude=None):
+        """
+        Same as :meth:`peer_page` with the peers already serialized to a
+        JSON array, see :meth:`PeerRegistry.select_json`.
+
+        :rtype PeerPage: epoch, version, matching total, count and peers (JSON text).
+        """
+        return self._peers().select_json(offset, limit, prefix, exclude)
+
+    def peer_changes_json(self, since, epoch, prefix="", exclude=None):
+        """
+        Peer changes since a version, see :meth:`PeerRegistry.changes_json`.
+
+        :rtype PeerDelta: the changes, None if a full snapshot is needed.
+        """
+        return self._peers().changes_json(since, epoch, prefix, exclude)
+
     def get_all_peers(self):
         """
-        Get all active peers 
-        
+        Get all active peers
+
         :return: List of peers
         """
-        with self.lock:
-            peers = []
-            for session_token, peer_info in self.active_peers.items():
-                if session_token in self.sessions:
-                    peers.append({
-                        'username': peer_info['username'],
-                        'ip': peer_info['ip'],
-                        'port': peer_info['port'],
-                        'registered_at': peer_info['registered_at']
-                    })
-            print(f"[SessionManager] Get all peers: {len(peers)} active")
+        peers = self.peer_page().peers
+        print(f"[SessionManager] Get all peers: {len(peers)} active")
 
         return peers
-    
-    
-    
-    
-    
+
     def get_peer_list(self, session_token):
         """Lấy danh sách peers đang active (cho get-list API)"""
-        with self.lock:
-            if session_token not in self.sessions:
+        session = self._load(session_token)
+        if session is None:
+            return None
+
+        # Trả về list peers (không bao gồm chính mình)
+        return [{'ip': peer['ip'], 'port': peer['port'], 'username': peer['username']}
+                for peer in self.peer_page(exclude=session['username']).peers]
+
+    def _drop(self, session_token):
+        """Xóa session, trả về session đã xóa (None nếu không tồn tại)"""
+        session = self.store.get(SESSIONS, session_token)
+        if session is None:
+            return None
+        username = session['username']
+        with self.locks[self._stripe(username)]:
+            if self.store.get(SESSIONS, session_token) is None:
                 return None
-            
-            # Trả về list peers (không bao gồm chính mình)
-            current_session = self.sessions[session_token]
-            current_peer_id = None
-            if current_session['peer_info']:
-                current_peer_id = current_session['peer_info']['peer_id']
-            
-            peer_list = []
-            for peer_id, peer_info in self.active_peers.items():
-                if peer_id != current_peer_id:
-                    peer_list.append({
-                        'ip': peer_info['ip'],
-                        'port': peer_info['port'],
-                        'username': peer_info['username']
-                    })
-            
-            return peer_list
-    
+
+            # Xóa session và peer info
+            self._forget(session_token)
+
+            # Xóa username mapping
+            if self.store.get(USERS, username) == session_token:
+                self.store.delete(USERS, username)
+            return session
+
     def remove_session(self, session_token):
         """Xóa session khi logout hoặc timeout"""
-        with self.lock:
-            if session_token in self.sessions:
-                session = self.sessions[session_token]
-                username = session['username']
-                
-                # Xóa peer info nếu có
-                if session['peer_info']:
-                    peer_id = session['peer_info']['peer_id']
-                    if peer_id in self.active_peers:
-                        del self.active_peers[peer_id]
-                        print(f"[SessionManager] Peer removed: {peer_id}")
-                
-                # Xóa username mapping
-                if username in self.username_to_token:
-                    del self.username_to_token[username]
-                
-                # Xóa session
-                del self.sessions[session_token]
-                print(f"[SessionManager] Session removed: {username}")
+        session = self._drop(session_token)
+        if session is not None:
+            print(f"[SessionManager] Session removed: {session['username']}")
+            self._publish("removed", session_token, session)
 
 # Global instance
-session_manager = SessionManager()
\ No newline at end of file
+session_manager = SessionManager()
@@ -0,0 +1,304 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.sessionstore
+~~~~~~~~~~~~~~~~~
+
+This module provides the storage backends of
+:class:`SessionManager <SessionManager>`. A store is a set of namespaces
+(``sessions``, ``users``, ``peers``, ``active``, and those of
+:class:`ChannelManager <ChannelManager>`) mapping string keys to
+JSON-serializable values:
+
+- :class:`MemoryStore <MemoryStore>`: dicts of this process (the default).
+- :class:`SQLiteStore <SQLiteStore>`: one SQLite file in WAL mode, shared by
+  the processes of a host (pre-forked workers, several backends).
+- :class:`RedisStore <RedisStore>`: one hash per namespace on a Redis server
+  (or :class:`RespServer <RespServer>`), shared across hosts.
+
+Stores other than :class:`MemoryStore <MemoryStore>` are ``shared``: the
+session manager then keeps a short-lived read-through cache in front of them.
+
+Usage Example:
+--------------
+>>> store = open_store("sqlite:sessions.db")
+>>> store.put("sessions", token, {"username": "admin"})
+>>> store.get("sessions", token)
+{'username': 'admin'}
+
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+from .resp import RespConnection
+
+#: Namespaces used by the session manager.
+SESSIONS = "sessions"
+USERS = "users"
+PEERS = "peers"
+ACTIVE = "active"
+
+
+class SessionStore(ABC):
+    """
+    Interface of the session stores. All methods are thread-safe.
+
+    Attributes:
+        shared (bool): True if other processes see the same data.
+    """
+
+    shared = False
+
+    @abstractmethod
+    def get(self, ns, key):
+        """:rtype: the value of ``key`` in namespace ``ns``, or None."""
+
+    @abstractmethod
+    def put(self, ns, key, value):
+        """Set the value of ``key`` in namespace ``ns``."""
+
+    @abstractmethod
+    def add(self, ns, key, value):
+        """
+        Set the value of ``key`` in namespace ``ns`` unless it has one, atomically.
+
+        :rtype bool: True if the key was added.
+        """
+
+    def put_many(self, ns, mapping):
+        """Set several keys of a namespace in one batch."""
+        for key, value in mapping.items():
+            self.put(ns, key, value)
+
+    @abstractmethod
+    def delete(self, ns, *keys):
+        """Remove keys from namespace ``ns``."""
+
+    @abstractmethod
+    def items(self, ns):
+        """:rtype dict: every key of namespace ``ns`` to its value."""
+
+    def close(self):
+        """Release the connections of this process."""
+
+
+class MemoryStore(SessionStore):
+    """
+    Process-local store. Values are kept as given, callers must not mutate
+    them after a put.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+
+    def get(self, ns, key):
+        return self.data.get(ns, {}).get(key)
+
+    def put(self, ns, key, value):
+        with self.lock:
+            self.data.setdefault(ns, {})[key] = value
+
+    def add(self, ns, key, value):
+        with self.lock:
+            values = self.data.setdefault(ns, {})
+            if key in values:
+                return False
+            values[key] = value
+            return True
+
+    def put_many(self, ns, mapping):
+        with self.lock:
+            self.data.setdefault(ns, {}).update(mapping)
+
+    def delete(self, ns, *keys):
+        with self.lock:
+            values = self.data.get(ns, {})
+            for key in keys:
+                values.pop(key, None)
+
+    def items(self, ns):
+        with self.lock:
+            return dict(self.data.get(ns, {}))
+
+
+class SQLiteStore(SessionStore):
+    """
+    Store in a SQLite database in WAL mode: readers never block the writer
+    and the processes of a host share it. Each thread (of each process) has
+    its own connection.
+
+    Attributes:
+        path (str): Database file.
+        timeout (float): Seconds to wait for a lock held by another writer.
+    """
+
+    shared = True
+
+    def __init__(self, path, timeout=5.0):
+        """
+        Initialize a new SQLiteStore instance, creating the table if needed.
+
+        :param path (str): Database file.
+        :param timeout (float): Seconds to wait for a lock held by another writer.
+        """
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS kv ("
+                     "ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                     "PRIMARY KEY (ns, key)) WITHOUT ROWID")
+
+    def _conn(self):
+        # Connections must not cross a fork, nor be shared between threads.
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def get(self, ns, key):
+        row = self._conn().execute("SELECT value FROM kv WHERE ns = ? AND key = ?",
+                                   (ns, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, ns, key, value):
+        self._conn().execute("INSERT OR REPLACE INTO kv (ns, key, value) VALUES (?, ?, ?)",
+                             (ns, key, json.dumps(value)))
+
+    def add(self, ns, key, value):
+        cursor = self._conn().execute("INSERT OR IGNORE INTO kv (ns, key, value) VALUES (?, ?, ?)",
+                                      (ns, key, json.dumps(value)))
+        return cursor.rowcount == 1
+
+    def put_many(self, ns, mapping):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO kv (ns, key, value) VALUES (?, ?, ?)",
+                             [(ns, key, json.dumps(value)) for key, value in mapping.items()])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def delete(self, ns, *keys):
+        self._conn().executemany("DELETE FROM kv WHERE ns = ? AND key = ?",
+                                 [(ns, key) for key in keys])
+
+    def items(self, ns):
+        rows = self._conn().execute("SELECT key, value FROM kv WHERE ns = ?", (ns,))
+        return {key: json.loads(value) for key, value in rows}
+
+    def close(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None and self.local.pid == os.getpid():
+            conn.close()
+        self.local.conn = None
+
+
+class RedisStore(SessionStore):
+    """
+    Store on a Redis server: namespace ``ns`` is the hash ``<prefix><ns>``.
+    Each thread (of each process) has its own connection.
+
+    Attributes:
+        host (str): Server address.
+        port (int): Server port.
+        prefix (str): Prefix of the hash names.
+    """
+
+    shared = True
+
+    def __init__(self, host="127.0.0.1", port=6379, prefix="weaprous:"):
+        """
+        Initialize a new RedisStore instance, connecting lazily.
+
+        :param host (str): Server address.
+        :param port (int): Server port.
+        :param prefix (str): Prefix of the hash names.
+        """
+        self.host = host
+        self.port = port
+        self.prefix = prefix
+        self.local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = RespConnection(self.host, self.port)
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def get(self, ns, key):
+        value = self._conn().execute("HGET", self.prefix + ns, key)
+        return json.loads(value) if value is not None else None
+
+    def put(self, ns, key, value):
+        self._conn().execute("HSET", self.prefix + ns, key, json.dumps(value))
+
+    def add(self, ns, key, value):
+        return self._conn().execute("HSETNX", self.prefix + ns, key, json.dumps(value)) == 1
+
+    def put_many(self, ns, mapping):
+        if not mapping:
+            return
+        args = ["HSET", self.prefix + ns]
+        for key, value in mapping.items():
+            args += (key, json.dumps(value))
+        self._conn().execute(*args)
+
+    def delete(self, ns, *keys):
+        if keys:
+            self._conn().execute("HDEL", self.prefix + ns, *keys)
+
+    def items(self, ns):
+        flat = self._conn().execute("HGETALL", self.prefix + ns) or []
+        return {flat[i].decode(): json.loads(flat[i + 1]) for i in range(0, len(flat), 2)}
+
+    def close(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None and self.local.pid == os.getpid():
+            conn.close()
+        self.local.conn = None
+
+
+def open_store(url):
+    """
+    Creates a store from its URL.
+
+    :param url (str): ``memory``, ``sqlite:<path>`` or ``redis://host[:port][/prefix]``.
+
+    :rtype SessionStore: the store.
+
+    :raises ValueError: for an unknown URL scheme.
+    """
+    if url in (None, "", "memory"):
+        return MemoryStore()
+    if url.startswith("sqlite:"):
+        return SQLiteStore(url[len("sqlite:"):])
+    if url.startswith("redis://"):
+        address, _, prefix = url[len("redis://"):].partition("/")
+        host, _, port = address.partition(":")
+        return RedisStore(host or "127.0.0.1", int(port or 6379), prefix or "weaprous:")
+    raise ValueError("Unknown session store {!r}".format(url))
@@ -0,0 +1,252 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.upstream
+~~~~~~~~~~~~~~~~~
+
+This module provides the keep-alive connection pool the proxy uses to talk
+to backends. Idle connections are kept per ``(host, port)`` and reused for
+the next request, saving a TCP handshake per proxied request. Responses are
+framed by ``Content-Length`` or chunked encoding with an
+:class:`HttpReader <HttpReader>` instead of waiting for the backend to close.
+
+A pooled connection is checked before reuse: it is evicted when it has been
+idle for too long or when the backend already closed it (readable with no
+pending request). The caller retries a request that failed on a reused
+connection before any byte of the response arrived, if it can be replayed.
+
+Usage Example:
+--------------
+>>> conn, reader, reused = upstream_pool.acquire("127.0.0.1", 9000)
+>>> conn.sendall(raw_request)
+>>> upstream_pool.release("127.0.0.1", 9000, conn, reader, reusable=True)
+
+"""
+
+import select
+import socket
+import threading
+import time
+
+from .httpreader import HttpReader, HttpError
+
+#: Idle connections kept per upstream.
+DEFAULT_MAX_IDLE = 8
+
+#: Open connections (idle and in use) allowed per upstream.
+DEFAULT_MAX_SIZE = 64
+
+#: Seconds an idle pooled connection may be reused.
+DEFAULT_IDLE_TIMEOUT = 30
+
+#: Seconds allowed to connect, and to wait for response bytes.
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+
+#: Largest response body buffered from a backend.
+DEFAULT_MAX_RESPONSE_SIZE = 64 * 1024 * 1024
+
+
+class UpstreamError(socket.error):
+    """The backend could not be reached or sent an invalid response."""
+
+
+def response_has_body(method, status):
+    """
+    :params method (bytes): request method.
+    :params status (int): response status code.
+
+    :rtype bool: False for responses that never carry a body.
+    """
+    return not (method == b"HEAD" or 100 <= status < 200 or status in (204, 304))
+
+
+def parse_status(head):
+    """
+    :params head (bytes): response header block.
+
+    :rtype int: the status code.
+    """
+    try:
+        return int(head.split(b"\r\n", 1)[0].split(None, 2)[1])
+    except (IndexError, ValueError):
+        raise HttpError("invalid upstream status line {!r}".format(head[:64]))
+
+
+class _Upstream:
+    """Idle connections and open count of one backend."""
+
+    __slots__ = ("idle", "open", "available")
+
+    def __init__(self, lock):
+        self.idle = []        # [(socket, reader, idle_since)]
+        self.open = 0
+        self.available = threading.Condition(lock)
+
+
+class UpstreamPool:
+    """
+    The :class:`UpstreamPool <UpstreamPool>` object keeps keep-alive
+    connections to backends and sends framed requests on them.
+
+    Attributes:
+        max_idle (int): Idle connections kept per upstream.
+        max_size (int): Open connections allowed per upstream.
+        idle_timeout (float): Seconds an idle connection may be reused.
+    """
+
+    def __init__(self, max_idle=DEFAULT_MAX_IDLE, max_size=DEFAULT_MAX_SIZE,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, max_response_size=DEFAULT_MAX_RESPONSE_SIZE):
+        """
+        Initialize a new UpstreamPool instance.
+
+        :param max_idle (int): Idle connections kept per upstream.
+        :param max_size (int): Open connections allowed per upstream.
+        :param idle_timeout (float): Seconds an idle connection may be reused.
+        :param connect_timeout (float): Connect timeout in seconds.
+        :param read_timeout (float): Response timeout in seconds.
+        :param max_response_size (int): Largest response body accepted.
+        """
+        self.max_idle = max_idle
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_response_size = max_response_size
+        self.lock = threading.Lock()
+        self.upstreams = {}
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def _upstream(self, key):
+        upstream = self.upstreams.get(key)
+        if upstream is None:
+            upstream = self.upstreams[key] = _Upstream(self.lock)
+        return upstream
+
+    def _is_usable(self, conn, idle_since, now):
+        """An idle connection is usable if fresh and not closed by the peer."""
+        if now - idle_since > self.idle_timeout:
+            return False
+        try:
+            readable, _, _ = select.select([conn], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        # Nothing was requested: readable means EOF or garbage.
+        return not readable
+
+    def acquire(self, host, port):
+        """
+        Get a connection to an upstream, reusing an idle one if possible.
+
+        :param host (str): backend IP address.
+        :param port (int): backend port.
+
+        :rtype tuple: (socket, HttpReader, reused flag).
+
+        :raises UpstreamError: if the backend cannot be reached.
+        """
+        key = (host, port)
+        stale = []
+        found = None
+        with self.lock:
+            upstream = self._upstream(key)
+            deadline = time.monotonic() + self.connect_timeout
+            while True:
+                now = time.monotonic()
+                while upstream.idle:
+                    conn, reader, idle_since = upstream.idle.pop()
+                    if self._is_usable(conn, idle_since, now):
+                        found = (conn, reader, True)
+                        self.reused += 1
+                        break
+                    upstream.open -= 1
+                    self.evicted += 1
+                    stale.append(conn)
+                if found is not None:
+                    break
+                if upstream.open < self.max_size:
+                    upstream.open += 1
+                    break
+                # Wait for a connection to be released or closed.
+                if deadline <= now or not upstream.available.wait(deadline - now):
+                    raise UpstreamError("upstream {}:{} pool exhausted".format(host, port))
+
+        for conn in stale:
+            conn.close()
+        if found is not None:
+            return found
+
+        try:
+            conn = socket.create_connection(key, timeout=self.connect_timeout)
+            conn.settimeout(self.read_timeout)
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            self._discard(key)
+            raise UpstreamError("cannot connect to {}:{}: {}".format(host, port, e))
+        with self.lock:
+            self.created += 1
+        return conn, HttpReader(conn, max_body_size=self.max_response_size), False
+
+    def discard(self, host, port, conn):
+        """
+        Close a connection in an unknown state (e.g. a relay aborted midway).
+        """
+        conn.close()
+        self._discard((host, port))
+
+    def _discard(self, key):
+        with self.lock:
+            upstream = self._upstream(key)
+            upstream.open -= 1
+            upstream.available.notify()
+
+    def release(self, host, port, conn, reader, reusable):
+        """
+        Return a connection to the pool, or close it.
+
+        :param reusable (bool): False when the response was delimited by EOF,
+                                asked to close, or failed.
+        """
+        key = (host, port)
+        if reusable and not reader.pending():
+            with self.lock:
+                upstream = self._upstream(key)
+                if len(upstream.idle) < self.max_idle:
+                    upstream.idle.append((conn, reader, time.monotonic()))
+                    upstream.available.notify()
+                    return
+        conn.close()
+        self._discard(key)
+
+    def stats(self):
+        """
+        :rtype dict: connections created, reused and evicted, plus open and
+                     idle connections per upstream.
+        """
+        with self.lock:
+            return {
+                "created": self.created,
+                "reused": self.reused,
+                "evicted": self.evicted,
+                "upstreams": {
+                    "{}:{}".format(*key): {"open": u.open, "idle": len(u.idle)}
+                    for key, u in self.upstreams.items()
+                },
+            }
+
+
+#: Process wide pool used by :func:`relay_request <daemon.proxy.relay_request>`.
+upstream_pool = UpstreamPool()
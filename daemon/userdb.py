@@ -2,15 +2,26 @@ import hashlib
 import json
 import os
 import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no pre-forked workers, the thread lock is enough.
+    fcntl = None
 
 class UserDatabase:
     """
     Quản lý thông tin người dùng cho authentication.
     Hỗ trợ lưu trữ dạng file JSON hoặc có thể mở rộng sang SQL database.
+
+    File JSON được chia sẻ giữa các worker process: mỗi lần đọc sẽ nạp lại
+    file nếu process khác đã ghi (so sánh mtime), mỗi lần ghi giữ khóa file
+    ``<db_file>.lock`` và ghi atomic (file tạm + ``os.replace``).
     """
     def __init__(self, db_file='users.json'):
         self.db_file = db_file
         self.users = {}
+        self.mtime = None
         self.lock = threading.Lock()
         self._load_users()
     
@@ -18,6 +29,7 @@ class UserDatabase:
         """Load users từ file JSON"""
         if os.path.exists(self.db_file):
             try:
+                self.mtime = self._mtime()
                 with open(self.db_file, 'r') as f:
                     self.users = json.load(f)
                 print(f"[UserDB] Loaded {len(self.users)} users from {self.db_file}")
@@ -28,11 +40,48 @@ class UserDatabase:
             # Tạo users mặc định
             self._create_default_users()
     
+    def _mtime(self):
+        try:
+            return os.stat(self.db_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def _refresh(self):
+        """Nạp lại file nếu một process khác đã ghi (gọi khi đang giữ lock)"""
+        mtime = self._mtime()
+        if mtime is None or mtime == self.mtime:
+            return
+        try:
+            with open(self.db_file, 'r') as f:
+                self.users = json.load(f)
+            self.mtime = mtime
+        except (OSError, ValueError) as e:
+            print(f"[UserDB] Error reloading users: {e}")
+
+    @contextmanager
+    def _writing(self):
+        """Khóa ghi giữa các thread và các process, dữ liệu được nạp lại trước khi sửa"""
+        with self.lock:
+            if fcntl is None:
+                self._refresh()
+                yield
+                return
+            with open(self.db_file + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._refresh()
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
     def _save_users(self):
         """Lưu users vào file JSON"""
+        tmp_file = '{}.{}.tmp'.format(self.db_file, os.getpid())
         try:
-            with open(self.db_file, 'w') as f:
+            with open(tmp_file, 'w') as f:
                 json.dump(self.users, f, indent=2)
+            os.replace(tmp_file, self.db_file)
+            self.mtime = self._mtime()
             print(f"[UserDB] Saved {len(self.users)} users to {self.db_file}")
         except Exception as e:
             print(f"[UserDB] Error saving users: {e}")
@@ -69,7 +118,7 @@ class UserDatabase:
         :param full_name: Tên đầy đủ
         :return: True nếu thành công, False nếu username đã tồn tại
         """
-        with self.lock:
+        with self._writing():
             if username in self.users:
                 print(f"[UserDB] Username '{username}' already exists")
                 return False
@@ -95,6 +144,7 @@ class UserDatabase:
         :return: True nếu đúng, False nếu sai
         """
         with self.lock:
+            self._refresh()
             if username not in self.users:
                 print(f"[UserDB] Username '{username}' not found")
                 return False
@@ -118,6 +168,7 @@ class UserDatabase:
     def get_user_info(self, username):
         """Lấy thông tin user (không bao gồm password)"""
         with self.lock:
+            self._refresh()
             if username in self.users:
                 user = self.users[username].copy()
                 user.pop('password_hash', None)  # Không trả về password hash
@@ -126,7 +177,7 @@ class UserDatabase:
     
     def update_user(self, username, **kwargs):
         """Cập nhật thông tin user"""
-        with self.lock:
+        with self._writing():
             if username not in self.users:
                 return False
             
@@ -145,7 +196,7 @@ class UserDatabase:
     
     def delete_user(self, username):
         """Xóa user"""
-        with self.lock:
+        with self._writing():
             if username in self.users:
                 del self.users[username]
                 self._save_users()
@@ -156,6 +207,7 @@ class UserDatabase:
     def list_users(self):
         """Liệt kê tất cả users (không bao gồm password)"""
         with self.lock:
+            self._refresh()
             users_list = []
             for username, user_data in self.users.items():
                 user_info = {
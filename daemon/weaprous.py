@@ -17,7 +17,12 @@ deamon.weaproute
 This module provides a WeApRous object to deploy RESTful url web app with routing
 """
 
-from .backend import create_backend
+import inspect
+
+from .backend import create_backend, DEFAULT_ENGINE
+from .router import Router
+from .workerpool import DEFAULT_WORKERS, DEFAULT_QUEUE_SIZE
+from .prefork import DEFAULT_PROCESSES
 
 class WeApRous:
     """The fully mutable :class:`WeApRous <WeApRous>` object, which is a lightweight,
@@ -40,6 +45,15 @@ class WeApRous:
       >>> def hello(headers, body):
       >>>     return {'message': 'Hello, world!'}
 
+      >>> @app.route('/peers/<int:peer_id>', methods=['GET'])
+      >>> def peer(headers, body, peer_id, query=None):
+      >>>     return {'peer': peer_id, 'fields': query.get('fields')}
+
+      >>> @app.route('/notify', methods=['POST'])
+      >>> async def notify(headers, body):
+      >>>     await ws_handler.send_to_client(body['to'], body)
+      >>>     return {'status': 'sent'}
+
       >>> app.run()
     """
 
@@ -49,7 +63,7 @@ class WeApRous:
 
         Sets up an empty route registry and prepares placeholders for IP and port.
         """
-        self.routes = {}
+        self.routes = Router()
         self.ip = None
         self.port = None
         return
@@ -68,6 +82,13 @@ class WeApRous:
         """
         Decorator to register a route handler for a specific path and HTTP methods.
 
+        Path segments written ``<name>`` or ``<conv:name>`` (``int``, ``float``,
+        ``str``, ``path``) are passed to the handler as keyword arguments; a
+        handler declaring a ``query`` parameter also receives the parsed query
+        string. ``async def`` handlers run on the shared event loop of
+        :mod:`daemon.aioloop`; with the ``selector`` engine no worker thread
+        waits while they are suspended.
+
         :param path (str): The URL path to route.
         :param methods (list): A list of HTTP methods (e.g., ['GET', 'POST']) to bind.
 
@@ -80,22 +101,32 @@ class WeApRous:
             # Optional attach route metadata to the function
             func._route_path = path
             func._route_methods = methods
+            func._route_wants_query = 'query' in inspect.signature(func).parameters
 
             return func
         return decorator
 
-    def run(self):
+    def run(self, engine=DEFAULT_ENGINE, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+            processes=DEFAULT_PROCESSES):
         """
         Start the backend server and begin handling requests.
 
         This method launches the TCP server using the configured IP and port,
         and dispatches incoming requests to the registered route handlers.
 
+        :param engine (str): Connection engine, ``pool``, ``selector`` or ``thread``.
+        :param workers (int): Worker threads for the ``pool`` and ``selector`` engines.
+        :param queue_size (int): Pending connections allowed to wait for a worker.
+        :param processes (int): Pre-forked worker processes sharing the port;
+                                module level state is then per process.
+
         :raise: Error if IP or port has not been configured.
         """
         if not self.ip or not self.port:
             print("Rous app need to preapre address"
                   "by calling app.prepare_address(ip,port)")
 
-        create_backend(self.ip, self.port, self.routes)
+        create_backend(self.ip, self.port, self.routes,
+                       engine=engine, workers=workers, queue_size=queue_size,
+                       processes=processes)
         
@@ -4,16 +4,202 @@ Manages WebSocket connections for real-time P2P peer discovery and signaling
 """
 import asyncio
 import websockets
+from websockets.exceptions import ConnectionClosed
 import json
 import time
+import uuid
+from collections import OrderedDict, deque
 from urllib.parse import parse_qs, urlparse
 
+from daemon import aioloop
+from daemon.pubsub import LocalBus, PresenceDirectory, PRESENCE_INTERVAL
+
+#: Messages queued for one client before it is disconnected as too slow.
+OUTBOX_SIZE = 256
+
+#: Signaling messages, sent ahead of presence updates and peer lists.
+URGENT_TYPES = frozenset([
+    'registered', 'error', 'heartbeat_ack', 'session_expired',
+    'connection_request', 'request_sent', 'connection_answer', 'ice_candidate',
+])
+
+#: Bus channel of the presence events of every node.
+PRESENCE_CHANNEL = 'weaprous.presence'
+
+#: Bus channel of the messages routed to one node, followed by its id.
+NODE_CHANNEL = 'weaprous.node.'
+
+
+class Outbox:
+    """
+    Outgoing messages of one WebSocket, drained by its own writer task: a
+    slow client only delays itself, never a broadcast.
+
+    ``urgent`` messages (signaling) are sent before the others, so an ICE
+    exchange does not wait behind presence churn. A message with a ``key``
+    replaces a queued one with the same key where it stands (successive
+    ``peer_online``/``peer_offline`` of a user, repeated peer lists): only
+    the newest state is sent. At most ``size`` messages wait, beyond that
+    :meth:`offer` fails. Must be created on the event loop of the connection.
+    """
+
+    def __init__(self, websocket, size=OUTBOX_SIZE):
+        self.websocket = websocket
+        self.size = size
+        self.urgent = deque()
+        self.normal = OrderedDict()  # {key: text}, a serial number for messages without key
+        self.serial = 0
+        self.coalesced = 0
+        self.closing = None          # (code, reason) once asked to close
+        self.wake = asyncio.Event()
+        self.task = asyncio.ensure_future(self._drain())
+
+    def __len__(self):
+        return len(self.urgent) + len(self.normal)
+
+    def offer(self, text, key=None, urgent=False):
+        """Queue a serialized message without waiting, False if the queue is full"""
+        if key is not None and not urgent and key in self.normal:
+            self.normal[key] = text
+            self.coalesced += 1
+            return True
+        if len(self) >= self.size:
+            return False
+        if urgent:
+            self.urgent.append(text)
+        else:
+            if key is None:
+                self.serial += 1
+                key = self.serial
+            self.normal[key] = text
+        self.wake.set()
+        return True
+
+    def close_when_sent(self, code=1000, reason=''):
+        """Close the connection once the queued messages are sent"""
+        self.closing = (code, reason)
+        self.wake.set()
+
+    async def _drain(self):
+        try:
+            while True:
+                if self.urgent:
+                    text = self.urgent.popleft()
+                elif self.normal:
+                    text = self.normal.popitem(last=False)[1]
+                elif self.closing is not None:
+                    await self.websocket.close(*self.closing)
+                    return
+                else:
+                    self.wake.clear()
+                    await self.wake.wait()
+                    continue
+                await self.websocket.send(text)
+        except ConnectionClosed:
+            pass
+        except Exception as e:
+            print(f"[WebSocket] Writer error: {e}")
+
+    def close(self):
+        self.task.cancel()
+
+
 class WebSocketHandler:
-    def __init__(self, session_manager):
+    """
+    Signaling server of one node. With a shared ``bus`` several nodes (the
+    WebSocket servers of several backends) act as one: each announces the
+    users connected to it, keeps a :class:`PresenceDirectory` of the users
+    of the others, and signaling messages for a user of another node are
+    published on that node's channel.
+    """
+
+    def __init__(self, session_manager, bus=None):
         self.session_manager = session_manager
         self.connections = {}  # {username: websocket}
+        self.outboxes = {}     # {username: Outbox}
         self.connection_requests = {} # queue 
         self.ice_candidates = {}
+        self.bus = bus or LocalBus()
+        self.node_id = uuid.uuid4().hex[:8]
+        self.directory = PresenceDirectory()  # users of the other nodes
+        self.loop = None
+        session_manager.add_listener(self.on_session_end)
+        self.bus.subscribe(PRESENCE_CHANNEL, self.on_bus_message)
+        self.bus.subscribe(NODE_CHANNEL + self.node_id, self.on_bus_message)
+
+    async def start(self):
+        """
+        Join the other nodes: ask them for their users, then announce ours
+        every ``PRESENCE_INTERVAL`` seconds. Runs on the loop of the server.
+        """
+        self.loop = asyncio.get_running_loop()
+        if not self.bus.shared:
+            return
+        print(f"[WebSocket] Node {self.node_id} joining the bus")
+        self.bus.publish(PRESENCE_CHANNEL, {'node': self.node_id, 'event': 'hello'})
+        while True:
+            self.announce()
+            for username in self.directory.expire(keep=self.node_id):
+                if username not in self.connections:
+                    await self.broadcast_peer_status(username, 'offline')
+            await asyncio.sleep(PRESENCE_INTERVAL)
+
+    def announce(self):
+        """Publish the users connected to this node"""
+        self.bus.publish(PRESENCE_CHANNEL, {'node': self.node_id, 'event': 'sync',
+                                            'users': list(self.connections)})
+
+    def on_bus_message(self, channel, message):
+        """Bus callback, from a thread of the bus: continue on the loop"""
+        if self.loop is None or message.get('node') == self.node_id:
+            return
+        self.loop.call_soon_threadsafe(self.handle_bus_message, channel, message)
+
+    def handle_bus_message(self, channel, message):
+        """Handle a message of another node"""
+        if channel != PRESENCE_CHANNEL:
+            # Signaling message for a user of this node
+            to_username = message.get('to')
+            if to_username in self.connections:
+                asyncio.ensure_future(self.send_to_client(to_username, message['message']))
+            return
+
+        node, event = message['node'], message.get('event')
+        joined = left = ()
+        if event == 'hello':
+            # A node (re)starting: forget what it had, tell it what we have
+            joined, left = self.directory.sync(node, ())
+            self.announce()
+        elif event == 'sync':
+            joined, left = self.directory.sync(node, message.get('users', ()))
+        elif event == 'join' and self.directory.join(node, message['username']):
+            joined = (message['username'],)
+        elif event == 'leave' and self.directory.leave(node, message['username']):
+            left = (message['username'],)
+        # Users of this node already had their status sent
+        for username in joined:
+            if username not in self.connections:
+                asyncio.ensure_future(self.broadcast_peer_status(username, 'online'))
+        for username in left:
+            if username not in self.connections:
+                asyncio.ensure_future(self.broadcast_peer_status(username, 'offline'))
+
+    async def route(self, to_username, message):
+        """
+        Send a message to a user of this node, or publish it to the node of
+        the user.
+
+        :return: False if the user is not connected to any node
+        """
+        if to_username in self.connections:
+            await self.send_to_client(to_username, message)
+            return True
+        node = self.directory.owner(to_username)
+        if node is None:
+            return False
+        self.bus.publish(NODE_CHANNEL + node, {'node': self.node_id, 'to': to_username,
+                                               'message': message})
+        return True
         
     async def handle_client(self, websocket):
         """
@@ -42,16 +228,31 @@ class WebSocketHandler:
             
             print(f"[WebSocket] Client connected: {username}")
             
-            # Store connection
-            self.connections[username] = websocket
-            
-            # Send confirmation
+            # Send confirmation, before anything queued for this client
             await websocket.send(json.dumps({
                 'type': 'registered',
                 'username': username,
                 'message': 'WebSocket connected successfully'
             }))
             
+            # A reconnecting user replaces its previous connection, whose
+            # cleanup then leaves the new one alone
+            previous = self.connections.get(username)
+            if previous is not None:
+                outbox = self.outboxes.pop(username, None)
+                if outbox is not None:
+                    outbox.close()
+                asyncio.ensure_future(previous.close(1000, 'Replaced by a new connection'))
+            
+            # Store connection, messages now go through its outbox
+            self.connections[username] = websocket
+            self.outboxes[username] = Outbox(websocket)
+            # Make sure this process expires the session and notifies peers
+            self.session_manager.watch_user(username)
+            if self.bus.shared:
+                self.bus.publish(PRESENCE_CHANNEL, {'node': self.node_id, 'event': 'join',
+                                                    'username': username})
+            
             # Notify other peers
             await self.broadcast_peer_status(username, 'online')
             
@@ -68,11 +269,40 @@ class WebSocketHandler:
             traceback.print_exc()
             
         finally:
-            if username and username in self.connections:
+            # A newer connection of the same user may have replaced this one
+            if username and self.connections.get(username) is websocket:
                 del self.connections[username]
+                outbox = self.outboxes.pop(username, None)
+                if outbox is not None:
+                    outbox.close()
+                if self.bus.shared:
+                    self.bus.publish(PRESENCE_CHANNEL, {'node': self.node_id, 'event': 'leave',
+                                                        'username': username})
                 await self.broadcast_peer_status(username, 'offline')
                 print(f"[WebSocket] Cleaned up: {username}")
     
+    def on_session_end(self, event, session_token, session):
+        """
+        Session listener: a session expired or was removed. Called from the
+        session reaper thread, the notification runs on the shared loop.
+        """
+        aioloop.submit(self.end_session(session['username'], event))
+
+    async def end_session(self, username, reason):
+        """Close the WebSocket of a user whose session ended, peers get peer_offline"""
+        outbox = self.outboxes.get(username)
+        if outbox is None:
+            # Peer registered over HTTP only
+            await self.broadcast_peer_status(username, 'offline')
+            return
+        await self.send_to_client(username, {
+            'type': 'session_expired',
+            'reason': reason,
+            'timestamp': time.time()
+        })
+        # handle_client cleanup broadcasts peer_offline
+        outbox.close_when_sent()
+
     async def handle_message(self, username, message):
         """Handle incoming WebSocket message"""
         try:
@@ -97,7 +327,7 @@ class WebSocketHandler:
                 await self.handle_ice_candidate(username, data)
                 
             elif msg_type == 'get_peer_list':
-                await self.send_peer_list(username)
+                await self.send_peer_list(username, data)
                 
         except json.JSONDecodeError:
             print(f"[WebSocket] Invalid JSON from {username}")
@@ -119,15 +349,13 @@ class WebSocketHandler:
         print(f"[WebSocket] Offer: {from_username} → {to_username}")
         
         
-        # Check if Target peer is Online 
-        if to_username in self.connections:
-            await self.send_to_client(to_username, {
+        # Check if Target peer is Online, on this node or another
+        if await self.route(to_username, {
                 'type': 'connection_request',
                 'from_username': from_username,
                 'offer': offer,
                 'timestamp': time.time()
-            })
-            
+            }):
             await self.send_to_client(from_username, {
                 'type': 'request_sent',
                 'to_username': to_username,
@@ -153,14 +381,12 @@ class WebSocketHandler:
         
         print(f"[WebSocket] Answer: {from_username} → {to_username}")
         
-        if to_username in self.connections:
-            await self.send_to_client(to_username, {
+        if not await self.route(to_username, {
                 'type': 'connection_answer',
                 'from_username': from_username,
                 'answer': answer,
                 'timestamp': time.time()
-            })
-        else:
+            }):
             await self.send_to_client(from_username, {
                 'type': 'error',
                 'message': f'Peer {to_username} is offline'
@@ -176,37 +402,62 @@ class WebSocketHandler:
         
         print(f"[WebSocket] ICE: {from_username} → {to_username}")
         
-        if to_username in self.connections:
-            await self.send_to_client(to_username, {
-                'type': 'ice_candidate',
-                'from_username': from_username,
-                'candidate': candidate,
-                'timestamp': time.time()
-            })
+        await self.route(to_username, {
+            'type': 'ice_candidate',
+            'from_username': from_username,
+            'candidate': candidate,
+            'timestamp': time.time()
+        })
     
-    async def send_peer_list(self, username):
-        """Send list of online peers"""
+    async def send_peer_list(self, username, data=None):
+        """
+        Send list of online peers (without the requesting user). The message
+        may ask for a page: ``offset``, ``limit`` and username ``prefix``, or
+        for the changes ``since`` a version of an ``epoch`` (``peer_delta``
+        reply, or a full ``peer_list`` if they are no longer known).
+        """
+        data = data or {}
         try:
-            peers = self.session_manager.get_all_peers()
-            
-            # Filter out requesting user
-            peers = [p for p in peers if p.get('username') != username]
-            
-            await self.send_to_client(username, {
-                'type': 'peer_list',
-                'peers': peers,
-                'count': len(peers)
-            })
+            prefix = data.get('prefix') or ''
+            if data.get('since') is not None:
+                delta = self.session_manager.peer_changes_json(
+                    int(data['since']), data.get('epoch'), prefix, exclude=username)
+                if delta is not None:
+                    await self.send_raw(username, '{{"type": "peer_delta", "joined": {}, "updated": {}, '
+                                                  '"left": {}, "count": {}, "epoch": "{}", "version": {}}}'.format(
+                                                      delta.joined, delta.updated, delta.left,
+                                                      delta.count, delta.epoch, delta.version))
+                    return
+
+            offset = int(data.get('offset') or 0)
+            limit = int(data['limit']) if data.get('limit') is not None else None
+            page = self.session_manager.peer_page_json(
+                max(offset, 0), None if limit is None else max(limit, 0), prefix, exclude=username)
+
+            # Peers are already serialized by the registry; a newer list of
+            # the same page replaces one still queued
+            await self.send_raw(username, '{{"type": "peer_list", "peers": {}, "count": {}, '
+                                          '"total": {}, "epoch": "{}", "version": {}}}'.format(
+                                              page.peers, page.count, page.total,
+                                              page.epoch, page.version),
+                                key=('peer_list', offset, limit, prefix))
         except Exception as e:
             print(f"[WebSocket] Error sending peer list: {e}")
     
     async def send_to_client(self, username, message):
-        """Send message to specific client"""
-        if username in self.connections:
-            try:
-                await self.connections[username].send(json.dumps(message))
-            except Exception as e:
-                print(f"[WebSocket] Error sending to {username}: {e}")
+        """Send message to specific client, signaling first"""
+        await self.send_raw(username, json.dumps(message),
+                            urgent=message.get('type') in URGENT_TYPES)
+
+    async def send_raw(self, username, text, key=None, urgent=False):
+        """
+        Queue an already serialized message on the outbox of a client, see
+        :class:`Outbox` for ``key`` and ``urgent``. A client whose outbox
+        is full is disconnected.
+        """
+        outbox = self.outboxes.get(username)
+        if outbox is not None and not outbox.offer(text, key, urgent):
+            self.drop_slow_client(username)
     
     async def broadcast_peer_status(self, username, status):
         """Broadcast peer online/offline status to all clients"""
@@ -215,20 +466,41 @@ class WebSocketHandler:
             'username': username,
             'timestamp': time.time()
         }
-        
-        for client_username, websocket in list(self.connections.items()):
-            if client_username != username:
-                try:
-                    await websocket.send(json.dumps(message))
-                except Exception as e:
-                    print(f"[WebSocket] Broadcast error: {e}")
+        # Only the latest status of a user is worth sending
+        self.fanout(json.dumps(message), exclude=username, key=('presence', username))
     
     async def broadcast_to_all(self, message, exclude=None):
         """Broadcast message to all connected clients"""
-        for username, websocket in list(self.connections.items()):
-            if exclude and username == exclude:
+        self.fanout(json.dumps(message), exclude=exclude)
+
+    def fanout(self, text, exclude=None, key=None, urgent=False):
+        """
+        Queue a message serialized once on the outbox of every client but
+        ``exclude``, without waiting for any send (see :class:`Outbox` for
+        ``key`` and ``urgent``). Clients whose outbox is full are disconnected.
+
+        :return: number of clients the message was queued for
+        """
+        queued = 0
+        slow = []
+        for username, outbox in list(self.outboxes.items()):
+            if username == exclude:
                 continue
-            try:
-                await websocket.send(json.dumps(message))
-            except Exception as e:
-                print(f"[WebSocket] Error broadcasting: {e}")
\ No newline at end of file
+            if outbox.offer(text, key, urgent):
+                queued += 1
+            else:
+                slow.append(username)
+        for username in slow:
+            self.drop_slow_client(username)
+        return queued
+
+    def drop_slow_client(self, username):
+        """Disconnect a client that does not keep up with its messages"""
+        websocket = self.connections.get(username)
+        outbox = self.outboxes.pop(username, None)
+        if outbox is not None:
+            outbox.close()
+        if websocket is not None:
+            print(f"[WebSocket] Dropping slow client: {username}")
+            # handle_client cleanup runs once the connection is closed
+            asyncio.ensure_future(websocket.close(1013, 'Outbound queue overflow'))
\ No newline at end of file
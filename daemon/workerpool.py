@@ -0,0 +1,196 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.workerpool
+~~~~~~~~~~~~~~~~~
+
+This module provides a fixed-size pool of worker threads fed by a bounded
+queue of accepted connections. It replaces the "one new thread per accept"
+model of the backend and the proxy: the number of threads never exceeds
+``workers`` and at most ``queue_size`` connections wait for a worker. When
+the queue is full the connection is answered immediately with
+``503 Service Unavailable`` and closed, so a load spike degrades latency
+instead of exhausting memory.
+
+Usage Example:
+--------------
+>>> pool = WorkerPool(lambda conn, addr: ..., workers=32, queue_size=256)
+>>> pool.start()
+>>> pool.submit(conn, addr)
+True
+>>> pool.stats()["queued"]
+0
+
+"""
+
+import queue
+import threading
+import time
+
+#: Default number of worker threads.
+DEFAULT_WORKERS = 32
+
+#: Default number of accepted connections allowed to wait for a worker.
+DEFAULT_QUEUE_SIZE = 256
+
+#: Response sent to connections rejected because the queue is full.
+SERVICE_UNAVAILABLE = (
+    "HTTP/1.1 503 Service Unavailable\r\n"
+    "Content-Type: text/plain\r\n"
+    "Content-Length: 19\r\n"
+    "Retry-After: 1\r\n"
+    "Connection: close\r\n"
+    "\r\n"
+    "Service Unavailable"
+).encode('utf-8')
+
+
+class WorkerPool:
+    """
+    The :class:`WorkerPool <WorkerPool>` object runs ``handler(conn, addr, *extra)``
+    for queued connections on a fixed number of daemon threads.
+
+    Attributes:
+        handler (callable): Blocking connection handler, responsible for
+            closing the connection.
+        workers (int): Number of worker threads.
+        queue_size (int): Maximum number of pending connections.
+        name (str): Prefix used for thread names and log lines.
+    """
+
+    def __init__(self, handler, workers=DEFAULT_WORKERS,
+                 queue_size=DEFAULT_QUEUE_SIZE, name="Worker"):
+        """
+        Initialize a new WorkerPool instance.
+
+        :param handler (callable): ``handler(conn, addr)`` routine.
+        :param workers (int): Number of worker threads.
+        :param queue_size (int): Bound of the pending-connection queue.
+        :param name (str): Thread name prefix.
+        """
+        if workers < 1:
+            raise ValueError("WorkerPool needs at least one worker")
+
+        self.handler = handler
+        self.workers = workers
+        self.queue_size = queue_size
+        self.name = name
+        self.pending = queue.Queue(maxsize=queue_size)
+
+        self.lock = threading.Lock()
+        self.busy = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.peak_queued = 0
+        self.total_wait = 0.0
+        self.threads = []
+
+    def start(self):
+        """Spawn the worker threads."""
+        for i in range(self.workers):
+            t = threading.Thread(
+                target=self._work,
+                name="{}-{}".format(self.name, i),
+                daemon=True
+            )
+            t.start()
+            self.threads.append(t)
+        print("[{}] {} workers, queue size {}".format(
+            self.name, self.workers, self.queue_size))
+        return self
+
+    def submit(self, conn, addr, *extra):
+        """
+        Queue a connection for the workers, or reject it when the queue is full.
+
+        :param conn (socket.socket): Accepted client socket.
+        :param addr (tuple): Client address.
+        :param extra: Additional arguments passed through to the handler.
+
+        :rtype bool: True if queued, False if rejected with 503.
+        """
+        try:
+            self.pending.put_nowait((conn, addr, extra, time.monotonic()))
+        except queue.Full:
+            self._reject(conn, addr)
+            return False
+
+        with self.lock:
+            self.accepted += 1
+            depth = self.pending.qsize()
+            if depth > self.peak_queued:
+                self.peak_queued = depth
+        return True
+
+    def queued(self):
+        """:rtype int: connections waiting for a worker."""
+        return self.pending.qsize()
+
+    def _reject(self, conn, addr):
+        """Answer 503 without blocking the accept loop and close."""
+        with self.lock:
+            self.rejected += 1
+            rejected = self.rejected
+        if rejected == 1 or rejected % 100 == 0:
+            print("[{}] Queue full, rejected {} connections (last {})".format(
+                self.name, rejected, addr))
+        try:
+            # One non-blocking send: the reply fits an empty socket buffer, a
+            # client that does not read it only loses the tail.
+            conn.setblocking(False)
+            conn.send(SERVICE_UNAVAILABLE)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def _work(self):
+        """Worker loop: pop connections and run the handler."""
+        while True:
+            conn, addr, extra, queued_at = self.pending.get()
+            with self.lock:
+                self.busy += 1
+                self.total_wait += time.monotonic() - queued_at
+            try:
+                self.handler(conn, addr, *extra)
+            except Exception as e:
+                print("[{}] Handler error for {}: {}".format(self.name, addr, e))
+                try:
+                    conn.close()
+                except OSError:
+                    pass
+            finally:
+                with self.lock:
+                    self.busy -= 1
+                    self.completed += 1
+
+    def stats(self):
+        """
+        Snapshot of the pool metrics.
+
+        :rtype dict: workers, busy workers, queue depth and counters.
+        """
+        with self.lock:
+            started = self.completed + self.busy
+            return {
+                "workers": self.workers,
+                "busy": self.busy,
+                "queued": self.pending.qsize(),
+                "queue_size": self.queue_size,
+                "peak_queued": self.peak_queued,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "avg_wait_ms": (self.total_wait / started * 1000) if started else 0.0,
+            }
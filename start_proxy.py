@@ -27,7 +27,8 @@ Requirements:
 - socket: provide socket networking interface.
 - threading: enables concurrent client handling via threads.
 - argparse: parses command-line arguments for server configuration.
-- re: used for regular expression matching in configuration parsing
+- routing: parses the configuration and reloads it on change or SIGHUP.
+- cache: response cache of the proxy.
 - response: response utilities.
 - httpadapter: the class for handling HTTP requests.
 - urlparse: parses URLs to extract host and port information.
@@ -38,9 +39,9 @@ Requirements:
 import socket
 import threading
 import argparse
-import re
-from collections import defaultdict
 from daemon import create_proxy
+from daemon import routing
+from daemon.cache import ResponseCache
 
 PROXY_PORT = 8080
 
@@ -50,50 +51,10 @@ def parse_virtual_hosts(config_file):
     Parses virtual host blocks from a config file.
 
     :config_file (str): Path to the NGINX config file.
-    :rtype list of dict: Each dict contains 'listen'and 'server_name'.
+    :rtype dict: host to ``(proxy_map, dist_policy, set_headers)``,
+                 see :func:`daemon.routing.parse_virtual_hosts`.
     """
-
-    with open(config_file, 'r') as f:
-        config_text = f.read()
-
-    # Match each host block
-    host_blocks = re.findall(r'host\s+"([^"]+)"\s*\{(.*?)\}', config_text, re.DOTALL)
-
-    dist_policy_map = ""
-
-    routes = {}
-    for host, block in host_blocks:
-        proxy_map = {}
-
-        # Find all proxy_pass entries
-        proxy_passes = re.findall(r'proxy_pass\s+http://([^\s;]+);', block)
-        map = proxy_map.get(host,[])
-        map = map + proxy_passes
-        proxy_map[host] = map
-
-        # Find dist_policy if present
-        policy_match = re.search(r'dist_policy\s+(\w+)', block)
-        if policy_match:
-            dist_policy_map = policy_match.group(1)
-        else: #default policy is round_robin
-            dist_policy_map = 'round-robin'
-            
-        #
-        # @bksysnet: Build the mapping and policy
-        # TODO: this policy varies among scenarios 
-        #       the default policy is provided with one proxy_pass
-        #       In the multi alternatives of proxy_pass then
-        #       the policy is applied to identify the highes matching
-        #       proxy_pass
-        #
-        if len(proxy_map.get(host,[])) == 1:
-            routes[host] = (proxy_map.get(host,[])[0], dist_policy_map)
-        # esle if:
-        #         TODO:  apply further policy matching here
-        #
-        else:
-            routes[host] = (proxy_map.get(host,[]), dist_policy_map)
-
+    routes = routing.parse_virtual_hosts(config_file)
     for key, value in routes.items():
         print (key, value)
     return routes
@@ -114,11 +75,33 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(prog='Proxy', description='', epilog='Proxy daemon')
     parser.add_argument('--server-ip', default='0.0.0.0')
     parser.add_argument('--server-port', type=int, default=PROXY_PORT)
+    parser.add_argument('--workers', type=int, default=32,
+                        help='Worker threads handling proxied connections')
+    parser.add_argument('--queue-size', type=int, default=256,
+                        help='Pending connections allowed before answering 503')
+    parser.add_argument('--health-interval', type=float, default=5,
+                        help='Seconds between upstream health checks (0 disables them)')
+    parser.add_argument('--reload-interval', type=float, default=routing.DEFAULT_RELOAD_INTERVAL,
+                        help='Seconds between checks of config/proxy.conf for changes (0 disables them)')
+    parser.add_argument('--cache-size', type=int, default=64,
+                        help='Megabytes of responses cached in memory (0 disables the cache)')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Directory of the on-disk cache tier (disabled by default)')
+    parser.add_argument('--cache-disk-size', type=int, default=512,
+                        help='Megabytes of responses cached on disk')
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
 
-    routes = parse_virtual_hosts("config/proxy.conf")
+    config_file = "config/proxy.conf"
+    routes = routing.RoutingTable(parse_virtual_hosts(config_file), config_file)
+    routes.install_sighup()
+    if args.reload_interval > 0:
+        routes.watch(args.reload_interval)
+    cache = None
+    if args.cache_size > 0:
+        cache = ResponseCache(args.cache_size * 1024 * 1024, disk_dir=args.cache_dir,
+                              disk_bytes=args.cache_disk_size * 1024 * 1024)
     print(ip)
 
-    create_proxy(ip, port, routes)
+    create_proxy(ip, port, routes, args.workers, args.queue_size, args.health_interval, cache)
@@ -29,6 +29,11 @@ import socket
 import argparse
 
 from daemon.weaprous import WeApRous
+from daemon.session import session_manager
+from daemon.channel import channel_manager
+from daemon.sessionstore import open_store
+from daemon.pubsub import open_bus
+from daemon.backend import set_websocket_bus
 from apps.Hybridapi import app
 PORT = 9001  # Default port
 
@@ -54,11 +59,41 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(prog='Backend', description='', epilog='Beckend daemon')
     parser.add_argument('--server-ip', default='0.0.0.0')
     parser.add_argument('--server-port', type=int, default=PORT)
+    parser.add_argument('--engine', choices=['pool', 'selector', 'thread'], default='pool',
+                        help='Connection engine: worker pool, selector event loop or one thread per client')
+    parser.add_argument('--workers', type=int, default=32,
+                        help='Worker threads used by the pool and selector engines')
+    parser.add_argument('--queue-size', type=int, default=256,
+                        help='Pending connections allowed before answering 503')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Pre-forked worker processes sharing the port')
+    parser.add_argument('--session-store', default='memory',
+                        help='Session and channel storage: memory, sqlite:<file> or '
+                             'redis://host:port (sqlite or redis is required with --processes, '
+                             'and with several backends)')
+    parser.add_argument('--session-idle-ttl', type=float, default=30 * 60,
+                        help='Seconds without request before a session expires (0 disables)')
+    parser.add_argument('--session-max-age', type=float, default=24 * 60 * 60,
+                        help='Seconds after login before a session expires (0 disables)')
+    parser.add_argument('--bus', default='local',
+                        help='WebSocket signaling bus: local, unix:<socket> or redis://host:port '
+                             '(run several backends on one bus, e.g. python3 -m daemon.resp '
+                             '--unix /tmp/weaprous.sock)')
  
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
 
+    store = open_store(args.session_store)
+    if args.processes > 1 and not store.shared:
+        parser.error("--processes {} needs a shared --session-store, e.g. sqlite:sessions.db "
+                     "(sessions and channels would otherwise differ per process)".format(args.processes))
+    session_manager.set_store(store)
+    session_manager.set_expiry(args.session_idle_ttl, args.session_max_age)
+    channel_manager.set_store(store)
+    set_websocket_bus(open_bus(args.bus))
+
     # Prepare and launch the RESTful application
     app.prepare_address(ip, port)
-    app.run()
\ No newline at end of file
+    app.run(engine=args.engine, workers=args.workers, queue_size=args.queue_size,
+            processes=args.processes)
\ No newline at end of file